@@ -1,4 +1,3 @@
-import requests
 import pandas as pd
 import argparse
 import time
@@ -7,16 +6,30 @@ import os
 import signal
 import sys
 import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+
+from src.utils import http_client
+from src.utils.coverage import plan_sync, mark_covered, coverage_path
+from src.utils.block_resolver import TxBlockCache, resolve_blocks
+from src.utils.endpoints import DATA_API_ACTIVITY_URL
+from src.utils.raw_store import RawStore, split_raw_column
+from src.utils.rate_control import get_controller
 
 # Constants
-API_URL = "https://data-api.polymarket.com/activity"
+API_URL = DATA_API_ACTIVITY_URL
 USER_ADDRESS = "0x63ce342161250d705dc0b16df89036c8e5f9ba9a"
-POLYGON_RPC = "https://polygon-rpc.com"
 DEFAULT_DATE_LIMIT = "2025-12-01"
 
+PAGE_LIMIT = 500
+# Offsets get slower the deeper they go; past this a window's walk is narrowed instead
+MAX_WINDOW_OFFSET = 3000
+DEFAULT_WINDOW_HOURS = 6
+DEFAULT_WORKERS = 4
+# Attempts per page for transient failures (transport errors, 5xx, 429), each already retried by http_client
+FETCH_ATTEMPTS = 5
+
 # Global flag for graceful exit
 running = True
 
@@ -49,32 +62,7 @@ def signal_handler(sig, frame):
 
 signal.signal(signal.SIGINT, signal_handler)
 
-def create_session():
-    """Creates a requests session with retry logic."""
-    session = requests.Session()
-    retries = Retry(total=5, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504])
-    adapter = HTTPAdapter(max_retries=retries)
-    session.mount('https://', adapter)
-    return session
-
-def get_block_number(session, tx_hash):
-    """Fetches block number for a transaction hash using Polygon RPC."""
-    payload = {
-        "jsonrpc": "2.0",
-        "method": "eth_getTransactionReceipt",
-        "params": [tx_hash],
-        "id": 1
-    }
-    try:
-        response = session.post(POLYGON_RPC, json=payload, timeout=5)
-        data = response.json()
-        if 'result' in data and data['result']:
-            return int(data['result']['blockNumber'], 16)
-    except Exception:
-        return None
-    return None
-
-def process_trade(trade, fetch_blocks, session):
+def process_trade(trade, blocks=None):
     timestamp = trade.get("timestamp")
     dt_object = datetime.fromtimestamp(timestamp)
     
@@ -92,27 +80,94 @@ def process_trade(trade, fetch_blocks, session):
         "asset_id": trade.get("asset"),
         "condition_id": trade.get("conditionId"),
         "pseudonym": trade.get("pseudonym"),
-        "raw_json": json.dumps(trade),
         "block_number": ""
     }
     
-    if fetch_blocks:
-        row['block_number'] = get_block_number(session, row['transaction_hash'])
+    if blocks is not None:
+        row['block_number'] = blocks.get(str(row['transaction_hash']).lower(), "")
         
     return row
 
+def fetch_page(params, logger, controller):
+    """
+    One /activity page, or None if the run was interrupted.
+    Transient failures are tried FETCH_ATTEMPTS times with a backoff in between; a 4xx other
+    than 429 means the request itself is wrong and is raised at once, like the last failure.
+    """
+    for attempt in range(1, FETCH_ATTEMPTS + 1):
+        if not running:
+            return None
+        try:
+            # Shared keep-alive pool; 5xx/429 are retried behind the rate controller's backoff
+            response = http_client.get(API_URL, params=params, timeout=10, retries=5)
+        except http_client.HTTP_ERRORS as e:
+            if attempt == FETCH_ATTEMPTS:
+                raise
+            error = e
+        else:
+            if response.status_code not in http_client.RETRY_STATUSES or attempt == FETCH_ATTEMPTS:
+                response.raise_for_status()
+                return response.json()
+            error = f"HTTP {response.status_code}"
+        logger.error(f"API Request failed ({params['start']}-{params['end']}, offset {params['offset']}): {error}. "
+                     f"Attempt {attempt}/{FETCH_ATTEMPTS}, rate now {controller.current_rate:.1f} req/s")
+        controller.backoff()
+    return None
+
+def harvest_window(lo, hi, logger, controller):
+    """
+    Collects every TRADE with lo <= timestamp <= hi using the API's start/end bounds and a
+    short offset walk. Deep offsets are slow, so once the walk reaches MAX_WINDOW_OFFSET it
+    restarts at offset 0 with `end` moved to the oldest timestamp seen; activities repeated
+    across that shared second are dropped.
+    Returns (trades newest first, pages), or (None, pages) if the run was interrupted.
+    """
+    seen = set()
+    trades = []
+    pages = 0
+    end = hi
+    offset = 0
+    while True:
+        page = fetch_page({"user": USER_ADDRESS, "limit": PAGE_LIMIT, "offset": offset, "start": lo, "end": end},
+                          logger, controller)
+        if page is None:
+            return None, pages
+        pages += 1
+        for activity in page:
+            key = json.dumps(activity, sort_keys=True)
+            if key not in seen:
+                seen.add(key)
+                if activity.get("type") == "TRADE":
+                    trades.append(activity)
+        if len(page) < PAGE_LIMIT:
+            break
+        offset += PAGE_LIMIT
+        oldest = min(a["timestamp"] for a in page)
+        # A single second deeper than the cap can only be walked through
+        if offset >= MAX_WINDOW_OFFSET and oldest < end:
+            end = oldest
+            offset = 0
+    trades.sort(key=lambda t: t["timestamp"], reverse=True)
+    return trades, pages
+
+def plan_windows(gaps, window_hours):
+    """Cuts the uncovered [lo, hi) gaps into windows of `window_hours`, newest first (the API's order)."""
+    step = max(1, int(window_hours * 3600))
+    windows = []
+    for lo, hi in gaps:
+        windows.extend((w_lo, min(hi, w_lo + step)) for w_lo in range(lo, hi, step))
+    return sorted(windows, reverse=True)
+
 def fetch_activity(args, logger):
+    global running
     logger.info(f"Starting extraction for {USER_ADDRESS}")
     logger.info(f"Date Limit: {args.date_limit}")
     logger.info(f"Fetch Blocks: {args.fetch_blocks}")
     
-    session = create_session()
-    
-    limit = 100
-    offset = args.offset # Resume support
+    controller = get_controller(API_URL)
     total_fetched = 0
     
-    date_limit_ts = datetime.strptime(args.date_limit, "%Y-%m-%d").timestamp()
+    date_limit_ts = int(datetime.strptime(args.date_limit, "%Y-%m-%d").timestamp())
     
     # Initialize CSV header logic
     file_exists = os.path.exists(args.output)
@@ -121,92 +176,109 @@ def fetch_activity(args, logger):
     if args.overwrite and file_exists:
         logger.info(f"Overwriting existing file: {args.output}")
         os.remove(args.output)
+        if os.path.exists(coverage_path(args.output)):
+            os.remove(coverage_path(args.output))
+        RawStore(args.output).remove()
         write_header = True
     elif file_exists:
         logger.info(f"Appending to existing file: {args.output}")
+        split_raw_column(args.output)
+
+    # Completed windows are recorded in the coverage index, so a rerun
+    # only harvests what is missing: this replaces the old --offset resume.
+    # Trades from the last couple of minutes may still be settling and are left for the next run.
+    gaps, known_hashes = plan_sync(args.output, date_limit_ts, int(time.time()),
+                                   ts_column="timestamp_unix", id_column="transaction_hash")
+    gap_starts = {lo for lo, _ in gaps}
+    windows = plan_windows(gaps, args.window_hours)
+    if not windows:
+        logger.info(f"{args.output} is up to date.")
+        return
+    logger.info(f"Harvesting {len(windows)} windows of up to {args.window_hours}h on {args.workers} workers.")
 
-    columns = ["timestamp_unix", "timestamp_utc", "market_title", "market_slug", "outcome", "side", "price", "size", "usdc_size", "transaction_hash", "asset_id", "condition_id", "pseudonym", "block_number", "raw_json"]
+    columns = ["timestamp_unix", "timestamp_utc", "market_title", "market_slug", "outcome", "side", "price", "size", "usdc_size", "transaction_hash", "asset_id", "condition_id", "pseudonym", "block_number"]
 
     start_time = time.time()
+    pages = 0
+    block_cache = TxBlockCache() if args.fetch_blocks else None
+    # Full API payloads go to a compressed, indexed sidecar instead of a raw_json column
+    raw_store = RawStore(args.output)
+    truncated = False
+    pool = ThreadPoolExecutor(max_workers=args.workers)
+    pending = deque()
+    queue = iter(windows)
     
-    while running:
-        params = {
-            "user": USER_ADDRESS,
-            "limit": limit,
-            "offset": offset
-        }
-        
+    def submit_next():
+        window = next(queue, None)
+        if window is not None:
+            pending.append((window, pool.submit(harvest_window, window[0], window[1] - 1, logger, controller)))
+
+    # Windows are written in order as they complete, so the output stays newest first;
+    # only a bounded number of finished windows waits on a slower, newer one
+    for _ in range(args.workers * 2):
+        submit_next()
+    
+    while pending and running:
+        (lo, hi), future = pending.popleft()
         try:
-            response = session.get(API_URL, params=params, timeout=10)
-            response.raise_for_status()
-            activities = response.json()
-        except requests.exceptions.RequestException as e:
-            logger.error(f"API Request failed at offset {offset}: {e}")
-            # With exponential backoff in session, if we get here, it's serious.
-            # Convert to a hard failure or long sleep?
-            # Let's sleep and try again loop
-            time.sleep(10)
-            continue
-            
-        if not activities:
-            logger.info("No more activities returned by API.")
+            trades, window_pages = future.result()
+        except http_client.HTTP_ERRORS as e:
+            # Windows written so far are covered; a rerun picks up from this one
+            logger.error(f"Window {lo}-{hi} failed: {e}. Stopping.")
+            running = False
+            break
+        submit_next()
+        pages += window_pages
+        if trades is None:
             break
-        
-        trades = [a for a in activities if a.get("type") == "TRADE"]
-        processed_rows = []
 
-        reached_limit = False
-        current_batch_min_ts = None
-        
-        for trade in trades:
-            ts = trade.get("timestamp")
-            current_batch_min_ts = ts
-            
-            # Check date limit
-            if ts < date_limit_ts:
-                logger.info(f"Reached date limit ({args.date_limit}). Stopping.")
-                reached_limit = True
-                break
-
-            processed_rows.append(process_trade(trade, args.fetch_blocks, session))
-            total_fetched += 1
-            
-            if args.max_items and total_fetched >= args.max_items:
-                logger.info(f"Reached max items limit ({args.max_items}). Stopping.")
-                reached_limit = True
-                break
+        # The newest stored second may already hold some of these trades
+        trades = [t for t in trades
+                  if not (t.get("timestamp") == lo and lo in gap_starts and t.get("transactionHash") in known_hashes)]
+        if args.max_items and total_fetched + len(trades) > args.max_items:
+            # Stop at a whole second, so the rest of the window can be resumed without duplicates
+            cutoff = trades[args.max_items - total_fetched]["timestamp"]
+            trades = [t for t in trades if t["timestamp"] > cutoff]
+            truncated = True
+        # Block numbers are resolved per window in one batched stage (one lookup per transaction, cached across runs)
+        blocks = resolve_blocks([t.get("transactionHash") for t in trades], cache=block_cache) if args.fetch_blocks else None
+        processed_rows = [process_trade(trade, blocks) for trade in trades]
+        raw_store.append(trades)
         
         # Save batch
         if processed_rows:
             df = pd.DataFrame(processed_rows, columns=columns)
             df.to_csv(args.output, mode='a', header=write_header, index=False)
             write_header = False 
-            
-        # Logging progress
-        if offset % 1000 == 0 or reached_limit:
-            elapsed = time.time() - start_time
-            rate = total_fetched / elapsed if elapsed > 0 else 0
-            last_date_str = datetime.fromtimestamp(current_batch_min_ts).strftime("%Y-%m-%d %H:%M:%S") if current_batch_min_ts else "N/A"
-            logger.info(f"Saved {total_fetched} trades. Offset: {offset}. Last Date: {last_date_str}. Rate: {rate:.1f} trades/sec")
-
-        if reached_limit:
+        total_fetched += len(processed_rows)
+
+        if truncated:
+            mark_covered(args.output, cutoff + 1, hi)
+            logger.info(f"Reached max items limit ({args.max_items}). Stopping.")
             break
+        mark_covered(args.output, lo, hi)
 
-        offset += limit
-        # Dynamic sleep? 
-        # API limit is reasonable, 0.1s sleep is ~10 req/s.  
-        # Be slightly gentler for long runs.
-        time.sleep(0.15) 
+        elapsed = time.time() - start_time
+        rate = total_fetched / elapsed if elapsed > 0 else 0
+        logger.info(f"Window {datetime.fromtimestamp(lo).strftime('%Y-%m-%d %H:%M')} -> {datetime.fromtimestamp(hi).strftime('%Y-%m-%d %H:%M')}: "
+                    f"{len(processed_rows)} trades in {window_pages} pages. Saved {total_fetched}. "
+                    f"Rate: {rate:.1f} trades/sec. API rate: {controller.current_rate:.1f} req/s")
 
-    logger.info(f"Finished extraction. Total items saved: {total_fetched}")
+    pool.shutdown(wait=True, cancel_futures=True)
+    if block_cache is not None:
+        block_cache.close()
+    logger.info(f"Finished extraction. Total items saved: {total_fetched} ({pages} pages).")
+    logger.info(f"Rate controller: {controller.snapshot()}")
+    logger.info(f"HTTP pools: {http_client.host_metrics()}")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Extract Polymarket user trades.")
-    parser.add_argument("--fetch-blocks", action="store_true", help="Fetch block numbers from RPC (SLOW).")
+    parser.add_argument("--fetch-blocks", action="store_true", help="Resolve block numbers via batched JSON-RPC (cached in data/interim/tx_blocks.sqlite).")
     parser.add_argument("--output", default="data/raw/polymarket_user_transactions.csv", help="Output filename.")
     parser.add_argument("--date-limit", default=DEFAULT_DATE_LIMIT, help="Stop reaching this date (YYYY-MM-DD).")
     parser.add_argument("--max-items", type=int, default=0, help="Max items to fetch (0 for no limit).")
-    parser.add_argument("--offset", type=int, default=0, help="Start offset (for resuming).")
+    parser.add_argument("--window-hours", type=float, default=DEFAULT_WINDOW_HOURS, help="Width of the time windows harvested in parallel.")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Windows harvested concurrently.")
     parser.add_argument("--overwrite", action="store_true", help="Overwrite existing file.")
     
     args = parser.parse_args()
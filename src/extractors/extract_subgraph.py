@@ -1,11 +1,21 @@
-import requests
 import pandas as pd
 import time
 import argparse
 import os
+import csv
+import heapq
+from contextlib import contextmanager
 from datetime import datetime
 
-SUBGRAPH_URL = "https://api.goldsky.com/api/public/project_cl6mb8i9h0003e201j6li0diw/subgraphs/orderbook-subgraph/0.0.1/gn"
+from src.utils.endpoints import ORDERBOOK_SUBGRAPH_URL
+from src.utils.checkpoint import load_checkpoint, save_checkpoint, clear_checkpoint, rewind_output
+from src.utils.keyset import KeysetCursor, run_cursors
+from src.utils.subgraph_client import SubgraphClient
+from src.utils.coverage import plan_sync, mark_covered, parse_ts
+from src.utils.columnar import is_columnar, PartWriter
+from src.utils import http_client
+
+SUBGRAPH_URL = ORDERBOOK_SUBGRAPH_URL
 USER_ADDRESS = "0x63ce342161250d705dc0b16df89036c8e5f9ba9a"
 
 # Timestamps for Jan 5 2026 to Jan 6 2026 (inclusive)
@@ -92,7 +102,7 @@ def fetch_page(last_ts, last_id):
     }
     
     try:
-        r = requests.post(SUBGRAPH_URL, json={'query': q_simple, 'variables': variables}, timeout=30)
+        r = http_client.post(SUBGRAPH_URL, json={'query': q_simple, 'variables': variables}, timeout=30)
         data = r.json()
         if 'errors' in data:
             print("Errors:", data['errors'])
@@ -175,81 +185,197 @@ def extract_subgraph():
     # RESTARTING LOGIC WITH ID PAGINATION BELOW
     pass
 
-def extract_safe():
+COLUMNS = ["id", "timestamp", "timestamp_utc", "transactionHash", "maker", "taker", "makerAssetId", "takerAssetId", "makerAmountFilled", "takerAmountFilled"]
+FILL_COLUMNS = COLUMNS + ["role"]
+OUTPUT_FILE = "data/raw/polymarket_jan5_jan6_raw.csv"
+TAKER_OUTPUT_FILE = "data/interim/polymarket_jan5_jan6_taker.csv"
+FILLS_OUTPUT_FILE = "data/raw/polymarket_jan5_jan6_fills.csv"
+SHARD_DIR = "data/interim/shards"
+
+ROLES = ("maker", "taker")
+
+# Role of the user in a fill. A self-matched fill is returned by both the
+# maker and the taker cursor; the merge collapses it into one "self" row.
+ROLE_SELF = "self"
+
+FILL_SELECTION = "id transactionHash timestamp maker taker makerAssetId takerAssetId makerAmountFilled takerAmountFilled"
+
+def split_window(start_ts, end_ts, shards):
+    """
+    Splits [start_ts, end_ts) into `shards` contiguous, non-overlapping time windows.
+    Each window is paged with its own id_gt cursor, so they can run in parallel.
+    """
+    shards = max(1, min(shards, end_ts - start_ts))
+    step = (end_ts - start_ts) / shards
+    bounds = [start_ts + int(round(i * step)) for i in range(shards)] + [end_ts]
+    return [(bounds[i], bounds[i + 1]) for i in range(shards)]
+
+def job_name(output_file):
+    return os.path.splitext(os.path.basename(output_file))[0]
+
+def fill_row(ev):
+    row = ev.copy()
+    row['timestamp_utc'] = datetime.fromtimestamp(int(ev['timestamp'])).strftime("%Y-%m-%d %H:%M:%S")
+    return row
+
+def fill_cursor(label, min_ts, max_ts, output_file, role="maker", skip_ids=None):
+    """Keyset cursor over the user's `role` fills in [min_ts, max_ts), appending pages to output_file."""
+    return KeysetCursor(label, "orderFilledEvents", {role: USER_ADDRESS}, FILL_SELECTION, fill_row, COLUMNS,
+                        min_ts, max_ts, output_file, skip_ids)
+
+def extract_shard(label, min_ts, max_ts, output_file, role="maker", skip_ids=None, client=None):
+    """
+    Keyset-paginates the user's `role` fills in [min_ts, max_ts) by id and appends every page to output_file.
+    Returns the number of events written.
+    """
+    client = client or SubgraphClient(SUBGRAPH_URL)
+    return run_cursors([fill_cursor(label, min_ts, max_ts, output_file, role, skip_ids)], client)
+
+def read_rows(path, role=None):
+    """Streams the data rows of an extract CSV, skipping the header. Rows are tagged with `role` if given."""
+    with open(path, newline='') as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        for row in reader:
+            if role:
+                row.append(role)
+            yield row
+
+def merge_streams(stream_files, output_file, tag_roles=False):
+    """
+    K-way merges id-ordered stream files into output_file, one row per id.
+    Only one row per stream is held in memory at a time.
+
+    stream_files is a list of (path, role). With tag_roles the output gets a
+    `role` column, and an id seen under both roles is written once as "self".
+    A .parquet output_file gets typed row groups instead of CSV lines.
+    """
+    columns = FILL_COLUMNS if tag_roles else COLUMNS
+    merged = 0
+    self_matched = 0
+    pending = None
+    with open_writer(output_file, columns) as writer:
+        streams = [read_rows(path, role) for path, role in stream_files]
+        for row in heapq.merge(*streams, key=lambda r: r[0]):
+            if pending is not None and row[0] == pending[0]:
+                # Same fill from another cursor: a maker/taker pair means the user matched itself
+                if row[-1] != pending[-1]:
+                    pending[-1] = ROLE_SELF
+                continue
+            if pending is not None:
+                self_matched += pending[-1] == ROLE_SELF
+                writer.writerow(pending if tag_roles else pending[:-1])
+                merged += 1
+            pending = row
+        if pending is not None:
+            self_matched += pending[-1] == ROLE_SELF
+            writer.writerow(pending if tag_roles else pending[:-1])
+            merged += 1
+    if tag_roles:
+        print(f"Flagged {self_matched} self-matched fills.")
+    return merged
+
+@contextmanager
+def open_writer(output_file, columns):
+    """A row writer appending to output_file: csv.writer for .csv, row-group parts for .parquet."""
+    if is_columnar(output_file):
+        writer = PartWriter(output_file, columns)
+        yield writer
+        writer.flush()
+        return
+    write_header = not os.path.exists(output_file) or os.path.getsize(output_file) == 0
+    with open(output_file, 'a', newline='') as out:
+        writer = csv.writer(out)
+        if write_header:
+            writer.writerow(columns)
+        yield writer
+
+def extract_safe(shards=1, workers=None, output_file=OUTPUT_FILE, start_ts=START_TS, end_ts=END_TS, roles=("maker",), sync=False):
     print("Strategy: Paginate by ID (TransactionHash-LogIndex) for stability.")
-    
-    last_id = ""
-    total_count = 0
-    output_file = "data/raw/polymarket_jan5_jan6_raw.csv"
-    
-     # Initialize CSV
-    columns = ["id", "timestamp", "timestamp_utc", "transactionHash", "maker", "taker", "makerAssetId", "takerAssetId", "makerAmountFilled", "takerAmountFilled"]
-    if not os.path.exists(output_file):
-        pd.DataFrame(columns=columns).to_csv(output_file, index=False)
-        
-    while True:
-        query = """
-        query($user: Bytes!, $minTs: BigInt!, $maxTs: BigInt!, $lastId: ID!) {
-          orderFilledEvents(
-            first: 1000,
-            orderBy: id,
-            orderDirection: asc,
-            where: {
-              maker: $user,
-              timestamp_gte: $minTs,
-              timestamp_lt: $maxTs,
-              id_gt: $lastId
-            }
-          ) {
-            id
-            transactionHash
-            timestamp
-            maker
-            taker
-            makerAssetId
-            takerAssetId
-            makerAmountFilled
-            takerAmountFilled
-          }
-        }
-        """
-        
-        variables = {
-            "user": USER_ADDRESS,
-            "minTs": START_TS,
-            "maxTs": END_TS,
-            "lastId": last_id
-        }
-        
-        try:
-            r = requests.post(SUBGRAPH_URL, json={'query': query, 'variables': variables}, timeout=30)
-            data = r.json()
-            events = data.get('data', {}).get('orderFilledEvents', [])
-        except Exception as e:
-            print(f"Error: {e}")
-            time.sleep(5)
-            continue
-            
-        if not events:
-            print("Done.")
-            break
-            
-        rows = []
-        for ev in events:
-            row = ev.copy()
-            row['timestamp_utc'] = datetime.fromtimestamp(int(ev['timestamp'])).strftime("%Y-%m-%d %H:%M:%S")
-            rows.append(row)
-            
-        # Save
-        df = pd.DataFrame(rows, columns=columns)
-        df.to_csv(output_file, mode='a', header=False, index=False)
-        
-        total_count += len(events)
-        last_id = events[-1]['id']
-        last_ts_disp = rows[-1]['timestamp_utc']
-        
-        print(f"Fetched {total_count} events. Last: {last_ts_disp}")
-        time.sleep(0.1)
+
+    if not sync:
+        count = extract_window(start_ts, end_ts, shards, workers, output_file, roles)
+        mark_covered(output_file, start_ts, end_ts)
+        return count
+
+    # Delta sync: only fetch the parts of the window that are not on disk yet
+    gaps, skip_ids = plan_sync(output_file, start_ts, end_ts)
+    if not gaps:
+        print(f"{output_file} is up to date.")
+        return 0
+
+    total = 0
+    for lo, hi in gaps:
+        print(f"Syncing gap {datetime.fromtimestamp(lo)} -> {datetime.fromtimestamp(hi)}")
+        total += extract_window(lo, hi, shards, workers, output_file, roles, skip_ids)
+        mark_covered(output_file, lo, hi)
+    print(f"Sync complete. {total} new events in {len(gaps)} gaps.")
+    return total
+
+def extract_window(start_ts, end_ts, shards, workers, output_file, roles, skip_ids=None):
+    """Extracts [start_ts, end_ts) for the given roles, sharded if requested, appending to output_file."""
+    windows = split_window(start_ts, end_ts, shards)
+    if len(windows) == 1 and len(roles) == 1:
+        count = extract_shard(f"[{roles[0]}]", start_ts, end_ts, output_file, role=roles[0], skip_ids=skip_ids)
+        clear_checkpoint(job_name(output_file))
+        return count
+
+    tasks = [(role, i, lo, hi) for role in roles for i, (lo, hi) in enumerate(windows)]
+    workers = workers or len(tasks)
+    print(f"Sharded mode: {len(windows)} time shards x {len(roles)} roles, up to {workers} concurrent requests.")
+
+    # Stream files survive a crash together with their checkpoints; anything without one is stale
+    os.makedirs(SHARD_DIR, exist_ok=True)
+    base = job_name(output_file)
+    stream_files = [(os.path.join(SHARD_DIR, f"{base}.{role}_{lo}_{hi}.csv"), role) for role, _, lo, hi in tasks]
+    for path, _ in stream_files:
+        if os.path.exists(path) and load_checkpoint(job_name(path)) is None:
+            os.remove(path)
+
+    # One cursor per shard and role; each round their next pages go out as aliased, batched requests
+    started = time.time()
+    cursors = [
+        fill_cursor(f"[{role} shard {i + 1}/{len(windows)}]", lo, hi, stream_files[n][0], role, skip_ids)
+        for n, (role, i, lo, hi) in enumerate(tasks)
+    ]
+    client = SubgraphClient(SUBGRAPH_URL)
+    fetched = run_cursors(cursors, client, workers=workers)
+    print(f"{client.requests_sent} requests ({client.cache_hits} pages from cache) for {len(cursors)} cursors. "
+          f"Rate controller: {client.controller.snapshot()}")
+    print(f"HTTP pools: {http_client.host_metrics()}")
+
+    # The merge appends to output_file; checkpoint its size first so an interrupted merge is redone cleanly
+    merge_job = f"{base}.merge"
+    window = (start_ts, end_ts)
+    state = load_checkpoint(merge_job, window)
+    if state and rewind_output(output_file, state):
+        print("Redoing interrupted merge.")
+    else:
+        save_checkpoint(merge_job, window, {"stage": "merge"}, 0, output_file)
+
+    merged = merge_streams(stream_files, output_file, tag_roles=len(roles) > 1)
+    for path, _ in stream_files:
+        os.remove(path)
+        clear_checkpoint(job_name(path))
+    clear_checkpoint(merge_job)
+
+    elapsed = time.time() - started
+    rate = fetched / elapsed if elapsed > 0 else 0
+    print(f"Merged {merged} unique events from {fetched} fetched ({rate:.1f} events/sec).")
+    return merged
 
 if __name__ == "__main__":
-    extract_safe()
+    parser = argparse.ArgumentParser(description="Extract user fills from the Orderbook Subgraph.")
+    parser.add_argument("--role", choices=["maker", "taker", "both"], default="maker", help="Which side of the fills to pull. 'both' writes one role-tagged fill file.")
+    parser.add_argument("--shards", type=int, default=1, help="Split the time window into N shards fetched concurrently.")
+    parser.add_argument("--workers", type=int, default=0, help="Max concurrent batched requests (0 = one per shard and role).")
+    parser.add_argument("--output", default=None, help="Output CSV, or a .parquet dataset directory for typed columnar output (defaults depend on --role).")
+    parser.add_argument("--start", default=str(START_TS), help="Window start: unix seconds or YYYY-MM-DD (UTC).")
+    parser.add_argument("--end", default=str(END_TS), help="Window end (exclusive): unix seconds, YYYY-MM-DD or 'now'.")
+    parser.add_argument("--sync", action="store_true", help="Only fetch the parts of the window not already in the output.")
+
+    args = parser.parse_args()
+    roles = ROLES if args.role == "both" else (args.role,)
+    default_output = {"maker": OUTPUT_FILE, "taker": TAKER_OUTPUT_FILE, "both": FILLS_OUTPUT_FILE}[args.role]
+    extract_safe(shards=args.shards, workers=args.workers or None, output_file=args.output or default_output,
+                 start_ts=parse_ts(args.start), end_ts=parse_ts(args.end), roles=roles, sync=args.sync)
@@ -1,120 +1,76 @@
-import requests
 import json
 from datetime import datetime
 import time
 
+from src.utils.block_index import get_block_index
+from src.utils.endpoints import PNL_SUBGRAPH_URL
+from src.utils.subgraph_client import SubgraphClient, SubgraphError, subquery
+
 # Configuration
-PNL_SUBGRAPH_URL = "https://api.goldsky.com/api/public/project_cl6mb8i9h0003e201j6li0diw/subgraphs/pnl-subgraph/0.0.14/gn"
-ORDERBOOK_SUBGRAPH_URL = "https://api.goldsky.com/api/public/project_cl6mb8i9h0003e201j6li0diw/subgraphs/orderbook-subgraph/0.0.1/gn"
 USER_ADDRESS = "0x63ce342161250d705dc0b16df89036c8e5f9ba9a"
 
 # Timestamps
 START_TS = 1767571200 # Jan 5 2026 00:00 UTC
 END_TS = 1767744000   # Jan 7 2026 00:00 UTC
 
-def get_block_for_timestamp(timestamp):
+def get_blocks_for_timestamps(timestamps):
     """
-    Finds the block number closest to the given timestamp using the Orderbook Subgraph.
-    We look for the first event *after* the timestamp to be safe (or close enough).
+    Finds the first block at or after each timestamp using the local block index
+    (binary/interpolation search over eth_getBlockByNumber, cached in data/interim).
+    Returns a list of (block_number, actual_timestamp); (None, timestamp) if it could not be resolved.
     """
-    query = """
-    query($ts: BigInt!) {
-      orderFilledEvents(
-        first: 1,
-        orderBy: timestamp,
-        orderDirection: asc,
-        where: { timestamp_gte: $ts }
-      ) {
-        block {
-          number
-        }
-        timestamp
-      }
-    }
+    found = get_block_index().blocks_for_timestamps(timestamps)
+    return [found[int(ts)] or (None, ts) for ts in timestamps]
+
+def get_block_for_timestamp(timestamp):
+    return get_blocks_for_timestamps([timestamp])[0]
+
+def get_pnl_at_blocks(block_numbers, block_timestamps=None):
+    """
+    Fetches the user's realized PnL at several block heights in one aliased request.
+    With `block_timestamps`, heights that are past the finality horizon are served from the response cache.
+    Returns one total per block (None if that height could not be queried).
     """
+    client = SubgraphClient(PNL_SUBGRAPH_URL, batch_size=len(block_numbers))
+    block_timestamps = block_timestamps or [None] * len(block_numbers)
+    subs = [
+        subquery("userPositions", {"where": {"user": USER_ADDRESS}, "block": {"number": int(block)}}, "realizedPnl",
+                 final_at=block_ts)
+        for block, block_ts in zip(block_numbers, block_timestamps)
+    ]
     try:
-        print(f"DEBUG: Querying block for ts {timestamp}...")
-        r = requests.post(ORDERBOOK_SUBGRAPH_URL, json={'query': query, 'variables': {'ts': timestamp}}, timeout=10)
-        
-        # Fallback values
-        fallback_block = 81139400 if timestamp < 1767700000 else 81213222
-        
-        if r.status_code != 200:
-             print(f"DEBUG: HTTP Error {r.status_code}. Using fallback {fallback_block}")
-             return fallback_block, timestamp
-             
-        data = r.json()
-        if 'errors' in data:
-            print(f"DEBUG: GraphQL Errors: {data['errors']}. Using fallback {fallback_block}")
-            return fallback_block, timestamp
-            
-        events = data.get('data', {}).get('orderFilledEvents', [])
-        if events:
-            # Try to get block number from various expected structures
-            ev = events[0]
-            if 'block' in ev and 'number' in ev['block']:
-                return int(ev['block']['number']), int(ev['timestamp'])
-            elif 'blockNumber' in ev:
-                return int(ev['blockNumber']), int(ev['timestamp'])
-            
-            print(f"DEBUG: Block field missing in {ev}. Using fallback.")
-            return fallback_block, int(ev['timestamp'])
-        else:
-            print(f"DEBUG: No events found. Using fallback {fallback_block}")
-            return fallback_block, timestamp
-            
-    except Exception as e:
-        print(f"Error fetching block: {e}. Using fallback.")
-        fallback_block = 81139400 if timestamp < 1767700000 else 81213222
-        return fallback_block, timestamp
+        pages = client.execute(subs)
+    except SubgraphError as e:
+        # Handle block not found or other errors
+        print(f"Subgraph Error: {e}")
+        return [None] * len(block_numbers)
+
+    # Calculate Total Realized PnL across all markets (though user usually has 1 aggregate entry logic depends on schema)
+    # In this specific PnL subgraph, UserPositions might be per market or global.
+    # Based on previous check_pnl output, it returns a list. We sum them.
+    totals = []
+    for positions in pages:
+        if positions is None:
+            totals.append(None)
+            continue
+        totals.append(sum(float(pos.get('realizedPnl', 0)) for pos in positions))
+    return totals
 
 def get_pnl_at_block(block_number):
     """
     Fetches the user's realized PnL at a specific block height.
     """
-    query = f"""
-    query {{
-      userPositions(where: {{ user: "{USER_ADDRESS}" }}, block: {{ number: {block_number} }}) {{
-        realizedPnl
-      }}
-    }}
-    """
-    try:
-        r = requests.post(PNL_SUBGRAPH_URL, json={'query': query})
-        if r.status_code != 200:
-            print(f"Error: Status {r.status_code} - {r.text}")
-            return None
-            
-        data = r.json()
-        if 'errors' in data:
-            # Handle block not found or other errors
-            print(f"Subgraph Error: {data['errors']}")
-            return None
-            
-        positions = data.get('data', {}).get('userPositions', [])
-        
-        # Calculate Total Realized PnL across all markets (though user usually has 1 aggregate entry logic depends on schema)
-        # In this specific PnL subgraph, UserPositions might be per market or global.
-        # Based on previous check_pnl output, it returns a list. We sum them.
-        total_realized_pnl = 0.0
-        for pos in positions:
-            total_realized_pnl += float(pos.get('realizedPnl', 0))
-            
-        return total_realized_pnl
-    except Exception as e:
-        print(f"Request Error: {e}")
-        return None
+    return get_pnl_at_blocks([block_number])[0]
 
 def main():
     print(f"--- Fetching Blocks for Time Travel ---")
     
-    # 1. Get Blocks
-    start_block, start_block_ts = get_block_for_timestamp(START_TS)
+    # 1. Get Blocks (both boundaries in one request)
+    (start_block, start_block_ts), (end_block, end_block_ts) = get_blocks_for_timestamps([START_TS, END_TS])
     if not start_block:
         print("Failed to find Start Block.")
         return
         
-    end_block, end_block_ts = get_block_for_timestamp(END_TS)
     if not end_block:
         print("Failed to find End Block.")
         return
@@ -124,8 +80,7 @@ def main():
     
     # 2. Query PnL
     print(f"\n--- Querying PnL Subgraph ---")
-    pnl_start = get_pnl_at_block(start_block)
-    pnl_end = get_pnl_at_block(end_block)
+    pnl_start, pnl_end = get_pnl_at_blocks([start_block, end_block], [start_block_ts, end_block_ts])
     
     if pnl_start is None or pnl_end is None:
         print("Failed to fetch PnL values.")
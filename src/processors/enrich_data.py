@@ -1,142 +1,144 @@
+import argparse
+import numpy as np
 import pandas as pd
-import json
 import os
 
+from src.utils.fill_stream import CHUNK_ROWS, iter_fills
+from src.utils.fixed_point import parse_micro, to_dollars
+from src.utils.asset_index import AssetIndex, get_asset_index
+from src.utils.market_store import MARKET_STORE_FILE
+from src.utils.parallel import default_workers, imap_ordered
+
 RAW_FILE = "polymarket_jan5_jan6_raw.csv" # Maker
 TAKER_FILE = "polymarket_jan5_jan6_taker.csv" # Taker
-MAP_FILE = "asset_map.json"
+FILLS_FILE = "polymarket_jan5_jan6_fills.csv" # Maker + Taker, role-tagged (extract_subgraph.py --role both)
+FILLS_PARQUET = "polymarket_jan5_jan6_fills.parquet" # Same, typed columnar
 OUTPUT_FILE = "polymarket_jan5_jan6_enriched.csv"
 USER_ADDRESS_LOWER = "0x63ce342161250d705dc0b16df89036c8e5f9ba9a"
 
-def enrich():
+def round_like_python(values, decimals):
+    """
+    np.round, corrected to Python's round() for the values within float noise of a tie,
+    so the CSV matches what the per-row code wrote.
+    """
+    values = np.asarray(values, dtype=float)
+    rounded = np.round(values, decimals)
+    scaled = values * 10 ** decimals
+    ties = np.abs(np.abs(scaled - np.floor(scaled)) - 0.5) < 1e-6
+    rounded[ties] = [round(float(v), decimals) for v in values[ties]]
+    return rounded
+
+def enrich_frame(df, user=USER_ADDRESS_LOWER, index=None):
+    """
+    Enriches a frame of fills with columnar operations: role masks, np.where side and
+    asset selection and array arithmetic, then one batched market lookup.
+    `index` is an AssetIndex (loaded from the market store when omitted and the store exists).
+    """
+    m_asset = df['makerAssetId'].astype(str).to_numpy()
+    t_asset = df['takerAssetId'].astype(str).to_numpy()
+    m_amt = parse_micro(df['makerAmountFilled'])
+    t_amt = parse_micro(df['takerAmountFilled'])
+    is_user_maker = (df['maker'].astype(str).str.lower() == user).to_numpy()
+
+    # Identify USDC side (Asset "0")
+    # Case A: Maker Asset is USDC ("0") -> Maker is BUYING Outcome (Spending USDC)
+    # Case B: Taker Asset is USDC ("0") -> Taker is BUYING Outcome (Spending USDC)
+    # Case C: Cross-Token Trade? (Rare on Polymarket, usually against USDC) -> pick the maker asset to map
+    case_a = m_asset == "0"
+    case_b = ~case_a & (t_asset == "0")
+    case_c = ~case_a & ~case_b
+
+    usdc_amt = np.where(case_a, m_amt, np.where(case_b, t_amt, 0))
+    outcome_amt = np.where(case_a, t_amt, np.where(case_b, m_amt, 0))
+    outcome_asset_id = np.where(case_a, t_asset, m_asset)
+    # A: User as maker gave USDC -> BUY, as taker received it -> SELL. B is the mirror image.
+    side = np.where(case_a == is_user_maker, "BUY", "SELL")
+    side = np.where(case_c, "MERGE/SWAP", side)
+
+    # Size = Outcome Amount, Volume = USDC Amount, kept as exact int64 micro-units (1e6 base units).
+    # size / volume_usdc are the same amounts in decimal, unrounded; price is a display ratio.
+    size = to_dollars(outcome_amt)
+    volume = to_dollars(usdc_amt)
+    price = np.divide(volume, size, out=np.zeros_like(volume), where=outcome_amt > 0)
+
+    df_out = pd.DataFrame({
+        "timestamp_utc": df['timestamp_utc'].to_numpy(),
+        "market_title": "Unknown Market",
+        "outcome": "?",
+        "side": side,
+        "price": round_like_python(price, 4),
+        "size": size,
+        "volume_usdc": volume,
+        "asset_id_raw": outcome_asset_id,
+        "transaction_hash": df['transactionHash'].to_numpy(),
+        "size_micro": outcome_amt,
+        "volume_micro": usdc_amt
+    })
+
+    # Lookup Map: one batched binary search over the whole asset column (decimal or hex ids)
+    if index is None and os.path.exists(MARKET_STORE_FILE):
+        index = get_asset_index()
+    if index is not None and len(df_out):
+        market_info = index.lookup(df_out['asset_id_raw'], ['title', 'outcome'])
+        df_out['market_title'] = market_info['title'].fillna('Unknown Market').to_numpy()
+        df_out['outcome'] = market_info['outcome'].fillna('?').to_numpy()
+    return df_out
+
+def fill_sources():
+    """The fill extracts to enrich, preferring the merged extract over the maker/taker pair."""
+    if os.path.exists(FILLS_PARQUET):
+        return [FILLS_PARQUET]
+    if os.path.exists(FILLS_FILE):
+        # Already merged and deduplicated by id at extraction time
+        return [FILLS_FILE]
+    return [f for f in [RAW_FILE, TAKER_FILE] if os.path.exists(f)]
+
+# Per-process asset index, opened by init_worker (memory-mapped, shared through the page cache)
+_worker_index = None
+
+def init_worker(index_path):
+    global _worker_index
+    _worker_index = AssetIndex(index_path) if index_path else None
+
+def enrich_partition(chunk):
+    return enrich_frame(chunk, index=_worker_index)
+
+def enrich(chunksize=CHUNK_ROWS, workers=1):
     print("Loading data...")
-    # Load Map
-    asset_map = {}
-    if os.path.exists(MAP_FILE):
-        with open(MAP_FILE, "r") as f:
-            asset_map = json.load(f)
-            
-    # Load Events
-    dfs = []
-    for f in [RAW_FILE, TAKER_FILE]:
-        if os.path.exists(f):
-            try:
-                d = pd.read_csv(f)
-                # Ensure no string headers in data
-                d = d[d['makerAmountFilled'] != 'makerAmountFilled']
-                dfs.append(d)
-            except:
-                pass
-
-    if not dfs:
+    sources = fill_sources()
+    if not sources:
         print("No data found.")
         return
 
-    df = pd.concat(dfs, ignore_index=True)
-    df = df.drop_duplicates(subset=['id'])
-    
-    print(f"Enriching {len(df)} events...")
-    
-    enriched_rows = []
-    
-    for idx, row in df.iterrows():
-        # Logic to find attributes
-        m_asset = str(row['makerAssetId'])
-        t_asset = str(row['takerAssetId'])
-        m_amt = float(row['makerAmountFilled'])
-        t_amt = float(row['takerAmountFilled'])
-        
-        # Identify USDC side (Asset "0")
-        # If maker is 0 -> Maker is BUYING Outcome (Spending USDC)
-        # If taker is 0 -> Taker is BUYING Outcome (Spending USDC)
-        
-        usdc_amt = 0.0
-        outcome_amt = 0.0
-        outcome_asset_id = ""
-        side = "UNKNOWN" # Buy/Sell from User Perspective?
-        
-        maker_addr = str(row['maker']).lower()
-        taker_addr = str(row['taker']).lower()
-        is_user_maker = (maker_addr == USER_ADDRESS_LOWER)
-        
-        # Case A: Maker Asset is USDC ("0")
-        if m_asset == "0":
-            usdc_amt = m_amt
-            outcome_amt = t_amt
-            outcome_asset_id = t_asset
-            # Maker (User?) gave USDC -> User BOUGHT
-            if is_user_maker:
-                side = "BUY"
-            else:
-                side = "SELL" # User is Taker, receiving USDC (Selling)
-                
-        # Case B: Taker Asset is USDC ("0")
-        elif t_asset == "0":
-            usdc_amt = t_amt
-            outcome_amt = m_amt
-            outcome_asset_id = m_asset
-            # Taker gave USDC -> Taker BOUGHT.
-            # If User is Maker (receiving USDC) -> User SOLD.
-            if is_user_maker:
-                side = "SELL"
-            else:
-                side = "BUY" # User is Taker (Giving USDC)
-        
-        # Case C: Cross-Token Trade? (Rare on Polymarket, usually against USDC)
-        else:
-            # Maybe two outcome tokens? Merge?
-            side = "MERGE/SWAP"
-            outcome_asset_id = m_asset # Just pick one to map
-            
-        # Calculate Price & Size
-        # Size = Outcome Amount (Atomic units? usually 1e6 for Polymarket CTF?)
-        # USDC = 1e6 decimals.
-        # Conditional Tokens also 1e6? Usually yes.
-        
-        size = outcome_amt / 1e6
-        volume = usdc_amt / 1e6
-        
-        price = 0.0
-        if size > 0:
-            price = volume / size
-            
-        # Lookup Map
-        market_info = asset_map.get(outcome_asset_id, {})
-        if not market_info:
-             # Try Hex version?
-             try:
-                 hex_id = hex(int(outcome_asset_id))
-                 market_info = asset_map.get(hex_id, {})
-             except:
-                 pass
-        
-        # If still not found, search map for decimal version if map has decimal keys?
-        # My map builder saved keys as provided by API (strings, often decimal).
-        
-        title = market_info.get('title', 'Unknown Market')
-        outcome_label = market_info.get('outcome', '?')
-        slug = market_info.get('slug', '')
-        
-        new_row = {
-            "timestamp_utc": row['timestamp_utc'],
-            "market_title": title,
-            "outcome": outcome_label,
-            "side": side,
-            "price": round(price, 4),
-            "size": round(size, 2),
-            "volume_usdc": round(volume, 2),
-            "asset_id_raw": outcome_asset_id,
-            "transaction_hash": row['transactionHash']
-        }
-        enriched_rows.append(new_row)
-        
-    df_out = pd.DataFrame(enriched_rows)
-    df_out.to_csv(OUTPUT_FILE, index=False)
-    print(f"Saved {OUTPUT_FILE} with {len(df_out)} rows.")
+    # Streams fixed-size chunks (bounded memory), enriched on `workers` processes and
+    # written in input order as they complete
+    index_path = get_asset_index().path if os.path.exists(MARKET_STORE_FILE) else None
+    tmp = f"{OUTPUT_FILE}.tmp"
+    total = 0
+    preview = None
+    with open(tmp, "w", newline="") as out:
+        for df_out in imap_ordered(enrich_partition, iter_fills(sources, chunksize), workers,
+                                   initializer=init_worker, initargs=(index_path,)):
+            df_out.to_csv(out, header=total == 0, index=False)
+            total += len(df_out)
+            if preview is None:
+                preview = df_out.head(10)
+            print(f"Enriched {total} events...")
+    if preview is None:
+        os.remove(tmp)
+        print("No data found.")
+        return
+    os.replace(tmp, OUTPUT_FILE)
+    print(f"Saved {OUTPUT_FILE} with {total} rows.")
     
     # Preview
     print("\nSample Enriched Data:")
-    print(df_out[['timestamp_utc', 'market_title', 'side', 'price', 'size']].head(10))
+    print(preview[['timestamp_utc', 'market_title', 'side', 'price', 'size']])
 
 if __name__ == "__main__":
-    enrich()
+    parser = argparse.ArgumentParser(description="Enrich the fill extract with side, price, size and market labels.")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_ROWS, help="Fills per chunk (bounds memory).")
+    parser.add_argument("--workers", type=int, default=1, help=f"Processes to enrich chunks on (this machine has {default_workers()}).")
+
+    args = parser.parse_args()
+    enrich(args.chunk_size, args.workers)
@@ -1,170 +1,168 @@
+import argparse
+import os
+import numpy as np
 import pandas as pd
-import requests
 import json
-import time
 from datetime import datetime
 
+from src.utils.asset_index import AssetIndex, get_asset_index
+from src.utils.endpoints import GAMMA_MARKETS_URL
+from src.utils.fill_stream import CHUNK_ROWS
+from src.utils.fixed_point import dollars_to_micro, parse_micro, to_dollars, usd
+from src.utils.market_store import MarketStore
+from src.utils.parallel import default_workers, imap_ordered
+
 # Files
 ENRICHED_CSV = "data/final/polymarket_jan5_jan6_enriched.csv"
 REDEMPTIONS_CSV = "data/interim/polymarket_jan5_jan6_redemptions.csv"
 OUTPUT_CSV = "data/interim/polymarket_jan5_jan6_detailed_pnl.csv"
 
 # Gamma API
-GAMMA_URL = "https://gamma-api.polymarket.com/markets"
+GAMMA_URL = GAMMA_MARKETS_URL
 
-def fetch_market_map(start_date="2026-01-04T00:00:00Z", end_date="2026-01-07T23:59:59Z"):
+def fetch_market_map(asset_ids=None, start_date="2026-01-04T00:00:00Z", end_date="2026-01-07T23:59:59Z"):
     """
-    Fetches markets and maps TokenID -> (ConditionID, OutcomeIndex, MarketClosed).
+    Makes sure the market store knows TokenID -> (ConditionID, OutcomeIndex, MarketClosed) and returns
+    the asset index over it. With asset_ids, only those the store does not know yet are fetched;
+    without, the date window is refreshed.
     """
-    print("Fetching Market Metadata from Gamma...")
-    token_map = {}
-    
-    offset = 0
-    while True:
-        params = {
-            "limit": 100,
-            "offset": offset,
-            "start_date_min": start_date,
-            "end_date_min": start_date,
-            "end_date_max": end_date
-        }
+    print("Loading Market Metadata...")
+    store = MarketStore()
+    if asset_ids is not None:
+        # Only the traded tokens the store does not know yet are fetched
+        store.fetch_tokens(asset_ids)
+    else:
+        store.refresh(start_date, end_date)
+    store.close()
+    index = get_asset_index()
+    print(f"Mapped {len(index)} tokens.")
+    return index
+
+def parse_index_sets(value):
+    try:
+        indices = json.loads(value)
+    except:
+        indices = []
+    return [str(i) for i in indices] if isinstance(indices, list) else []
+
+def index_set_outcomes(index_sets):
+    """Outcome indices named by a redemption's indexSets: CTF bitmasks, bit i = outcome i (see ctf_ids)."""
+    outcomes = set()
+    for value in parse_index_sets(index_sets):
         try:
-            r = requests.get(GAMMA_URL, params=params, timeout=10)
-            data = r.json()
-            if not data:
-                break
-                
-            for m in data:
-                cond_id = m.get('conditionId')
-                closed = m.get('closed', False)
-                
-                # Parse tokens to get Order (Index)
-                # clobTokenIds is usually [Token0, Token1] corresponding to Outcome0, Outcome1
-                raw_toks = m.get('clobTokenIds', '[]')
-                if isinstance(raw_toks, str):
-                    try:
-                        tokens = json.loads(raw_toks)
-                    except:
-                        tokens = []
-                else:
-                    tokens = raw_toks
-                    
-                if tokens and cond_id:
-                    for i, t in enumerate(tokens):
-                        # Store tuple: (ConditionID, Index, Status)
-                        token_map[t] = {"condition": cond_id, "index": str(i), "closed": closed, "title": m.get('question')}
-                        
-            offset += 100
-            print(f"Mapped {len(token_map)} tokens... (Offset {offset})")
-            time.sleep(0.1)
-            
-        except Exception as e:
-            print(f"Error: {e}")
-            break
-            
-    return token_map
-
-def main():
+            mask = int(value)
+        except ValueError:
+            continue
+        outcomes.update(i for i in range(256) if mask >> i & 1)
+    return outcomes
+
+def build_outcome_table(df_red):
+    """
+    (condition, outcome index) -> is_winner from the user's redemptions, one row per outcome.
+    indexSets is decoded once per distinct value and exploded; a later redemption of the
+    same outcome wins, as it did when the map was filled row by row.
+    """
+    # Logic:
+    # If Payout > 0: These indices are WINNERS. (Value 1.0)
+    # If Payout == 0: These indices are LOSERS. (Value 0.0)
+    raw = df_red['indexSets'] if 'indexSets' in df_red.columns else pd.Series('[]', index=df_red.index)
+    parsed = {v: sorted(index_set_outcomes(v)) for v in raw.drop_duplicates()}
+    table = pd.DataFrame({
+        'condition': df_red['condition'].astype(str),
+        'index': raw.map(parsed),
+        'is_winner': df_red['payout'].astype(float) > 0
+    }).explode('index').dropna(subset=['index'])
+    table['index'] = table['index'].astype('int64')
+    return table.drop_duplicates(['condition', 'index'], keep='last').reset_index(drop=True)
+
+# Per-process state, set once by init_worker: the memory-mapped asset index and the outcome table
+_worker_index = None
+_worker_outcomes = None
+
+def init_worker(index_path, outcome_table):
+    global _worker_index, _worker_outcomes
+    _worker_index = AssetIndex(index_path)
+    _worker_outcomes = outcome_table
+
+def estimate_partition(df_trades):
+    """
+    Adds status, final_price_est and estimated_pnl (dollars and micro-units) to a partition of enriched trades:
+    trades -> tokens (asset index) -> (condition, index) -> redemption outcome, as joins.
+    """
+    markets = _worker_index.lookup(df_trades['asset_id_raw'], ['condition_id', 'outcome_index', 'closed'])
+    mapped = markets['condition_id'].notna().to_numpy()
+    keys = pd.DataFrame({
+        'condition': markets['condition_id'].astype(str),
+        'index': markets['outcome_index'].astype('Int64')
+    })
+    resolved = keys.merge(_worker_outcomes, on=['condition', 'index'], how='left')['is_winner']
+    redeemed = (resolved.notna().to_numpy() & mapped)
+    is_winner = resolved.fillna(False).astype(bool).to_numpy()
+    is_closed = markets['closed'].fillna(0).astype(bool).to_numpy()
+
+    # Precise Check via Outcome Map first; closed but not redeemed (lost or sold before) counts as 0;
+    # still open uses the execution price as a proxy
+    is_open = mapped & ~redeemed & ~is_closed
+    status = np.select(
+        [~mapped, redeemed & is_winner, redeemed, is_closed],
+        ["Unmapped", "Resolved_Winner", "Resolved_Loser", "Closed_NoRedemption"],
+        default="Open")
+    final_price = np.where(redeemed & is_winner, 1.0, 0.0)
+    final_price = np.where(is_open, df_trades['price'].astype(float).to_numpy(), final_price)
+
+    # PnL Calculation in micro-units: BUY = value held - cost, SELL = revenue - value sold.
+    # Enriched files written before the micro columns existed fall back to the decimal ones.
+    if 'volume_micro' in df_trades.columns:
+        cost = parse_micro(df_trades['volume_micro'])
+        size = parse_micro(df_trades['size_micro'])
+    else:
+        cost = dollars_to_micro(df_trades['volume_usdc'])
+        size = dollars_to_micro(df_trades['size'])
+    value = np.rint(size * final_price).astype(np.int64)
+    trade_pnl = np.where(df_trades['side'].to_numpy() == "BUY", value - cost, cost - value)
+
+    df_out = df_trades.copy()
+    df_out['status'] = status
+    df_out['final_price_est'] = final_price
+    df_out['estimated_pnl'] = to_dollars(trade_pnl)
+    df_out['estimated_pnl_micro'] = trade_pnl
+    return df_out
+
+def main(chunksize=CHUNK_ROWS, workers=1):
     # 1. Load Data
-    df_trades = pd.read_csv(ENRICHED_CSV)
     df_red = pd.read_csv(REDEMPTIONS_CSV)
     
-    # 2. Build Precise Outcome Map: (ConditionID, IndexStr) -> IsWinner (Bool)
-    outcome_map = {}
+    # 2. Build Precise Outcome Table: (ConditionID, IndexStr) -> IsWinner (Bool)
     print("Building Redemption Outcome Map...")
+    outcome_table = build_outcome_table(df_red)
+    print(f"Mapped {len(outcome_table)} resolved outcomes from redemptions.")
     
-    for _, row in df_red.iterrows():
-        cond = str(row['condition'])
-        payout = float(row['payout'])
-        idx_raw = row.get('indexSets', '[]')
-        
-        try:
-            indices = json.loads(idx_raw)
-        except:
-            indices = []
-            
-        # Logic:
-        # If Payout > 0: These indices are WINNERS. (Value 1.0)
-        # If Payout == 0: These indices are LOSERS. (Value 0.0)
-        is_winner = (payout > 0)
-        
-        for idx in indices:
-            key = (cond, str(idx))
-            outcome_map[key] = is_winner
-            
-    print(f"Mapped {len(outcome_map)} resolved outcomes from redemptions.")
-    
-    # 3. Build Token Map
-    token_map = fetch_market_map()
+    # 3. Build Token Map (one pass over the asset column only)
+    asset_ids = set()
+    for chunk in pd.read_csv(ENRICHED_CSV, usecols=['asset_id_raw'], dtype=str, chunksize=chunksize):
+        asset_ids.update(chunk['asset_id_raw'].dropna().unique())
+    index = fetch_market_map(asset_ids=sorted(asset_ids))
     
-    # 4. Enrich
+    # 4. Enrich: partitions of trades on `workers` processes, written back in input order
     print("Enriching Trades with Precision...")
-    enriched_rows = []
+    trades = pd.read_csv(ENRICHED_CSV, dtype={'asset_id_raw': str}, chunksize=chunksize)
+    tmp = f"{OUTPUT_CSV}.tmp"
+    total_est_pnl = 0
+    rows = 0
+    with open(tmp, "w", newline="") as out:
+        for df_out in imap_ordered(estimate_partition, trades, workers,
+                                   initializer=init_worker, initargs=(index.path, outcome_table)):
+            df_out.to_csv(out, header=rows == 0, index=False)
+            rows += len(df_out)
+            total_est_pnl += int(df_out['estimated_pnl_micro'].sum())
+    os.replace(tmp, OUTPUT_CSV)
     
-    for idx, row in df_trades.iterrows():
-        tid = str(row['asset_id_raw'])
-        market_info = token_map.get(tid)
-        
-        # Default Values
-        status = "Unknown"
-        final_price = 0.0 
-        pnl_realized = 0.0
-        
-        cost = float(row['volume_usdc'])
-        side = row['side']
-        size = float(row['size'])
-        
-        if market_info:
-            cond_id = market_info['condition']
-            outcome_idx = market_info['index']
-            is_closed = market_info['closed']
-            
-            # Precise Check via Outcome Map
-            outcome_key = (cond_id, outcome_idx)
-            
-            if outcome_key in outcome_map:
-                is_winner = outcome_map[outcome_key]
-                if is_winner:
-                    status = "Resolved_Winner"
-                    final_price = 1.0
-                else:
-                    status = "Resolved_Loser"
-                    final_price = 0.0
-            elif is_closed:
-                # Market Closed but User did NOT redeem this specific outcome?
-                # Probably lost and didn't redeem? Or sold before?
-                # If sold, they don't have it.
-                # If held, they should have redeemed.
-                # Conservative: If closed and not in redemption map, assume 0.
-                status = "Closed_NoRedemption"
-                final_price = 0.0
-            else:
-                status = "Open"
-                # Use entry price or maybe 0.5? Sticking to market price (execution price) proxy.
-                final_price = float(row['price']) 
-        else:
-            status = "Unmapped"
-            final_price = 0.0
-            
-        # PnL Calculation
-        if side == "BUY":
-            current_val = size * final_price
-            trade_pnl = current_val - cost
-        else:
-            # SELL: Revenue - ValueSold
-            current_val = 0 
-            trade_pnl = cost - (size * final_price) 
-            
-        row['status'] = status
-        row['final_price_est'] = final_price
-        row['estimated_pnl'] = trade_pnl
-        enriched_rows.append(row)
-        
-    df_out = pd.DataFrame(enriched_rows)
-    df_out.to_csv(OUTPUT_CSV, index=False)
-    
-    total_est_pnl = df_out['estimated_pnl'].sum()
-    print(f"Total Estimated PnL (Enriched): ${total_est_pnl:,.2f}")
+    print(f"Total Estimated PnL (Enriched): ${usd(total_est_pnl)}")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Estimate per-trade PnL from market resolution and redemptions.")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_ROWS, help="Trades per partition.")
+    parser.add_argument("--workers", type=int, default=1, help=f"Processes (this machine has {default_workers()}).")
+
+    args = parser.parse_args()
+    main(args.chunk_size, args.workers)
@@ -0,0 +1,578 @@
+import argparse
+import io
+import json
+import os
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.processors.enrich_pnl import index_set_outcomes
+from src.processors.reconcile_pnl import REDEMPTION_FILE, USER_ADDRESS_LOWER, fill_sources
+from src.utils.asset_index import get_asset_index
+from src.utils.columnar import is_columnar, iter_columnar
+from src.utils.fill_stream import CHUNK_ROWS, FILL_COLUMNS
+from src.utils.fixed_point import parse_micro, usd
+from src.utils.market_store import MARKET_STORE_FILE
+
+# Persistent per-(user, asset) position ledger over the fill and redemption extracts.
+#
+#   events              one row per position leg, keyed and ordered by (ts, event_id, leg):
+#                       legs 0-3 are the non-USDC sides of a fill (maker gave / received,
+#                       taker gave / received), leg 4 a redemption (its outcome_index is
+#                       the market's winning outcome when the market store knows it)
+#   positions           current state: size, cost (basis of the shares held), realized, redeemed
+#   snapshots           every SNAPSHOT_EVERY applied events, a copy of positions into
+#   snapshot_positions  (with the key of the last event it includes)
+#   state               applied event key and count, tracked users, bytes read per source file
+#
+# All amounts are int micro-units. A refresh reads only the bytes appended to each CSV
+# extract since the last one (Parquet extracts are rescanned; the event keys drop what is
+# known), then applies just the new events to the positions they touch, so a sync costs
+# time in proportion to what it added. Events that land before already-applied ones
+# rewind to the last snapshot ahead of them and replay from there. Fills stored before the
+# market store knew their asset (and redemptions before their market resolved) are filled
+# in once it does, and replayed the same way. Point-in-time queries
+# start from the nearest snapshot at or before the time and replay the events after it.
+#
+#   python -m src.processors.position_ledger --at "2026-01-06 00:00:00"
+
+LEDGER_FILE = "data/interim/position_ledger.sqlite"
+SNAPSHOT_EVERY = 100000
+EVENT_PAGE = 50000
+REDEEM_LEG = 4
+POSITION_COLUMNS = ["user", "asset_id", "condition_id", "outcome_index", "size", "cost", "realized", "redeemed"]
+EVENT_COLUMNS = ["ts", "event_id", "leg", "user", "asset_id", "condition_id", "outcome_index", "shares", "usdc", "index_sets", "kind"]
+REDEMPTION_COLUMNS = ["id", "timestamp", "timestamp_utc", "redeemer", "payout", "condition", "indexSets"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    ts INTEGER NOT NULL,
+    event_id TEXT NOT NULL,
+    leg INTEGER NOT NULL,
+    user TEXT NOT NULL,
+    asset_id TEXT,
+    condition_id TEXT,
+    outcome_index INTEGER,
+    shares INTEGER,
+    usdc INTEGER,
+    index_sets TEXT,
+    kind TEXT,
+    added INTEGER,
+    PRIMARY KEY (ts, event_id, leg)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS events_added ON events (added);
+CREATE INDEX IF NOT EXISTS events_unmapped ON events (asset_id) WHERE kind = 'fill' AND condition_id IS NULL;
+CREATE INDEX IF NOT EXISTS events_unresolved ON events (condition_id) WHERE kind = 'redeem' AND outcome_index IS NULL;
+CREATE TABLE IF NOT EXISTS positions (
+    user TEXT NOT NULL,
+    asset_id TEXT NOT NULL,
+    condition_id TEXT,
+    outcome_index INTEGER,
+    size INTEGER,
+    cost INTEGER,
+    realized INTEGER,
+    redeemed INTEGER,
+    PRIMARY KEY (user, asset_id)
+);
+CREATE INDEX IF NOT EXISTS positions_condition ON positions (user, condition_id);
+CREATE TABLE IF NOT EXISTS snapshots (
+    snapshot_id INTEGER PRIMARY KEY,
+    ts INTEGER,
+    event_id TEXT,
+    leg INTEGER,
+    events INTEGER,
+    created_at INTEGER
+);
+CREATE TABLE IF NOT EXISTS snapshot_positions (
+    snapshot_id INTEGER NOT NULL,
+    user TEXT NOT NULL,
+    asset_id TEXT NOT NULL,
+    condition_id TEXT,
+    outcome_index INTEGER,
+    size INTEGER,
+    cost INTEGER,
+    realized INTEGER,
+    redeemed INTEGER,
+    PRIMARY KEY (snapshot_id, user, asset_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+SIZE, COST, REALIZED, REDEEMED = 2, 3, 4, 5
+
+class Positions:
+    """In-memory state of a set of positions and the rules that move it, one event at a time."""
+
+    def __init__(self, rows=()):
+        # (user, asset_id) -> [condition_id, outcome_index, size, cost, realized, redeemed]
+        self.book = {}
+        self.by_condition = {}
+        self.dirty = set()
+        for user, asset_id, *state in rows:
+            self._add((user, asset_id), list(state))
+
+    def _add(self, key, state):
+        self.book[key] = state
+        if state[0] is not None:
+            self.by_condition.setdefault((key[0], state[0]), set()).add(key)
+        return state
+
+    def get(self, user, asset_id, condition_id=None, outcome_index=None):
+        key = (user, asset_id)
+        state = self.book.get(key)
+        if state is None:
+            state = self._add(key, [condition_id, outcome_index, 0, 0, 0, 0])
+        elif state[0] is None and condition_id is not None:
+            # Asset mapped to its market since the position was opened
+            state[0], state[1] = condition_id, outcome_index
+            self.by_condition.setdefault((user, condition_id), set()).add(key)
+        self.dirty.add(key)
+        return state
+
+    def apply(self, event):
+        ts, event_id, leg, user, asset_id, condition_id, outcome_index, shares, usdc, index_sets, kind = event
+        if kind == "redeem":
+            self.redeem(user, condition_id, usdc, index_sets, outcome_index)
+        else:
+            self.fill(user, asset_id, condition_id, outcome_index, shares, usdc)
+
+    def fill(self, user, asset_id, condition_id, outcome_index, shares, usdc):
+        p = self.get(user, asset_id, condition_id, outcome_index)
+        if shares >= 0:
+            # Bought: the shares and the USDC paid for them join the position
+            p[SIZE] += shares
+            p[COST] += usdc
+            return
+        # Sold: the shares leave at the average cost and the proceeds over that basis are realized.
+        # Shares beyond those held came from outside the fills (splits, transfers) and have no basis.
+        sold = min(-shares, max(p[SIZE], 0))
+        basis = (p[COST] * sold + p[SIZE] // 2) // p[SIZE] if sold else 0
+        p[SIZE] -= sold
+        p[COST] -= basis
+        p[REALIZED] += usdc - basis
+
+    def redeem(self, user, condition_id, payout, index_sets, winner=None):
+        """
+        Closes the user's positions in a condition (the outcomes in the index set bitmasks, all if none
+        are listed). The payout goes to the positions in the winning outcome when it is known and held,
+        else it is split between the closed positions by size. A payout with no held position to close
+        is booked on a position keyed by the condition id.
+        """
+        keys = sorted(self.by_condition.get((user, condition_id), ()))
+        indices = index_set_outcomes(index_sets)
+        if indices:
+            keys = [k for k in keys if self.book[k][1] in indices]
+        held = [max(self.book[k][SIZE], 0) for k in keys]
+        if winner is not None and any(h and self.book[k][1] == winner for k, h in zip(keys, held)):
+            weights = [h if self.book[k][1] == winner else 0 for k, h in zip(keys, held)]
+        else:
+            weights = held
+        total = sum(weights)
+        shares = [payout * w // total for w in weights] if total else [0] * len(keys)
+        if total:
+            shares[weights.index(max(weights))] += payout - sum(shares)
+        for key, share in zip(keys, shares):
+            p = self.get(*key)
+            p[REALIZED] += share - p[COST]
+            p[REDEEMED] += share
+            p[SIZE] = 0
+            p[COST] = 0
+        if not total and payout:
+            p = self.get(user, condition_id, condition_id)
+            p[REALIZED] += payout
+            p[REDEEMED] += payout
+
+    def rows(self, keys=None):
+        keys = self.book.keys() if keys is None else keys
+        return [(user, asset_id, *self.book[(user, asset_id)]) for user, asset_id in keys]
+
+    def frame(self):
+        return pd.DataFrame(self.rows(), columns=POSITION_COLUMNS).astype({"outcome_index": "Int64"})
+
+def last_line_end(path, size):
+    """Offset just past the last newline of a file (an extractor may be mid-append)."""
+    with open(path, "rb") as f:
+        end = size
+        while end > 0:
+            start = max(0, end - 65536)
+            f.seek(start)
+            block = f.read(end - start)
+            cut = block.rfind(b"\n")
+            if cut >= 0:
+                return start + cut + 1
+            end = start
+    return 0
+
+class ByteWindow(io.RawIOBase):
+    """Read-only view of an open file up to byte `end`."""
+
+    def __init__(self, f, end):
+        self.f = f
+        self.end = end
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        n = min(len(buffer), self.end - self.f.tell())
+        if n <= 0:
+            return 0
+        data = self.f.read(n)
+        buffer[:len(data)] = data
+        return len(data)
+
+def fill_legs(df, users, index=None):
+    """Position legs of a chunk of fills for `users`: one row per user side and non-USDC asset."""
+    maker = df['maker'].astype(str).str.lower().to_numpy()
+    taker = df['taker'].astype(str).str.lower().to_numpy()
+    m_asset = df['makerAssetId'].astype(str).to_numpy()
+    t_asset = df['takerAssetId'].astype(str).to_numpy()
+    m_amt = parse_micro(df['makerAmountFilled'])
+    t_amt = parse_micro(df['takerAmountFilled'])
+    ts = pd.to_numeric(df['timestamp']).to_numpy(np.int64)
+    ids = df['id'].astype(str).to_numpy()
+
+    # Self-matched fills move nothing
+    self_match = maker == taker
+    is_maker = np.isin(maker, users) & ~self_match
+    is_taker = np.isin(taker, users) & ~self_match
+
+    # Each side gives one asset and receives the other; the USDC side ("0") prices the token side
+    legs = []
+    for leg, user, mask, asset, shares, other_asset, usdc in (
+            (0, maker, is_maker, m_asset, -m_amt, t_asset, t_amt),
+            (1, maker, is_maker, t_asset, t_amt, m_asset, m_amt),
+            (2, taker, is_taker, t_asset, -t_amt, m_asset, m_amt),
+            (3, taker, is_taker, m_asset, m_amt, t_asset, t_amt)):
+        keep = mask & (asset != "0")
+        legs.append(pd.DataFrame({
+            "ts": ts[keep],
+            "event_id": ids[keep],
+            "leg": leg,
+            "user": user[keep],
+            "asset_id": asset[keep],
+            "shares": shares[keep],
+            "usdc": np.where(other_asset == "0", usdc, 0)[keep]
+        }))
+    legs = pd.concat(legs, ignore_index=True)
+    if index is not None and len(legs):
+        markets = index.lookup(legs['asset_id'], ['condition_id', 'outcome_index'])
+        legs['condition_id'] = markets['condition_id'].to_numpy()
+        legs['outcome_index'] = markets['outcome_index'].to_numpy()
+    else:
+        legs['condition_id'] = None
+        legs['outcome_index'] = None
+    legs['index_sets'] = None
+    legs['kind'] = "fill"
+    return legs[EVENT_COLUMNS]
+
+def redemption_legs(df, users, index=None):
+    """Redemption events of `users` from a chunk of the redemptions extract."""
+    redeemer = df['redeemer'].astype(str).str.lower()
+    df = df[redeemer.isin(users).to_numpy()]
+    conditions = df['condition'].astype(str).str.lower()
+    winners = None
+    if index is not None:
+        resolved = index.outcomes.dropna(subset=['condition_id', 'resolution'])
+        winner_of = resolved.drop_duplicates('condition_id').set_index('condition_id')['resolution']
+        winners = conditions.map(winner_of).to_numpy()
+    return pd.DataFrame({
+        "ts": pd.to_numeric(df['timestamp']).to_numpy(np.int64),
+        "event_id": df['id'].astype(str).to_numpy(),
+        "leg": REDEEM_LEG,
+        "user": df['redeemer'].astype(str).str.lower().to_numpy(),
+        "asset_id": None,
+        "condition_id": conditions.to_numpy(),
+        "outcome_index": winners,
+        "shares": 0,
+        "usdc": parse_micro(df['payout']),
+        "index_sets": df['indexSets'].to_numpy() if 'indexSets' in df.columns else None,
+        "kind": "redeem"
+    })[EVENT_COLUMNS]
+
+def as_rows(legs, generation):
+    """sqlite rows (plain Python values, None for missing) of an event frame."""
+    columns = []
+    for name in EVENT_COLUMNS:
+        values = legs[name].tolist()
+        if name in ("condition_id", "outcome_index", "index_sets"):
+            values = [None if pd.isna(v) else (int(v) if name == "outcome_index" else str(v)) for v in values]
+        columns.append(values)
+    columns.append([generation] * len(legs))
+    return list(zip(*columns))
+
+def parse_time(value):
+    """Unix seconds from digits or a UTC date/time string."""
+    value = str(value).strip()
+    if value.isdigit():
+        return int(value)
+    return int(pd.Timestamp(value, tz="UTC").timestamp())
+
+class PositionLedger:
+    """sqlite-backed event log, positions and snapshots for a set of user addresses."""
+
+    def __init__(self, path=LEDGER_FILE, users=None, snapshot_every=SNAPSHOT_EVERY):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.users = sorted({u.lower() for u in users}) if users else [USER_ADDRESS_LOWER]
+        self.snapshot_every = snapshot_every
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        tracked = self.get_state("users")
+        if tracked is not None and tracked != self.users:
+            print(f"Ledger {path} tracked {len(tracked)} other user(s); rebuilding.")
+            self.reset()
+        self.set_state("users", self.users)
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def get_state(self, key, default=None):
+        row = self.conn.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set_state(self, key, value):
+        self.conn.execute("INSERT OR REPLACE INTO state VALUES (?, ?)", (key, json.dumps(value)))
+
+    def reset(self):
+        for table in ("events", "positions", "snapshots", "snapshot_positions", "state"):
+            self.conn.execute(f"DELETE FROM {table}")
+        self.set_state("users", self.users)
+        self.conn.commit()
+
+    def new_rows(self, path, chunksize, marker, columns):
+        """
+        Chunks of the rows added to an extract since the last refresh: for a CSV only the bytes
+        appended since (up to the last complete line), for Parquet the whole file.
+        """
+        if is_columnar(path):
+            yield from iter_columnar(path, chunksize)
+            return
+        source = self.get_state(f"source:{path}", {})
+        size = os.path.getsize(path)
+        offset = source.get("bytes", 0)
+        if offset > size:
+            # Rewritten rather than appended to: read it again
+            offset = 0
+        end = last_line_end(path, size)
+        with open(path, "rb") as f:
+            if offset == 0:
+                first = f.readline()
+                header = first.decode().strip().split(",")
+                if marker in header:
+                    columns, offset = header, len(first)
+            else:
+                columns = source.get("columns", columns)
+            if end > offset:
+                f.seek(offset)
+                reader = io.BufferedReader(ByteWindow(f, end))
+                for chunk in pd.read_csv(reader, names=columns, header=None, dtype=str, chunksize=chunksize):
+                    # Stray header rows (files appended to with a header) are dropped
+                    yield chunk[chunk[marker] != marker]
+        self.set_state(f"source:{path}", {"bytes": end, "columns": columns})
+
+    def insert(self, legs, generation):
+        """Adds events not in the log yet. Returns how many were new."""
+        before = self.conn.total_changes
+        self.conn.executemany(f"INSERT OR IGNORE INTO events VALUES ({', '.join('?' * (len(EVENT_COLUMNS) + 1))})",
+                              as_rows(legs, generation))
+        return self.conn.total_changes - before
+
+    def refresh(self, fill_paths=None, redemption_file=REDEMPTION_FILE, chunksize=CHUNK_ROWS):
+        """Reads the events added to the extracts since the last refresh and applies them. Returns the count."""
+        generation = self.get_state("generation", 0) + 1
+        index = get_asset_index() if os.path.exists(MARKET_STORE_FILE) else None
+        fills = 0
+        for path in (fill_paths if fill_paths is not None else fill_sources()):
+            for chunk in self.new_rows(path, chunksize, "makerAmountFilled", FILL_COLUMNS):
+                fills += self.insert(fill_legs(chunk, self.users, index), generation)
+        redemptions = 0
+        if redemption_file and os.path.exists(redemption_file):
+            for chunk in self.new_rows(redemption_file, chunksize, "payout", REDEMPTION_COLUMNS):
+                redemptions += self.insert(redemption_legs(chunk, self.users, index), generation)
+        mapped = self.map_markets(index, generation) if index is not None else 0
+        self.set_state("generation", generation)
+        self.conn.commit()
+        print(f"Ledger: {fills} new fill legs, {redemptions} new redemptions, {mapped} events newly mapped to markets.")
+        if fills or redemptions or mapped:
+            start = time.time()
+            applied = self.apply_new(generation)
+            print(f"Applied {applied} events in {time.time() - start:.2f}s.")
+        return fills + redemptions
+
+    def map_markets(self, index, generation):
+        """
+        Fills in the market of fill events stored before the market store knew their asset, and the
+        winning outcome of redemptions stored before their market resolved. The updated events count
+        as added by `generation`, so the positions are replayed from before them. Returns the count.
+        """
+        before = self.conn.total_changes
+        assets = [row[0] for row in self.conn.execute(
+            "SELECT DISTINCT asset_id FROM events WHERE kind = 'fill' AND condition_id IS NULL")]
+        if assets:
+            markets = index.lookup(pd.Series(assets), ['condition_id', 'outcome_index'])
+            self.conn.executemany(
+                "UPDATE events SET condition_id = ?, outcome_index = ?, added = ? "
+                "WHERE kind = 'fill' AND condition_id IS NULL AND asset_id = ?",
+                [(str(c), int(o), generation, a) for a, c, o in
+                 zip(assets, markets['condition_id'], markets['outcome_index']) if not pd.isna(c)])
+        conditions = [row[0] for row in self.conn.execute(
+            "SELECT DISTINCT condition_id FROM events WHERE kind = 'redeem' AND outcome_index IS NULL")]
+        if conditions:
+            resolved = index.outcomes.dropna(subset=['condition_id', 'resolution'])
+            winner_of = resolved.drop_duplicates('condition_id').set_index('condition_id')['resolution']
+            self.conn.executemany(
+                "UPDATE events SET outcome_index = ?, added = ? "
+                "WHERE kind = 'redeem' AND outcome_index IS NULL AND condition_id = ?",
+                [(int(winner_of[c]), generation, c) for c in conditions if c in winner_of.index])
+        return self.conn.total_changes - before
+
+    def apply_new(self, generation):
+        """Applies the events added by `generation`, rewinding first if any precede applied ones."""
+        first = self.conn.execute("SELECT ts, event_id, leg FROM events WHERE added = ? ORDER BY ts, event_id, leg LIMIT 1",
+                                  (generation,)).fetchone()
+        key = self.get_state("applied")
+        count = self.get_state("applied_count", 0)
+        if key is not None and tuple(first) <= tuple(key):
+            key, count = self.rewind(first)
+        return self.apply_from(key, count)
+
+    def rewind(self, first):
+        """Restores positions from the last snapshot before event key `first`, dropping later snapshots."""
+        snap = self.conn.execute(
+            "SELECT snapshot_id, ts, event_id, leg, events FROM snapshots WHERE (ts, event_id, leg) < (?, ?, ?) "
+            "ORDER BY ts DESC, event_id DESC, leg DESC LIMIT 1", first).fetchone()
+        self.conn.execute("DELETE FROM snapshot_positions WHERE snapshot_id IN "
+                          "(SELECT snapshot_id FROM snapshots WHERE (ts, event_id, leg) >= (?, ?, ?))", first)
+        self.conn.execute("DELETE FROM snapshots WHERE (ts, event_id, leg) >= (?, ?, ?)", first)
+        self.conn.execute("DELETE FROM positions")
+        if snap is None:
+            print("Late events before the first snapshot; replaying from the start.")
+            return None, 0
+        self.conn.execute(f"INSERT INTO positions SELECT {', '.join(POSITION_COLUMNS)} FROM snapshot_positions "
+                          "WHERE snapshot_id = ?", (snap[0],))
+        print(f"Late events; replaying from the snapshot at event {snap[4]}.")
+        return list(snap[1:4]), snap[4]
+
+    def events_after(self, key=None, until=None):
+        """Events after event key `key` (and at or before time `until`), in order, read a page at a time."""
+        while True:
+            where, params = [], []
+            if key is not None:
+                where.append("(ts, event_id, leg) > (?, ?, ?)")
+                params.extend(key)
+            if until is not None:
+                where.append("ts <= ?")
+                params.append(until)
+            sql = f"SELECT {', '.join(EVENT_COLUMNS)} FROM events"
+            if where:
+                sql += " WHERE " + " AND ".join(where)
+            rows = self.conn.execute(sql + " ORDER BY ts, event_id, leg LIMIT ?", params + [EVENT_PAGE]).fetchall()
+            yield from rows
+            if len(rows) < EVENT_PAGE:
+                return
+            key = rows[-1][:3]
+
+    def touched(self, key):
+        """Stored positions the events after `key` can change."""
+        after = "" if key is None else "AND (ts, event_id, leg) > (?, ?, ?)"
+        params = [] if key is None else list(key)
+        return self.conn.execute(
+            f"SELECT {', '.join(POSITION_COLUMNS)} FROM positions WHERE (user, asset_id) IN "
+            f"(SELECT user, asset_id FROM events WHERE asset_id IS NOT NULL {after}) "
+            f"UNION SELECT {', '.join(POSITION_COLUMNS)} FROM positions WHERE (user, condition_id) IN "
+            f"(SELECT user, condition_id FROM events WHERE kind = 'redeem' {after})", params + params).fetchall()
+
+    def apply_from(self, key, count):
+        """Applies the events after `key` to the stored positions, snapshotting every snapshot_every events."""
+        positions = Positions(self.touched(key))
+        applied = 0
+        for event in self.events_after(key):
+            positions.apply(event)
+            key = list(event[:3])
+            count += 1
+            applied += 1
+            if count % self.snapshot_every == 0:
+                self.save(positions, key, count)
+                self.snapshot(key, count)
+        self.save(positions, key, count)
+        return applied
+
+    def save(self, positions, key, count):
+        self.conn.executemany("INSERT OR REPLACE INTO positions VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                              positions.rows(positions.dirty))
+        positions.dirty.clear()
+        self.set_state("applied", key)
+        self.set_state("applied_count", count)
+        self.conn.commit()
+
+    def snapshot(self, key, count):
+        cur = self.conn.execute("INSERT INTO snapshots (ts, event_id, leg, events, created_at) VALUES (?, ?, ?, ?, ?)",
+                                list(key) + [count, int(time.time())])
+        self.conn.execute(f"INSERT INTO snapshot_positions SELECT ?, {', '.join(POSITION_COLUMNS)} FROM positions",
+                          (cur.lastrowid,))
+        self.conn.commit()
+
+    def positions(self):
+        """Current positions (amounts in micro-units)."""
+        df = pd.read_sql_query(f"SELECT {', '.join(POSITION_COLUMNS)} FROM positions", self.conn)
+        return df.astype({"outcome_index": "Int64"})
+
+    def positions_at(self, ts):
+        """Positions as of unix time `ts`: the nearest snapshot at or before it plus the events after."""
+        snap = self.conn.execute(
+            "SELECT snapshot_id, ts, event_id, leg FROM snapshots WHERE ts <= ? "
+            "ORDER BY ts DESC, event_id DESC, leg DESC LIMIT 1", (ts,)).fetchone()
+        rows = []
+        if snap is not None:
+            rows = self.conn.execute(f"SELECT {', '.join(POSITION_COLUMNS)} FROM snapshot_positions WHERE snapshot_id = ?",
+                                     (snap[0],)).fetchall()
+        positions = Positions(rows)
+        for event in self.events_after(list(snap[1:4]) if snap else None, until=ts):
+            positions.apply(event)
+        return positions.frame()
+
+    def count(self, table="events"):
+        return self.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+def summarize(df):
+    """Per-user totals of a positions frame, in micro-units."""
+    df = df.assign(open=df['size'] > 0, open_cost=np.where(df['size'] > 0, df['cost'], 0))
+    return df.groupby('user').agg(positions=('asset_id', 'size'), open=('open', 'sum'), cost=('open_cost', 'sum'),
+                                  realized=('realized', 'sum'), redeemed=('redeemed', 'sum'))
+
+def with_avg_cost(df):
+    """Adds avg_cost (USDC per share) to a positions frame."""
+    size = df['size'].to_numpy(float)
+    return df.assign(avg_cost=np.divide(df['cost'].to_numpy(float), size, out=np.zeros_like(size), where=size > 0))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the per-(user, asset) position ledger and query it.")
+    parser.add_argument("--users", nargs="+", help="Addresses to track (default: the tracked user).")
+    parser.add_argument("--at", help="Positions as of a time: unix seconds or UTC '2026-01-06 00:00:00'.")
+    parser.add_argument("--no-refresh", action="store_true", help="Query without reading new events first.")
+    parser.add_argument("--rebuild", action="store_true", help="Drop the ledger and replay every extract.")
+    parser.add_argument("--snapshot-every", type=int, default=SNAPSHOT_EVERY, help="Applied events between snapshots.")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_ROWS, help="Rows per chunk when reading extracts.")
+    parser.add_argument("--output", help="CSV to write the positions (with avg_cost) to.")
+
+    args = parser.parse_args()
+    ledger = PositionLedger(users=args.users, snapshot_every=args.snapshot_every)
+    if args.rebuild:
+        ledger.reset()
+    if not args.no_refresh:
+        ledger.refresh(chunksize=args.chunk_size)
+    df = ledger.positions_at(parse_time(args.at)) if args.at else ledger.positions()
+    print(f"\n--- Position Ledger ({'as of ' + args.at if args.at else 'current'}) ---")
+    print(f"{ledger.count()} events, {ledger.count('snapshots')} snapshots.")
+    for user, row in summarize(df).iterrows():
+        print(f"{user}: {row['positions']} positions ({row['open']} open), open cost ${usd(row['cost'])}, "
+              f"realized ${usd(row['realized'])}, redeemed ${usd(row['redeemed'])}")
+    if args.output:
+        with_avg_cost(df).to_csv(args.output, index=False)
+        print(f"Saved {len(df)} positions to {args.output}.")
+    ledger.close()
@@ -1,170 +1,162 @@
+import argparse
+import numpy as np
 import pandas as pd
 import os
 
+from src.utils.fill_stream import CHUNK_ROWS, iter_fills
+from src.utils.fixed_point import parse_micro, usd
+
 MAKER_FILE = "data/raw/polymarket_jan5_jan6_raw.csv"
 TAKER_FILE = "data/interim/polymarket_jan5_jan6_taker.csv"
+FILLS_FILE = "data/raw/polymarket_jan5_jan6_fills.csv" # Maker + Taker, role-tagged, one row per id
+FILLS_PARQUET = "data/raw/polymarket_jan5_jan6_fills.parquet" # Same, typed columnar (--output ...fills.parquet)
+REDEMPTION_FILE = "data/interim/polymarket_jan5_jan6_redemptions.csv"
 USER_ADDRESS_LOWER = "0x63ce342161250d705dc0b16df89036c8e5f9ba9a"
 
+BREAKDOWN_KEYS = ["user", "market", "day", "role"]
+FLOW_COLUMNS = ["spent", "received", "count_spent", "count_received"]
+
+def fill_sources():
+    if os.path.exists(FILLS_PARQUET):
+        # Single-pass extract is merged by id at extraction time, no dedup needed
+        return [FILLS_PARQUET]
+    if os.path.exists(FILLS_FILE):
+        return [FILLS_FILE]
+    # Legacy maker + taker files overlap (and the taker file may lack a header); iter_fills handles both
+    return [f for f in [MAKER_FILE, TAKER_FILE] if os.path.exists(f)]
+
+def iter_data(chunksize=CHUNK_ROWS):
+    """Yields the user's fills in chunks of at most `chunksize` rows, each id once."""
+    loaded = 0
+    self_matched = 0
+    for chunk in iter_fills(fill_sources(), chunksize):
+        loaded += len(chunk)
+        if 'role' in chunk.columns:
+            self_matched += (chunk['role'] == 'self').sum()
+        yield chunk
+    print(f"Loaded {loaded} unique fills ({self_matched} self-matched).")
+
 def load_data():
-    df_maker = pd.DataFrame()
-    df_taker = pd.DataFrame()
-    
-    if os.path.exists(MAKER_FILE):
-        try:
-            df_maker = pd.read_csv(MAKER_FILE, names=["id", "timestamp", "timestamp_utc", "transactionHash", "maker", "taker", "makerAssetId", "takerAssetId", "makerAmountFilled", "takerAmountFilled"], header=0)
-        except:
-            pass
-            
-    if os.path.exists(TAKER_FILE):
-         try:
-            df_taker = pd.read_csv(TAKER_FILE, names=["id", "timestamp", "timestamp_utc", "transactionHash", "maker", "taker", "makerAssetId", "takerAssetId", "makerAmountFilled", "takerAmountFilled"], header=None) # No header in append mode usually? 
-            # Wait, verify_limit check implies header? extract_subgraph_taker checks exists.
-            # safe logic: header=None if appended? Let's check overlap later.
-            # Best to read carefully.
-            # My extract scripts wrote header only if new file.
-            pass
-         except:
-            pass
-
-    # Re-read properly assuming potential mixed headers or lack thereof
-    # Actually, let's just concat everything and drop duplicates.
-    dfs = []
-    for f in [MAKER_FILE, TAKER_FILE]:
-        if os.path.exists(f):
-            # Try reading with header
-            d = pd.read_csv(f)
-            # If the first row looks like header, fine.
-            if 'makerAssetId' not in d.columns:
-                 # Maybe no header?
-                 d = pd.read_csv(f, names=["id", "timestamp", "timestamp_utc", "transactionHash", "maker", "taker", "makerAssetId", "takerAssetId", "makerAmountFilled", "takerAmountFilled"])
-            dfs.append(d)
-            
-    if not dfs:
-        return pd.DataFrame()
-        
-    full_df = pd.concat(dfs, ignore_index=True)
-    
-    # Deduplicate by ID
-    # Convert ID to string to be safe
-    full_df['id'] = full_df['id'].astype(str)
-    
-    before = len(full_df)
-    full_df = full_df.drop_duplicates(subset=['id'])
-    after = len(full_df)
-    
-    print(f"Loaded {before} events. Unique: {after}.")
-    return full_df
+    chunks = list(iter_data())
+    return pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
+
+def cashflows(df, users=(USER_ADDRESS_LOWER,)):
+    """
+    USDC cashflows of a chunk of fills for each of `users` (lowercase addresses), as int micro-units,
+    broken down by user, market (outcome asset id), day and role with one groupby.
+    Self-matched fills (the same user on both sides) net to zero and are left out.
+    """
+    # Identify Money (Collateral): Asset "0"
+    maker = df['maker'].astype(str).str.lower().to_numpy()
+    taker = df['taker'].astype(str).str.lower().to_numpy()
+    m_usdc = df['makerAssetId'].astype(str).to_numpy() == "0"
+    t_usdc = df['takerAssetId'].astype(str).to_numpy() == "0"
+    m_amt = parse_micro(df['makerAmountFilled'])
+    t_amt = parse_micro(df['takerAmountFilled'])
+    market = np.where(m_usdc, df['takerAssetId'].astype(str), df['makerAssetId'].astype(str))
+    day = df['timestamp_utc'].astype(str).str[:10].to_numpy()
+
+    # Role masks, computed once per chunk
+    self_match = maker == taker
+    is_maker = np.isin(maker, users) & ~self_match
+    is_taker = np.isin(taker, users) & ~self_match
+
+    # A maker GAVE makerAssetId and RECEIVED takerAssetId; a taker the reverse.
+    # Giving USDC is a spend, receiving it is revenue.
+    legs = []
+    for role, mask, user, gave_usdc, gave_amt, got_usdc, got_amt in (
+            ("maker", is_maker, maker, m_usdc, m_amt, t_usdc, t_amt),
+            ("taker", is_taker, taker, t_usdc, t_amt, m_usdc, m_amt)):
+        legs.append(pd.DataFrame({
+            "user": user[mask],
+            "market": market[mask],
+            "day": day[mask],
+            "role": role,
+            "spent": np.where(gave_usdc, gave_amt, 0)[mask],
+            "received": np.where(got_usdc, got_amt, 0)[mask],
+            "count_spent": gave_usdc[mask].astype(np.int64),
+            "count_received": got_usdc[mask].astype(np.int64)
+        }))
+    return aggregate(pd.concat(legs, ignore_index=True))
+
+def aggregate(breakdown):
+    """Sums cashflow rows with the same (user, market, day, role)."""
+    return breakdown.groupby(BREAKDOWN_KEYS, as_index=False, sort=True)[FLOW_COLUMNS].sum()
 
-def calculate_pnl():
-    df = load_data()
-    if df.empty:
+def redemption_payouts(users):
+    """
+    Redemption payouts per user in micro-units. A single user's extract is counted whole;
+    for several users the payouts are split by the 'redeemer' column, which must then exist.
+    """
+    payouts = pd.Series(0, index=users, dtype=np.int64)
+    if not os.path.exists(REDEMPTION_FILE):
+        return payouts
+    try:
+         # extract_redemptions writes the header first, then appends rows with header=False
+         df_red = pd.read_csv(REDEMPTION_FILE)
+    except Exception as e:
+         print(f"Error reading redemptions: {e}")
+         return payouts
+    if 'payout' not in df_red.columns:
+        return payouts
+    # Payout is in USDC base units (6 decimals)
+    payout = pd.Series(parse_micro(df_red['payout']))
+    if len(users) == 1:
+        payouts.iloc[0] = payout.sum()
+    elif 'redeemer' not in df_red.columns:
+        raise ValueError(f"{REDEMPTION_FILE} has no 'redeemer' column, so its payouts cannot be "
+                         f"split between {len(users)} users. Reconcile one user at a time.")
+    else:
+        by_user = payout.groupby(df_red['redeemer'].astype(str).str.lower().to_numpy()).sum()
+        payouts = by_user.reindex(users, fill_value=0).astype(np.int64)
+    return payouts
+
+def calculate_pnl(chunksize=CHUNK_ROWS, users=None, breakdown_file=None):
+    """
+    Realized PnL of every address in `users` (default: the tracked user) in one pass over the fills.
+    Returns (totals per user, breakdown by user/market/day/role), amounts in int micro-units.
+    """
+    users = [u.lower() for u in users] if users else [USER_ADDRESS_LOWER]
+    breakdown = None
+    loaded = 0
+
+    # One bounded chunk of fills at a time; the per-chunk breakdowns are folded together as they come
+    for df in iter_data(chunksize):
+        loaded += len(df)
+        part = cashflows(df, users)
+        breakdown = part if breakdown is None else aggregate(pd.concat([breakdown, part], ignore_index=True))
+
+    if not loaded:
         print("No data loaded.")
         return
 
-    # Normalize Asset IDs (str)
-    df['makerAssetId'] = df['makerAssetId'].astype(str)
-    df['takerAssetId'] = df['takerAssetId'].astype(str)
-    
-    # Identify Money (Collateral)
-    # Asset "0"
-    
-    total_spent = 0
-    total_received = 0
-    
-    # Analysis per row
-    count_spent = 0
-    count_received = 0
-    
-    for idx, row in df.iterrows():
-        maker = str(row['maker']).lower()
-        taker = str(row['taker']).lower()
-        
-        # Determine User Role
-        is_maker = (maker == USER_ADDRESS_LOWER)
-        is_taker = (taker == USER_ADDRESS_LOWER)
-        
-        # Self-Match?
-        if is_maker and is_taker:
-            # User matched with self.
-            # Net Cashflow for User: 
-            #   User Give (as Maker): makerAssetId
-            #   User Receive (as Maker): takerAssetId
-            #   User Give (as Taker): takerAssetId
-            #   User Receive (as Taker): makerAssetId
-            # Net change = 0 for both assets. 
-            # It's a wash trade (or moving liquidity pockets).
-            # Profit impact = 0 (minus fees? Subgraph has 'fee' field? Not in my CSV export!)
-            # Ignoring fees for now.
-            continue
-            
-        # Logic: We strictly care about "Collateral Flow"
-        
-        # IF USER IS MAKER:
-        if is_maker:
-            # User GAVE makerAssetId.
-            if row['makerAssetId'] == "0": 
-                # User GAVE Money -> Spent
-                amt = float(row['makerAmountFilled']) / 1e6
-                total_spent += amt
-                count_spent += 1
-            
-            # User RECEIVED takerAssetId.
-            if row['takerAssetId'] == "0":
-                # User RECEIVED Money -> Earned
-                amt = float(row['takerAmountFilled']) / 1e6
-                total_received += amt
-                count_received += 1
-                
-        # IF USER IS TAKER:
-        if is_taker:
-            # User GAVE takerAssetId.
-            if row['takerAssetId'] == "0":
-                # User GAVE Money -> Spent
-                amt = float(row['takerAmountFilled']) / 1e6
-                total_spent += amt
-                count_spent += 1
-                
-            # User RECEIVED makerAssetId.
-            if row['makerAssetId'] == "0":
-                # User RECEIVED Money -> Earned
-                amt = float(row['makerAmountFilled']) / 1e6
-                total_received += amt
-                count_received += 1
-
-    net_pnl = total_received - total_spent
-    
-    print("\n--- PnL Reconcilation (Jan 5-6) ---")
-    print(f"Total Spent (Buy Cost):     ${total_spent:,.2f}  ({count_spent} trades)")
-    print(f"Total Received (Sell Rev):  ${total_received:,.2f}  ({count_received} trades)")
-    print(f"Net Realized Cashflow (Trades): ${net_pnl:,.2f}")
-    
-    # Redemptions
-    REDEMPTION_FILE = "data/interim/polymarket_jan5_jan6_redemptions.csv"
-    total_payout = 0
-    if os.path.exists(REDEMPTION_FILE):
-        try:
-             df_red = pd.read_csv(REDEMPTION_FILE, names=["id", "timestamp", "timestamp_utc", "redeemer", "payout", "condition"], header=None)
-             # Basic check if header exists or not
-             # My extract script wrote header=False?
-             # extract_redemptions: pd.DataFrame(columns=...).to_csv(output_file, index=False)
-             # Then mode='a', header=False.
-             # So FIRST write had header. 
-             # Let's read with header=0.
-             df_red = pd.read_csv(REDEMPTION_FILE)
-             if 'payout' in df_red.columns:
-                 # Payout is usually in units (likely same 6 decimals? or 1e6?)
-                 # Introspection just said 'payout'.
-                 # Usually USDC checks out.
-                 market_payouts = df_red['payout'].astype(float)
-                 total_payout = market_payouts.sum() / 1e6
-        except Exception as e:
-             print(f"Error reading redemptions: {e}")
-
-    final_profit = net_pnl + total_payout
-    print(f"Total Redemption Payouts:   ${total_payout:,.2f}")
-    print(f"FINAL REALIZED PROFIT:      ${final_profit:,.2f}")
+    totals = breakdown.groupby('user')[FLOW_COLUMNS].sum().reindex(users, fill_value=0)
+    totals['net'] = totals['received'] - totals['spent']
+    totals['payout'] = redemption_payouts(users)
+    totals['profit'] = totals['net'] + totals['payout']
+
+    for user, row in totals.iterrows():
+        print("\n--- PnL Reconcilation (Jan 5-6) ---")
+        if len(users) > 1:
+            print(f"User: {user}")
+        print(f"Total Spent (Buy Cost):     ${usd(row['spent'])}  ({row['count_spent']} trades)")
+        print(f"Total Received (Sell Rev):  ${usd(row['received'])}  ({row['count_received']} trades)")
+        print(f"Net Realized Cashflow (Trades): ${usd(row['net'])}")
+        print(f"Total Redemption Payouts:   ${usd(row['payout'])}")
+        print(f"FINAL REALIZED PROFIT:      ${usd(row['profit'])}")
     
     print("\nNote: This calculation assumes all payouts and costs are in USDC (6 decimals).")
 
+    if breakdown_file:
+        breakdown.to_csv(breakdown_file, index=False)
+        print(f"Saved {len(breakdown)} rows of cashflow by user, market, day and role to {breakdown_file}.")
+    return totals, breakdown
+
 if __name__ == "__main__":
-    calculate_pnl()
+    parser = argparse.ArgumentParser(description="Reconcile realized PnL from the fill and redemption extracts.")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_ROWS, help="Fills per chunk (bounds memory).")
+    parser.add_argument("--users", nargs="+", help="Addresses to reconcile in one pass (default: the tracked user).")
+    parser.add_argument("--breakdown", help="CSV to write the cashflow breakdown by user, market, day and role to.")
+
+    args = parser.parse_args()
+    calculate_pnl(args.chunk_size, args.users, args.breakdown)
@@ -5,6 +5,8 @@ from datetime import datetime
 import warnings
 warnings.filterwarnings("ignore")
 
+from src.utils.fixed_point import MICRO, dollar_to_micro, dollars_to_micro, parse_micro, usd
+
 # Files
 GOLDSKY_ENRICHED = "data/final/polymarket_jan5_jan6_enriched.csv"
 GOLDSKY_REDEMPTIONS = "data/interim/polymarket_jan5_jan6_redemptions.csv"
@@ -21,6 +23,7 @@ def get_goldsky_pnl():
     PnL = (Sell Volume - Buy Volume) + Redemption Payouts
     Note: 'volume_usdc' in enriched is strictly the value transacted.
     We need to check 'side'.
+    Returns int micro-units.
     """
     print("--- Source 1: Goldsky API (Orderbook + Activity) ---")
     
@@ -45,11 +48,17 @@ def get_goldsky_pnl():
         # Columns: timestamp_utc, market_title, outcome, side, price, size, volume_usdc, ...
         # Sample rows showed 'BUY'.
         
-        spent = df_trades[df_trades['side'] == 'BUY']['volume_usdc'].sum()
-        received = df_trades[df_trades['side'] == 'SELL']['volume_usdc'].sum()
+        # Exact micro-unit column when the enrich step wrote it, else the decimal one
+        if 'volume_micro' in df_trades.columns:
+            volume = parse_micro(df_trades['volume_micro'])
+        else:
+            volume = dollars_to_micro(df_trades['volume_usdc'])
+        side = df_trades['side'].to_numpy()
+        spent = int(volume[side == 'BUY'].sum())
+        received = int(volume[side == 'SELL'].sum())
         
         trade_pnl = received - spent
-        print(f"Trades: Bought ${spent:,.2f}, Sold ${received:,.2f} -> Net: ${trade_pnl:,.2f}")
+        print(f"Trades: Bought ${usd(spent)}, Sold ${usd(received)} -> Net: ${usd(trade_pnl)}")
         
     except Exception as e:
         print(f"Error reading trades: {e}")
@@ -67,13 +76,13 @@ def get_goldsky_pnl():
         mask = (df_red['dt'] >= datetime.utcfromtimestamp(START_TS)) & (df_red['dt'] < datetime.utcfromtimestamp(END_TS))
         df_red = df_red[mask]
         
-        redemption_payout = df_red['payout'].astype(float).sum() / 1e6 # Base units usually 1e6 for USDC?
+        redemption_payout = int(parse_micro(df_red['payout']).sum()) # Base units usually 1e6 for USDC?
         # Check raw values in file.
         # If extract_redemptions didn't normalize, raw values are huge integers (6 decimals).
         # Let's peek at a value (heuristic). If > 1,000,000 for a normal trade, it's 6 decimals.
         # Safe bet is / 1e6.
         
-        print(f"Redemptions: ${redemption_payout:,.2f} (Count: {len(df_red)})")
+        print(f"Redemptions: ${usd(redemption_payout)} (Count: {len(df_red)})")
         
     except Exception as e:
         print(f"Error reading redemptions: {e}")
@@ -110,14 +119,14 @@ def get_scraper_pnl():
             print("Insufficient data.")
             return 0
             
-        pnl_start = float(start_rec['PnL_Value'].values[0])
-        pnl_end = float(end_rec['PnL_Value'].values[0])
+        pnl_start = dollar_to_micro(start_rec['PnL_Value'].values[0])
+        pnl_end = dollar_to_micro(end_rec['PnL_Value'].values[0])
         
         ts_start = start_rec['Date_Readable'].values[0]
         ts_end = end_rec['Date_Readable'].values[0]
         
-        print(f"Snapshot Start ({ts_start}): ${pnl_start:,.2f}")
-        print(f"Snapshot End   ({ts_end}):   ${pnl_end:,.2f}")
+        print(f"Snapshot Start ({ts_start}): ${usd(pnl_start)}")
+        print(f"Snapshot End   ({ts_end}):   ${usd(pnl_end)}")
         
         return pnl_end - pnl_start
         
@@ -137,7 +146,7 @@ def get_subgraph_pnl():
             
         print(f"Block {data['start_block']} -> {data['end_block']}")
         print(f"Value: ${data['pnl_start']:,.2f} -> ${data['pnl_end']:,.2f}")
-        return data['net_profit']
+        return dollar_to_micro(data['net_profit'])
     except Exception as e:
         print(f"Error: {e}")
         return 0
@@ -152,14 +161,14 @@ def main():
     print("\n=== FINAL COMPARISON (Jan 5 - Jan 7) ===")
     print(f"{'Source':<25} | {'Net Profit':>15} | {'Delta vs Basis':>15}")
     print("-" * 60)
-    print(f"{'1. Goldsky API (Calc)':<25} | ${pnl_1:>14,.2f} | {'BASIS':>15}")
-    print(f"{'2. Web Scraper':<25} | ${pnl_2:>14,.2f} | ${pnl_2 - pnl_1:>14,.2f}")
-    print(f"{'3. PnL Subgraph':<25} | ${pnl_3:>14,.2f} | ${pnl_3 - pnl_1:>14,.2f}")
+    print(f"{'1. Goldsky API (Calc)':<25} | ${usd(pnl_1):>14} | {'BASIS':>15}")
+    print(f"{'2. Web Scraper':<25} | ${usd(pnl_2):>14} | ${usd(pnl_2 - pnl_1):>14}")
+    print(f"{'3. PnL Subgraph':<25} | ${usd(pnl_3):>14} | ${usd(pnl_3 - pnl_1):>14}")
     print("-" * 60)
     
     # Match Analysis
     diff_subgraph = abs(pnl_3 - pnl_1)
-    if diff_subgraph < 100:
+    if diff_subgraph < 100 * MICRO:
         print("\n✅ Goldsky Transaction Data matches Subgraph PnL closely.")
     else:
         print("\n⚠️ Significant discrepancy between Transaction Data and Subgraph.")
@@ -0,0 +1,135 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from src.utils.market_store import MARKET_STORE_FILE, MarketStore
+
+# Binary asset id -> outcome lookup table, built from the market store.
+#
+#   data/interim/asset_index/keys.npy      sorted S32: each asset id as a 32-byte big-endian uint256
+#   data/interim/asset_index/rows.npy      int32, rows[i] = outcome row of keys[i]
+#   data/interim/asset_index/outcomes.csv  one row per (market, outcome): title, slug, outcome, condition, ...
+#
+# Decimal clob token ids, computed position ids and 0x hex spellings all map to the same
+# canonical key, so one binary search per distinct asset replaces the decimal-then-hex dict
+# probing. The key and row arrays are memory-mapped (no parsing at load); lookup_rows()
+# takes a whole column and returns an int32 row per value, -1 where unknown. The index is
+# rebuilt whenever the market store has changed since it was written.
+
+ASSET_INDEX_DIR = "data/interim/asset_index"
+KEY_DTYPE = "S32"
+OUTCOME_COLUMNS = ["market_id", "condition_id", "outcome_index", "outcome", "title", "slug", "closed", "resolution"]
+
+def canonical_key(value):
+    """32-byte big-endian key of an asset id given in decimal or 0x hex, or None if it is not one."""
+    text = str(value).strip()
+    try:
+        number = int(text, 16) if text.lower().startswith("0x") else int(text)
+        return number.to_bytes(32, "big")
+    except (ValueError, OverflowError):
+        return None
+
+def canonical_keys(values):
+    """
+    Keys for a column of asset ids, converting each distinct value once.
+    Returns (keys, valid): an S32 array aligned with `values` and a mask of parseable ids.
+    """
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object).astype(str), sort=False)
+    unique_keys = [canonical_key(u) for u in uniques]
+    valid_unique = np.array([k is not None for k in unique_keys] + [False], dtype=bool)
+    table = np.array([k or b"" for k in unique_keys] + [b""], dtype=KEY_DTYPE)
+    # factorize marks missing values with -1, which picks the trailing invalid slot
+    return table[codes], valid_unique[codes]
+
+class AssetIndex:
+    """Memory-mapped sorted asset keys with int32 outcome rows."""
+
+    def __init__(self, path=ASSET_INDEX_DIR):
+        self.path = path
+        self.keys = np.load(os.path.join(path, "keys.npy"), mmap_mode="r")
+        self.rows = np.load(os.path.join(path, "rows.npy"), mmap_mode="r")
+        self.outcomes = pd.read_csv(os.path.join(path, "outcomes.csv"),
+                                    dtype={"market_id": str, "condition_id": str, "outcome": str, "title": str, "slug": str})
+
+    def __len__(self):
+        return len(self.keys)
+
+    def lookup_rows(self, values):
+        """Outcome row of every asset id in `values` (int32, -1 where unknown)."""
+        keys, valid = canonical_keys(values)
+        result = np.full(len(keys), -1, dtype=np.int32)
+        if not len(self.keys) or not len(keys):
+            return result
+        pos = np.searchsorted(self.keys, keys)
+        pos = np.minimum(pos, len(self.keys) - 1)
+        hit = valid & (self.keys[pos] == keys)
+        result[hit] = self.rows[pos[hit]]
+        return result
+
+    def lookup(self, values, columns=None):
+        """Outcome fields (title, outcome, slug, ...) aligned with `values`; NaN where unknown."""
+        rows = self.lookup_rows(values)
+        outcomes = self.outcomes if columns is None else self.outcomes[columns]
+        return outcomes.reindex(rows).reset_index(drop=True)
+
+def store_fingerprint(store_path):
+    """Latest modification time of the store (sqlite WAL writes land in the -wal file first)."""
+    times = [os.path.getmtime(p) for p in (store_path, f"{store_path}-wal") if os.path.exists(p)]
+    return max(times) if times else 0.0
+
+def build_asset_index(store_path=MARKET_STORE_FILE, path=ASSET_INDEX_DIR):
+    """Writes the index files for every asset id in the market store. Returns the number of keys."""
+    store = MarketStore(store_path)
+    table = store.outcome_table()
+    store.close()
+    return write_asset_index(table, path)
+
+def write_asset_index(table, path=ASSET_INDEX_DIR):
+    """Writes the index files for an outcome table (MarketStore.outcome_table() columns). Returns the number of keys."""
+    outcomes = table.drop_duplicates(["market_id", "outcome_index"])[OUTCOME_COLUMNS].reset_index(drop=True)
+    row_of = pd.Series(np.arange(len(outcomes), dtype=np.int32),
+                       index=pd.MultiIndex.from_frame(outcomes[["market_id", "outcome_index"]]))
+    rows = row_of.reindex(pd.MultiIndex.from_frame(table[["market_id", "outcome_index"]])).to_numpy(np.int32)
+
+    keys, valid = canonical_keys(table["asset_id"])
+    keys, rows = keys[valid], rows[valid]
+    order = np.argsort(keys, kind="stable")
+    keys, rows = keys[order], rows[order]
+    # The same id under two spellings (decimal and hex) collapses to one key
+    first = np.ones(len(keys), dtype=bool)
+    first[1:] = keys[1:] != keys[:-1]
+
+    os.makedirs(path, exist_ok=True)
+    for name, array in (("keys.npy", keys[first]), ("rows.npy", rows[first])):
+        tmp = os.path.join(path, f".{name}.tmp")
+        with open(tmp, "wb") as f:
+            np.save(f, array)
+        os.replace(tmp, os.path.join(path, name))
+    tmp = os.path.join(path, ".outcomes.csv.tmp")
+    outcomes.to_csv(tmp, index=False)
+    os.replace(tmp, os.path.join(path, "outcomes.csv"))
+    return int(first.sum())
+
+def get_asset_index(store_path=MARKET_STORE_FILE, path=ASSET_INDEX_DIR):
+    """Loads the index, rebuilding it first if the market store changed since it was written."""
+    keys_file = os.path.join(path, "keys.npy")
+    if not os.path.exists(keys_file) or os.path.getmtime(keys_file) < store_fingerprint(store_path):
+        count = build_asset_index(store_path, path)
+        print(f"Built asset index {path} with {count} asset ids.")
+    return AssetIndex(path)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the binary asset id index and look ids up in it.")
+    parser.add_argument("asset_ids", nargs="*", help="Asset ids (decimal or 0x hex) to look up.")
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild even if the index is current.")
+
+    args = parser.parse_args()
+    if args.rebuild:
+        print(f"Built asset index with {build_asset_index()} asset ids.")
+    index = get_asset_index()
+    if args.asset_ids:
+        print(pd.concat([pd.Series(args.asset_ids, name="asset_id"), index.lookup(args.asset_ids)], axis=1).to_string())
+    else:
+        print(f"{len(index)} asset ids, {len(index.outcomes)} outcomes in {index.path}.")
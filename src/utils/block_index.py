@@ -0,0 +1,191 @@
+import argparse
+import os
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+
+import numpy as np
+
+from src.utils.block_resolver import rpc_batch
+from src.utils.endpoints import POLYGON_RPC
+from src.utils.coverage import parse_ts
+
+# Local timestamp -> block index for PnL time travel.
+# A sorted array of (block_number, timestamp) samples is kept on disk and grown lazily:
+# a lookup first bisects the samples in memory, and only if no two adjacent blocks
+# bracket the timestamp does it probe eth_getBlockByNumber, using interpolation search
+# (Polygon blocks are ~2s apart, so a guess from the bracketing samples is usually
+# within a few blocks). Every probed block becomes a sample, so boundaries near each
+# other, or asked again later, resolve without any RPC. The probes of many timestamps
+# go out together as one JSON-RPC batch per search round.
+#
+#   python -m src.utils.block_index 2026-01-05 2026-01-07 1767600000
+
+BLOCK_INDEX_FILE = "data/interim/block_index.npy"
+BLOCK_TIME_GUESS = 2.0
+MAX_ROUNDS = 64
+
+class BlockIndex:
+    """Sorted (block, timestamp) samples with exact 'first block at or after ts' lookups."""
+
+    def __init__(self, path=BLOCK_INDEX_FILE, rpc_url=POLYGON_RPC):
+        self.path = path
+        self.rpc_url = rpc_url
+        self.blocks = []
+        self.times = []
+        self.dirty = False
+        self.rpc_calls = 0
+        self.lock = threading.Lock()
+        if os.path.exists(path):
+            samples = np.load(path)
+            self.blocks = samples[:, 0].tolist()
+            self.times = samples[:, 1].tolist()
+
+    def save(self):
+        """Persists the samples (atomically) if any were added."""
+        if not self.dirty:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, np.array([self.blocks, self.times], dtype=np.int64).T.reshape(-1, 2))
+        os.replace(tmp, self.path)
+        self.dirty = False
+
+    def add(self, block, ts):
+        i = bisect_left(self.blocks, block)
+        if i < len(self.blocks) and self.blocks[i] == block:
+            return
+        self.blocks.insert(i, block)
+        self.times.insert(i, ts)
+        self.dirty = True
+
+    def probe(self, numbers):
+        """Fetches the timestamps of `numbers` ("latest" allowed) in one batch and adds them as samples."""
+        calls = [("eth_getBlockByNumber", [n if n == "latest" else hex(n), False]) for n in numbers]
+        self.rpc_calls += len(calls)
+        results = rpc_batch(calls, self.rpc_url)
+        found = []
+        for block in results:
+            if block and block.get("timestamp"):
+                number, ts = int(block["number"], 16), int(block["timestamp"], 16)
+                self.add(number, ts)
+                found.append((number, ts))
+        return found
+
+    def bracket(self, ts):
+        """
+        Returns (lo, hi) sample positions with times[lo] < ts <= times[hi], using None
+        for a missing side. Timestamps are non-decreasing in the block number.
+        """
+        i = bisect_left(self.times, ts)
+        lo = i - 1 if i > 0 else None
+        hi = i if i < len(self.times) else None
+        return lo, hi
+
+    def resolved(self, ts):
+        """The first block at or after ts if the samples already pin it down, else None."""
+        lo, hi = self.bracket(ts)
+        if hi is None:
+            return None
+        if lo is None:
+            return self.blocks[hi] if self.blocks[hi] == 0 else None
+        return self.blocks[hi] if self.blocks[hi] - self.blocks[lo] == 1 else None
+
+    def next_guess(self, ts):
+        """Next block to probe for ts: interpolated between its brackets, or extrapolated below the known range."""
+        lo, hi = self.bracket(ts)
+        if hi is None:
+            # Newer than every sample, including the chain head
+            return None
+        b_hi, t_hi = self.blocks[hi], self.times[hi]
+        if lo is None:
+            return max(0, b_hi - int((t_hi - ts) / BLOCK_TIME_GUESS) - 1)
+        b_lo, t_lo = self.blocks[lo], self.times[lo]
+        guess = b_lo + int((ts - t_lo) * (b_hi - b_lo) / max(1, t_hi - t_lo))
+        return min(max(guess, b_lo + 1), b_hi - 1)
+
+    def blocks_for_timestamps(self, timestamps):
+        """
+        Returns {ts: (block, block_ts)} with the first block whose timestamp is >= ts,
+        or None for timestamps past the chain head / that could not be resolved.
+        """
+        with self.lock:
+            wanted = sorted(set(int(t) for t in timestamps))
+            results = {}
+            head_checked = False
+            for _ in range(MAX_ROUNDS):
+                pending = []
+                for ts in wanted:
+                    if ts in results:
+                        continue
+                    block = self.resolved(ts)
+                    if block is not None:
+                        results[ts] = (block, self.times[bisect_left(self.blocks, block)])
+                    else:
+                        pending.append(ts)
+                if not pending:
+                    break
+                if not head_checked:
+                    # The head bounds every search from above
+                    head_checked = True
+                    if not self.probe(["latest"]):
+                        print("Block index: could not read the chain head.")
+                        break
+                    continue
+
+                guesses = set()
+                for ts in pending:
+                    guess = self.next_guess(ts)
+                    if guess is None:
+                        results[ts] = None
+                    else:
+                        guesses.add(guess)
+                # Bisection alongside interpolation keeps the worst case logarithmic
+                for ts in pending:
+                    lo, hi = self.bracket(ts)
+                    if lo is not None and hi is not None and self.blocks[hi] - self.blocks[lo] > 64:
+                        guesses.add((self.blocks[lo] + self.blocks[hi]) // 2)
+                guesses -= set(self.blocks)
+                if guesses and not self.probe(sorted(guesses)):
+                    print("Block index: RPC returned no blocks. Giving up on the remaining timestamps.")
+                    break
+            self.save()
+            return {ts: results.get(ts) for ts in wanted}
+
+    def block_for_timestamp(self, ts):
+        """The first block at or after ts, as (block, block_ts), or None."""
+        return self.blocks_for_timestamps([ts])[int(ts)]
+
+    def block_before(self, ts):
+        """The last block strictly before ts, as (block, block_ts), or None."""
+        found = self.block_for_timestamp(ts)
+        if found is None or found[0] == 0:
+            return None
+        block = found[0] - 1
+        i = bisect_right(self.blocks, block) - 1
+        if i >= 0 and self.blocks[i] == block:
+            return block, self.times[i]
+        return None
+
+_default_index = None
+
+def get_block_index():
+    """Process-wide index backed by BLOCK_INDEX_FILE."""
+    global _default_index
+    if _default_index is None:
+        _default_index = BlockIndex()
+    return _default_index
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resolve timestamps to Polygon blocks via the local block index.")
+    parser.add_argument("timestamps", nargs="+", help="Unix seconds or YYYY-MM-DD (UTC).")
+
+    args = parser.parse_args()
+    index = get_block_index()
+    for ts, found in index.blocks_for_timestamps([parse_ts(t) for t in args.timestamps]).items():
+        if found:
+            print(f"{datetime.fromtimestamp(ts)} ({ts}) -> block {found[0]} (at {datetime.fromtimestamp(found[1])})")
+        else:
+            print(f"{datetime.fromtimestamp(ts)} ({ts}) -> not resolved")
+    print(f"{len(index.blocks)} samples in {index.path}, {index.rpc_calls} RPC lookups this run.")
@@ -0,0 +1,129 @@
+import argparse
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from src.utils import http_client
+from src.utils.endpoints import POLYGON_RPC
+
+# Resolves transaction hashes to block numbers as a separate, batched stage.
+# Hashes are deduplicated first (fills that share a transaction cost one lookup), looked up
+# in a persistent sqlite cache shared by every run and user, and only the misses go to the
+# RPC as JSON-RPC batch arrays of eth_getTransactionReceipt, a few batches at a time.
+#
+#   python -m src.utils.block_resolver --input data/raw/polymarket_user_transactions.csv
+#
+# fills the block_number column of an existing activity extract in place.
+
+BLOCK_CACHE_FILE = "data/interim/tx_blocks.sqlite"
+RPC_BATCH_SIZE = 50
+RPC_WORKERS = 4
+
+class TxBlockCache:
+    """Persistent tx_hash -> block_number map (sqlite, safe to share between threads)."""
+
+    def __init__(self, path=BLOCK_CACHE_FILE):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS tx_blocks (tx_hash TEXT PRIMARY KEY, block_number INTEGER NOT NULL)")
+        self.conn.commit()
+
+    def get_many(self, hashes):
+        found = {}
+        hashes = list(hashes)
+        with self.lock:
+            for i in range(0, len(hashes), 500):
+                chunk = hashes[i:i + 500]
+                marks = ",".join("?" * len(chunk))
+                for tx_hash, block in self.conn.execute(
+                        f"SELECT tx_hash, block_number FROM tx_blocks WHERE tx_hash IN ({marks})", chunk):
+                    found[tx_hash] = block
+        return found
+
+    def put_many(self, blocks):
+        with self.lock:
+            self.conn.executemany("INSERT OR REPLACE INTO tx_blocks VALUES (?, ?)", list(blocks.items()))
+            self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+def rpc_batch(calls, url=POLYGON_RPC):
+    """
+    Sends [(method, params), ...] as one JSON-RPC batch. Returns the results in call order
+    (None for calls that failed). Providers that reject batches get the calls split in half.
+    """
+    payload = [{"jsonrpc": "2.0", "id": i, "method": method, "params": params} for i, (method, params) in enumerate(calls)]
+    try:
+        r = http_client.post(url, json=payload, timeout=30)
+        r.raise_for_status()
+        data = r.json()
+    except http_client.HTTP_ERRORS + (ValueError,) as e:
+        data = {"error": str(e)}
+    if not isinstance(data, list):
+        if len(calls) == 1:
+            print(f"RPC call {calls[0][0]} failed: {data.get('error') if isinstance(data, dict) else data}")
+            return [None]
+        mid = len(calls) // 2
+        return rpc_batch(calls[:mid], url) + rpc_batch(calls[mid:], url)
+    by_id = {item.get("id"): item.get("result") for item in data if isinstance(item, dict)}
+    return [by_id.get(i) for i in range(len(calls))]
+
+def fetch_receipt_blocks(hashes, url=POLYGON_RPC):
+    receipts = rpc_batch([("eth_getTransactionReceipt", [h]) for h in hashes], url)
+    return {h: int(r["blockNumber"], 16) for h, r in zip(hashes, receipts) if r and r.get("blockNumber")}
+
+def resolve_blocks(tx_hashes, cache=None, batch_size=RPC_BATCH_SIZE, workers=RPC_WORKERS, url=POLYGON_RPC):
+    """
+    Returns {tx_hash: block_number} for every hash that could be resolved.
+    Cached hashes cost nothing; new ones are fetched in batches and cached as they arrive.
+    """
+    own_cache = cache is None
+    cache = cache or TxBlockCache()
+    unique = sorted({h.lower() for h in tx_hashes if isinstance(h, str) and h.startswith("0x")})
+    blocks = cache.get_many(unique)
+    missing = [h for h in unique if h not in blocks]
+    if missing:
+        batches = [missing[i:i + batch_size] for i in range(0, len(missing), batch_size)]
+
+        def run(batch):
+            found = fetch_receipt_blocks(batch, url)
+            if found:
+                cache.put_many(found)
+            return found
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for found in pool.map(run, batches):
+                blocks.update(found)
+        print(f"Resolved {len(unique)} transactions: {len(unique) - len(missing)} cached, "
+              f"{len(blocks) - (len(unique) - len(missing))} fetched in {len(batches)} RPC batches, "
+              f"{len(unique) - len(blocks)} unresolved.")
+    if own_cache:
+        cache.close()
+    return blocks
+
+def fill_block_numbers(df, hash_column="transaction_hash", block_column="block_number", **kwargs):
+    """Fills df[block_column] from the resolver, one lookup per distinct transaction."""
+    blocks = resolve_blocks(df[hash_column].dropna().unique(), **kwargs)
+    df[block_column] = df[hash_column].str.lower().map(blocks).astype("Int64")
+    return df
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fill block numbers for an activity extract via batched JSON-RPC.")
+    parser.add_argument("--input", default="data/raw/polymarket_user_transactions.csv", help="Activity CSV to update in place.")
+    parser.add_argument("--batch-size", type=int, default=RPC_BATCH_SIZE, help="Receipts per JSON-RPC batch.")
+    parser.add_argument("--workers", type=int, default=RPC_WORKERS, help="Concurrent RPC batches.")
+
+    args = parser.parse_args()
+    df = pd.read_csv(args.input, dtype={"transaction_hash": str})
+    fill_block_numbers(df, batch_size=args.batch_size, workers=args.workers)
+    tmp = f"{args.input}.tmp"
+    df.to_csv(tmp, index=False)
+    os.replace(tmp, args.input)
+    print(f"Updated {args.input}: {df['block_number'].notna().sum()} of {len(df)} rows have a block number.")
@@ -0,0 +1,86 @@
+import json
+import os
+
+from src.utils.columnar import is_columnar, part_files, rewind_parts
+
+# Cursor checkpoints for long-running extraction jobs.
+# One small JSON file per job, replaced atomically after every flushed page:
+#   {"job": ..., "window": [min_ts, max_ts], "cursor": {...}, "rows": N, "bytes": B, "done": false}
+# `bytes` is the size of the output file once the page was fsync'd, so a restart
+# can cut off anything written after the last committed page and resume the cursor.
+# For a columnar (.parquet) output, `parts` counts the committed row-group files instead.
+CHECKPOINT_DIR = "data/interim/checkpoints"
+
+def checkpoint_path(job):
+    return os.path.join(CHECKPOINT_DIR, f"{job}.json")
+
+def write_json_atomic(path, payload):
+    """Writes JSON to a temp file, fsyncs it and renames it over `path`."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(payload, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def load_checkpoint(job, window=None):
+    """
+    Returns the saved state for `job`, or None if there is nothing to resume.
+    A checkpoint recorded for a different time window is ignored.
+    """
+    path = checkpoint_path(job)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r") as f:
+            state = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Ignoring unreadable checkpoint {path}: {e}")
+        return None
+    if window is not None and state.get("window") != list(window):
+        print(f"Checkpoint {path} is for window {state.get('window')}, not {list(window)}. Starting fresh.")
+        return None
+    return state
+
+def save_checkpoint(job, window, cursor, rows, output_file, done=False):
+    state = {
+        "job": job,
+        "window": list(window),
+        "cursor": cursor,
+        "rows": rows,
+        "bytes": os.path.getsize(output_file) if os.path.isfile(output_file) else 0,
+        "parts": len(part_files(output_file)) if is_columnar(output_file) else 0,
+        "done": done
+    }
+    write_json_atomic(checkpoint_path(job), state)
+    return state
+
+def clear_checkpoint(job):
+    path = checkpoint_path(job)
+    if os.path.exists(path):
+        os.remove(path)
+
+def rewind_output(output_file, state):
+    """
+    Truncates output_file back to the last committed page recorded in `state`.
+    Returns False if the file is missing or shorter than the checkpoint, i.e. it cannot be resumed.
+    """
+    if is_columnar(output_file):
+        return rewind_parts(output_file, state.get("parts", 0))
+    committed = state.get("bytes", 0)
+    size = os.path.getsize(output_file) if os.path.exists(output_file) else 0
+    if size < committed:
+        print(f"{output_file} is shorter than its checkpoint ({size} < {committed} bytes). Cannot resume.")
+        return False
+    if size > committed:
+        with open(output_file, "r+b") as f:
+            f.truncate(committed)
+    return True
+
+def append_page(df, output_file):
+    """Appends a page of rows to a CSV and fsyncs it, so a checkpoint taken afterwards is durable."""
+    with open(output_file, "a", newline="") as f:
+        df.to_csv(f, header=False, index=False)
+        f.flush()
+        os.fsync(f.fileno())
@@ -0,0 +1,148 @@
+import os
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+# Typed columnar output for the raw extracts.
+# An output path ending in .parquet is a directory of part files, one row group each:
+#
+#   data/raw/polymarket_jan5_jan6_fills.parquet/part-000000.parquet
+#                                              /part-000001.parquet ...
+#
+# A part is written to a hidden temp file, fsync'd and renamed into place, so readers
+# (and a resumed extractor) only ever see whole row groups. Timestamps and amounts are
+# int64 (USDC and share amounts are 6-decimal base units), addresses, hashes and the
+# 256-bit asset ids are dictionary-encoded strings.
+
+ROW_GROUP_ROWS = 131072
+PART_PREFIX = "part-"
+
+INT_COLUMNS = {"timestamp", "timestamp_unix", "makerAmountFilled", "takerAmountFilled", "payout"}
+DICT_COLUMNS = {"transactionHash", "transaction_hash", "maker", "taker", "makerAssetId", "takerAssetId",
+                "asset_id", "role", "redeemer", "condition_id", "indexSets"}
+
+def is_columnar(path):
+    return path.endswith(".parquet")
+
+def require_pyarrow():
+    if not HAS_PYARROW:
+        raise ImportError("Parquet output needs pyarrow (pip install pyarrow). Use a .csv output instead.")
+
+def part_files(path):
+    """Committed part files of a dataset, in write order."""
+    if not os.path.isdir(path):
+        return []
+    return sorted(os.path.join(path, name) for name in os.listdir(path)
+                  if name.startswith(PART_PREFIX) and name.endswith(".parquet"))
+
+def to_table(df):
+    """Converts a page of extract rows (as parsed from the API or a CSV) to typed Arrow columns."""
+    arrays = []
+    for column in df.columns:
+        values = df[column]
+        if column in INT_COLUMNS:
+            arrays.append(pa.array(pd.to_numeric(values).astype("int64").to_numpy(), type=pa.int64()))
+        elif column in DICT_COLUMNS:
+            arrays.append(pa.array(values.astype(str), type=pa.string()).dictionary_encode())
+        else:
+            arrays.append(pa.array(values.astype(str), type=pa.string()))
+    return pa.Table.from_arrays(arrays, names=list(df.columns))
+
+def write_part(df, path):
+    """Commits `df` as the next part (a single row group) of the dataset at `path`."""
+    require_pyarrow()
+    os.makedirs(path, exist_ok=True)
+    name = f"{PART_PREFIX}{len(part_files(path)):06d}.parquet"
+    tmp = os.path.join(path, f".{name}.tmp")
+    table = to_table(df)
+    pq.write_table(table, tmp, row_group_size=max(1, len(df)), compression="zstd")
+    with open(tmp, "rb") as f:
+        os.fsync(f.fileno())
+    os.replace(tmp, os.path.join(path, name))
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def rewind_parts(path, parts):
+    """Drops parts written after the first `parts`. Returns False if fewer than that exist."""
+    files = part_files(path)
+    if len(files) < parts:
+        print(f"{path} has {len(files)} parts, fewer than its checkpoint ({parts}). Cannot resume.")
+        return False
+    for extra in files[parts:]:
+        os.remove(extra)
+    return True
+
+def read_columnar(path, columns=None, categoricals=True):
+    """
+    Loads a dataset into pandas. Dictionary columns come back as categoricals, or as
+    plain strings with categoricals=False (for code that groups or compares on them as text).
+    """
+    require_pyarrow()
+    files = part_files(path)
+    if not files:
+        return pd.DataFrame(columns=columns or [])
+    table = pq.ParquetDataset(files).read(columns=columns)
+    if not categoricals:
+        for i, field in enumerate(table.schema):
+            if pa.types.is_dictionary(field.type):
+                table = table.set_column(i, field.name, table.column(i).cast(field.type.value_type))
+    return table.to_pandas()
+
+def iter_columnar(path, chunksize, columns=None):
+    """Yields a dataset as DataFrames of at most `chunksize` rows, dictionary columns as plain strings."""
+    require_pyarrow()
+    for part in part_files(path):
+        for batch in pq.ParquetFile(part).iter_batches(batch_size=chunksize, columns=columns):
+            table = pa.Table.from_batches([batch])
+            for i, field in enumerate(table.schema):
+                if pa.types.is_dictionary(field.type):
+                    table = table.set_column(i, field.name, table.column(i).cast(field.type.value_type))
+            yield table.to_pandas()
+
+class PartWriter:
+    """
+    Buffers rows and commits them as one-row-group parts of ROW_GROUP_ROWS rows.
+    append()/writerow() return True when a part was committed, i.e. everything handed
+    in so far is durable. Pages arrive as DataFrames, merged rows as plain lists.
+    """
+
+    def __init__(self, path, columns, row_group_rows=ROW_GROUP_ROWS):
+        require_pyarrow()
+        self.path = path
+        self.columns = columns
+        self.row_group_rows = row_group_rows
+        self.frames = []
+        self.rows = []
+        self.buffered = 0
+        os.makedirs(path, exist_ok=True)
+
+    def append(self, df):
+        if len(df):
+            self.frames.append(df[self.columns])
+            self.buffered += len(df)
+        return self.flush() if self.buffered >= self.row_group_rows else False
+
+    def writerow(self, row):
+        self.rows.append(row)
+        self.buffered += 1
+        return self.flush() if self.buffered >= self.row_group_rows else False
+
+    def flush(self):
+        if not self.buffered:
+            return False
+        if self.rows:
+            self.frames.append(pd.DataFrame(self.rows, columns=self.columns))
+        write_part(pd.concat(self.frames, ignore_index=True), self.path)
+        self.frames = []
+        self.rows = []
+        self.buffered = 0
+        return True
@@ -0,0 +1,130 @@
+import csv
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+from src.utils.checkpoint import write_json_atomic
+from src.utils.columnar import is_columnar, read_columnar
+
+# Coverage index for incremental (--sync) extraction.
+# A sidecar `<output>.coverage.json` next to each extract lists the [start_ts, end_ts)
+# windows that were downloaded completely, e.g. {"intervals": [[1767571200, 1767744000]]}.
+# A sync run only fetches the parts of the requested window that are not covered yet.
+
+# Never mark anything newer than this as covered: the subgraph indexer and the
+# data-api lag the chain by a few blocks, so the most recent seconds may still fill in.
+SYNC_SAFETY_LAG = 120
+
+def coverage_path(output_file):
+    return f"{output_file}.coverage.json"
+
+def normalize(intervals):
+    """Sorts and merges overlapping or touching [lo, hi) intervals."""
+    merged = []
+    for lo, hi in sorted((int(lo), int(hi)) for lo, hi in intervals if hi > lo):
+        if merged and lo <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], hi)
+        else:
+            merged.append([lo, hi])
+    return merged
+
+def load_coverage(output_file):
+    path = coverage_path(output_file)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return normalize(json.load(f).get("intervals", []))
+
+def save_coverage(output_file, intervals):
+    write_json_atomic(coverage_path(output_file), {"intervals": normalize(intervals)})
+
+def mark_covered(output_file, start_ts, end_ts):
+    """Records [start_ts, end_ts) as fully downloaded."""
+    intervals = load_coverage(output_file) or []
+    intervals.append([start_ts, end_ts])
+    save_coverage(output_file, intervals)
+
+def missing_intervals(intervals, start_ts, end_ts):
+    """Returns the sub-windows of [start_ts, end_ts) not covered by `intervals`."""
+    gaps = []
+    cursor = start_ts
+    for lo, hi in normalize(intervals):
+        if hi <= cursor:
+            continue
+        if lo >= end_ts:
+            break
+        if lo > cursor:
+            gaps.append((cursor, lo))
+        cursor = max(cursor, hi)
+    if cursor < end_ts:
+        gaps.append((cursor, end_ts))
+    return gaps
+
+def sync_horizon(end_ts):
+    """Caps a sync window at the point where the sources are known to be settled."""
+    return min(end_ts, int(time.time()) - SYNC_SAFETY_LAG)
+
+def high_water_mark(output_file, ts_column="timestamp", id_column="id"):
+    """
+    Scans an existing extract for its timestamp range.
+    Returns (min_ts, max_ts, ids_at_max_ts), or None if the file has no rows.
+    The last second may be incomplete, so its ids are returned for deduplication.
+    """
+    if not os.path.exists(output_file):
+        return None
+    if is_columnar(output_file):
+        df = read_columnar(output_file, [ts_column, id_column])
+        if df.empty:
+            return None
+        max_ts = int(df[ts_column].max())
+        return int(df[ts_column].min()), max_ts, set(df.loc[df[ts_column] == max_ts, id_column].astype(str))
+    min_ts = max_ts = None
+    ids_at_max = set()
+    with open(output_file, newline="") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            try:
+                ts = int(float(row[ts_column]))
+            except (KeyError, TypeError, ValueError):
+                continue
+            if min_ts is None or ts < min_ts:
+                min_ts = ts
+            if max_ts is None or ts > max_ts:
+                max_ts = ts
+                ids_at_max = set()
+            if ts == max_ts:
+                ids_at_max.add(row.get(id_column))
+    if max_ts is None:
+        return None
+    return min_ts, max_ts, ids_at_max
+
+def plan_sync(output_file, start_ts, end_ts, ts_column="timestamp", id_column="id"):
+    """
+    Works out which windows a sync run still has to fetch.
+    Returns (gaps, skip_ids). Without a coverage index the existing output is
+    treated as covering [its first timestamp, its last timestamp), and the ids
+    already stored for the last second are returned so they are not written twice.
+    """
+    end_ts = sync_horizon(end_ts)
+    if end_ts <= start_ts:
+        return [], set()
+    intervals = load_coverage(output_file)
+    skip_ids = set()
+    if intervals is None:
+        mark = high_water_mark(output_file, ts_column, id_column)
+        intervals = []
+        if mark:
+            min_ts, max_ts, skip_ids = mark
+            intervals = [[min_ts, max_ts]]
+            save_coverage(output_file, intervals)
+            print(f"No coverage index for {output_file}. High-water mark: {max_ts}.")
+    return missing_intervals(intervals, start_ts, end_ts), skip_ids
+
+def parse_ts(value):
+    """Parses a CLI time bound: unix seconds, YYYY-MM-DD (UTC) or 'now'."""
+    if value == "now":
+        return int(time.time())
+    if str(value).isdigit():
+        return int(value)
+    return int(datetime.strptime(value, "%Y-%m-%d").replace(tzinfo=timezone.utc).timestamp())
@@ -0,0 +1,171 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+try:
+    from Crypto.Hash import keccak as _keccak
+    HAS_PYCRYPTODOME = True
+except ImportError:
+    HAS_PYCRYPTODOME = False
+
+# Batch CTF collection ids without web3.
+# Keccak-256 is implemented on numpy uint64 lanes with one row per message, so all the
+# (conditionId, indexSet) pairs of a market set are hashed together: 24 rounds of array
+# operations instead of a keccak call per outcome. The token id of an outcome is
+#
+#   keccak256(parentCollectionId (0) ++ conditionId ++ indexSet (uint256, 1 << outcome index))
+#
+# read as a big-endian integer (the same packing build_market_map used with web3).
+# Results are memoized per conditionId, and very large batches can be spread over
+# processes with workers > 1.
+#
+#   python -m src.utils.ctf_ids --bench 200000
+
+RATE_BYTES = 136
+MEMO_MAX_CONDITIONS = 500000
+PARALLEL_MIN = 100000
+
+ROUND_CONSTANTS = [
+    0x0000000000000001, 0x0000000000008082, 0x800000000000808A, 0x8000000080008000,
+    0x000000000000808B, 0x0000000080000001, 0x8000000080008081, 0x8000000000008009,
+    0x000000000000008A, 0x0000000000000088, 0x0000000080008009, 0x000000008000000A,
+    0x000000008000808B, 0x800000000000008B, 0x8000000000008089, 0x8000000000008003,
+    0x8000000000008002, 0x8000000000000080, 0x000000000000800A, 0x800000008000000A,
+    0x8000000080008081, 0x8000000000008080, 0x0000000080000001, 0x8000000080008008,
+]
+# Rotation offsets r[x][y] of lane (x, y)
+ROTATIONS = [
+    [0, 36, 3, 41, 18],
+    [1, 44, 10, 45, 2],
+    [62, 6, 43, 15, 61],
+    [28, 55, 25, 21, 56],
+    [27, 20, 39, 8, 14],
+]
+
+_RC = [np.uint64(c) for c in ROUND_CONSTANTS]
+
+def _rotl(lane, n):
+    if n == 0:
+        return lane
+    return (lane << np.uint64(n)) | (lane >> np.uint64(64 - n))
+
+def _keccak_f(state):
+    """keccak-f[1600] in place on a list of 25 uint64 arrays (lane x + 5y)."""
+    for rc in _RC:
+        c = [state[x] ^ state[x + 5] ^ state[x + 10] ^ state[x + 15] ^ state[x + 20] for x in range(5)]
+        d = [c[(x - 1) % 5] ^ _rotl(c[(x + 1) % 5], 1) for x in range(5)]
+        b = [None] * 25
+        for x in range(5):
+            for y in range(5):
+                b[y + 5 * ((2 * x + 3 * y) % 5)] = _rotl(state[x + 5 * y] ^ d[x], ROTATIONS[x][y])
+        for y in range(5):
+            row = b[5 * y:5 * y + 5]
+            for x in range(5):
+                state[x + 5 * y] = row[x] ^ (~row[(x + 1) % 5] & row[(x + 2) % 5])
+        state[0] = state[0] ^ rc
+
+def keccak256_batch(messages):
+    """
+    Keccak-256 of every row of `messages`, a (N, L) uint8 array of equal-length messages.
+    Returns a (N, 32) uint8 array of digests.
+    """
+    messages = np.ascontiguousarray(messages, dtype=np.uint8)
+    n, length = messages.shape
+    blocks = length // RATE_BYTES + 1
+    padded = np.zeros((n, blocks * RATE_BYTES), dtype=np.uint8)
+    padded[:, :length] = messages
+    padded[:, length] ^= 0x01
+    padded[:, -1] ^= 0x80
+    lanes = padded.view("<u8").reshape(n, blocks, RATE_BYTES // 8)
+
+    state = [np.zeros(n, dtype=np.uint64) for _ in range(25)]
+    for block in range(blocks):
+        for i in range(RATE_BYTES // 8):
+            state[i] = state[i] ^ lanes[:, block, i]
+        _keccak_f(state)
+    return np.stack(state[:4], axis=1).astype("<u8").view(np.uint8).reshape(n, 32)
+
+def keccak256(data):
+    """Keccak-256 of one byte string (pycryptodome when installed)."""
+    if HAS_PYCRYPTODOME:
+        return _keccak.new(digest_bits=256, data=bytes(data)).digest()
+    return keccak256_batch(np.frombuffer(bytes(data), dtype=np.uint8).reshape(1, -1))[0].tobytes()
+
+def _hash_pairs(conditions, index_sets):
+    """Token ids (decimal strings) for aligned lists of condition id bytes and index sets."""
+    n = len(conditions)
+    packed = np.zeros((n, 96), dtype=np.uint8)
+    packed[:, 32:64] = np.frombuffer(b"".join(conditions), dtype=np.uint8).reshape(n, 32)
+    packed[:, 64:96] = np.frombuffer(b"".join(s.to_bytes(32, "big") for s in index_sets), dtype=np.uint8).reshape(n, 32)
+    digests = keccak256_batch(packed).tobytes()
+    return [str(int.from_bytes(digests[i * 32:i * 32 + 32], "big")) for i in range(n)]
+
+_memo = {}
+
+def collection_ids(condition_ids, index_sets, workers=1):
+    """
+    Token ids (decimal strings) for aligned sequences of condition ids (0x hex) and index sets.
+    Pairs with a malformed condition id get None.
+    """
+    if len(_memo) > MEMO_MAX_CONDITIONS:
+        _memo.clear()
+    keys = [(str(c).lower(), int(s)) for c, s in zip(condition_ids, index_sets)]
+    todo = sorted({k for k in keys if k[1] not in _memo.get(k[0], {})})
+    conditions = []
+    todo_keys = []
+    for condition, index_set in todo:
+        try:
+            raw = bytes.fromhex(condition[2:] if condition.startswith("0x") else condition)
+        except ValueError:
+            raw = b""
+        if len(raw) != 32:
+            _memo.setdefault(condition, {})[index_set] = None
+            continue
+        conditions.append(raw)
+        todo_keys.append((condition, index_set))
+    todo_sets = [index_set for _, index_set in todo_keys]
+
+    if conditions:
+        if workers > 1 and len(conditions) >= PARALLEL_MIN:
+            step = -(-len(conditions) // workers)
+            chunks = [(conditions[i:i + step], todo_sets[i:i + step]) for i in range(0, len(conditions), step)]
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                ids = [t for part in pool.map(_hash_chunk, chunks) for t in part]
+        else:
+            ids = _hash_pairs(conditions, todo_sets)
+        for (condition, index_set), token in zip(todo_keys, ids):
+            _memo.setdefault(condition, {})[index_set] = token
+    return [_memo.get(c, {}).get(s) for c, s in keys]
+
+def _hash_chunk(chunk):
+    return _hash_pairs(*chunk)
+
+def outcome_position_ids(markets, workers=1):
+    """
+    Position id rows for markets given as (market_id, condition_id, outcomes):
+    (asset_id, market_id, condition_id, outcome_index, outcome) with index set 1 << outcome_index.
+    """
+    flat = [(market_id, condition, i, label) for market_id, condition, outcomes in markets
+            for i, label in enumerate(outcomes)]
+    ids = collection_ids([f[1] for f in flat], [1 << f[2] for f in flat], workers=workers)
+    return [(token, market_id, condition, i, label)
+            for token, (market_id, condition, i, label) in zip(ids, flat) if token]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compute CTF outcome token ids in batch.")
+    parser.add_argument("condition_ids", nargs="*", help="0x condition ids; prints the ids of outcome 0 and 1.")
+    parser.add_argument("--bench", type=int, default=0, help="Time N random condition ids x 2 outcomes.")
+    parser.add_argument("--workers", type=int, default=1, help="Processes for large batches.")
+
+    args = parser.parse_args()
+    for condition in args.condition_ids:
+        print(condition, collection_ids([condition, condition], [1, 2]))
+    if args.bench:
+        conditions = ["0x" + os.urandom(32).hex() for _ in range(args.bench)]
+        start = time.time()
+        ids = collection_ids(conditions * 2, [1] * args.bench + [2] * args.bench, workers=args.workers)
+        elapsed = time.time() - start
+        print(f"{len(ids)} ids in {elapsed:.2f}s ({len(ids) / elapsed:,.0f} ids/s, workers={args.workers}).")
@@ -0,0 +1,30 @@
+import os
+
+# Base URLs for every external API the extractors talk to.
+# Each can be overridden from the environment; POLYMARKET_STANDIN_URL points all of them at
+# a local stand-in server (see standin_server.py) for offline benchmarks and replay tests:
+#
+#   python -m src.utils.standin_server --port 8765
+#   POLYMARKET_STANDIN_URL=http://127.0.0.1:8765 python -m src.extractors.extract_subgraph --role both
+
+STANDIN_URL = os.environ.get("POLYMARKET_STANDIN_URL", "").rstrip("/")
+
+def _base(env_name, default, standin_path):
+    if os.environ.get(env_name):
+        return os.environ[env_name].rstrip("/")
+    if STANDIN_URL:
+        return f"{STANDIN_URL}/{standin_path}"
+    return default
+
+GOLDSKY_BASE = _base("POLYMARKET_GOLDSKY_BASE", "https://api.goldsky.com/api/public/project_cl6mb8i9h0003e201j6li0diw", "goldsky")
+GAMMA_BASE = _base("POLYMARKET_GAMMA_BASE", "https://gamma-api.polymarket.com", "gamma")
+DATA_API_BASE = _base("POLYMARKET_DATA_API_BASE", "https://data-api.polymarket.com", "data-api")
+POLYGON_RPC = _base("POLYMARKET_POLYGON_RPC", "https://polygon-rpc.com", "rpc")
+
+ORDERBOOK_SUBGRAPH_URL = f"{GOLDSKY_BASE}/subgraphs/orderbook-subgraph/0.0.1/gn"
+ACTIVITY_SUBGRAPH_URL = f"{GOLDSKY_BASE}/subgraphs/activity-subgraph/0.0.4/gn"
+PNL_SUBGRAPH_URL = f"{GOLDSKY_BASE}/subgraphs/pnl-subgraph/0.0.14/gn"
+
+GAMMA_MARKETS_URL = f"{GAMMA_BASE}/markets"
+GAMMA_EVENTS_URL = f"{GAMMA_BASE}/events"
+DATA_API_ACTIVITY_URL = f"{DATA_API_BASE}/activity"
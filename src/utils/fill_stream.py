@@ -0,0 +1,79 @@
+import os
+import sqlite3
+import tempfile
+
+import pandas as pd
+
+from src.utils.columnar import is_columnar, iter_columnar
+from src.utils.fixed_point import AMOUNT_COLUMNS, parse_micro
+
+# Out-of-core reading of fill extracts.
+# Fills are yielded in chunks of CHUNK_ROWS rows, so memory stays flat however many
+# months of fills are processed. A single merged extract (extract_subgraph.py --role both)
+# is already unique by id. When several files are combined (the legacy maker + taker pair)
+# ids are deduplicated against a disk-backed seen-set (a temporary sqlite table), keeping
+# the first occurrence in file order like concat + drop_duplicates did. Amount columns
+# come out as int64 micro-units (see fixed_point.py).
+
+CHUNK_ROWS = 250000
+FILL_COLUMNS = ["id", "timestamp", "timestamp_utc", "transactionHash", "maker", "taker",
+                "makerAssetId", "takerAssetId", "makerAmountFilled", "takerAmountFilled"]
+STR_COLUMNS = {"id": str, "transactionHash": str, "maker": str, "taker": str, "makerAssetId": str, "takerAssetId": str}
+
+class SeenIds:
+    """Disk-backed set of ids (sqlite in a temporary directory)."""
+
+    def __init__(self):
+        self.tmpdir = tempfile.TemporaryDirectory(prefix="seen_ids_")
+        self.conn = sqlite3.connect(os.path.join(self.tmpdir.name, "seen.sqlite"))
+        self.conn.execute("PRAGMA journal_mode=OFF")
+        self.conn.execute("PRAGMA synchronous=OFF")
+        self.conn.execute("CREATE TABLE seen (id TEXT PRIMARY KEY)")
+
+    def new_mask(self, ids):
+        """Marks the ids not seen before (first occurrence within `ids` too) and records them."""
+        ids = pd.Series(ids, dtype=str).reset_index(drop=True)
+        first = ~ids.duplicated()
+        unique = ids[first].tolist()
+        known = set()
+        for i in range(0, len(unique), 500):
+            chunk = unique[i:i + 500]
+            marks = ",".join("?" * len(chunk))
+            known.update(r[0] for r in self.conn.execute(f"SELECT id FROM seen WHERE id IN ({marks})", chunk))
+        mask = first & ~ids.isin(known)
+        self.conn.executemany("INSERT INTO seen VALUES (?)", ((i,) for i in ids[mask]))
+        self.conn.commit()
+        return mask.to_numpy()
+
+    def close(self):
+        self.conn.close()
+        self.tmpdir.cleanup()
+
+def read_csv_chunks(path, chunksize):
+    """CSV chunks of one extract; header-less files get FILL_COLUMNS, stray header rows are dropped."""
+    header = pd.read_csv(path, nrows=0).columns
+    names = None if "makerAssetId" in header else FILL_COLUMNS
+    for chunk in pd.read_csv(path, chunksize=chunksize, names=names, header=None if names else 0, dtype=STR_COLUMNS):
+        yield chunk[chunk["makerAmountFilled"].astype(str) != "makerAmountFilled"]
+
+def iter_fills(paths, chunksize=CHUNK_ROWS):
+    """
+    Yields the fills of `paths` (CSV or Parquet extracts) as DataFrames of at most `chunksize` rows,
+    each id once.
+    """
+    seen = SeenIds() if len(paths) > 1 else None
+    try:
+        for path in paths:
+            chunks = iter_columnar(path, chunksize) if is_columnar(path) else read_csv_chunks(path, chunksize)
+            for chunk in chunks:
+                if seen is not None:
+                    chunk = chunk[seen.new_mask(chunk["id"])]
+                if len(chunk):
+                    chunk = chunk.reset_index(drop=True)
+                    # Amounts are parsed once here into int64 micro-units
+                    for column in AMOUNT_COLUMNS:
+                        chunk[column] = parse_micro(chunk[column])
+                    yield chunk
+    finally:
+        if seen is not None:
+            seen.close()
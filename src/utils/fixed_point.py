@@ -0,0 +1,42 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+import numpy as np
+import pandas as pd
+
+# Fixed-point amounts for the PnL pipeline.
+# USDC and outcome-share amounts arrive as 6-decimal base-unit integer strings
+# (makerAmountFilled, takerAmountFilled, payout). They are parsed once into int64
+# micro-units and stay integers through enrichment, cashflow sums and reconciliation;
+# only reports turn them into dollars. int64 holds about 9.2 trillion USDC in micro-units.
+
+MICRO = 1_000_000
+AMOUNT_COLUMNS = ["makerAmountFilled", "takerAmountFilled"]
+
+def parse_micro(values):
+    """Base-unit integer amounts (strings, ints, or integral floats from older CSVs) as an int64 array."""
+    series = pd.Series(values)
+    if pd.api.types.is_integer_dtype(series.dtype):
+        return series.to_numpy(np.int64)
+    try:
+        return series.astype(np.int64).to_numpy()
+    except (TypeError, ValueError, OverflowError):
+        return np.rint(pd.to_numeric(series, errors="coerce").fillna(0)).astype(np.int64).to_numpy()
+
+def dollars_to_micro(values):
+    """Decimal dollar amounts (e.g. an already-scaled CSV column) as int64 micro-units."""
+    return np.rint(pd.to_numeric(pd.Series(values), errors="coerce").fillna(0).to_numpy(float) * MICRO).astype(np.int64)
+
+def dollar_to_micro(value):
+    """One decimal dollar amount (number or string) as int micro-units, rounded half-up."""
+    return int((Decimal(str(value)) * MICRO).to_integral_value(ROUND_HALF_UP))
+
+def to_dollars(micro):
+    """Micro-units as float dollars, for CSV columns and ratios."""
+    return np.asarray(micro) / MICRO if np.ndim(micro) else int(micro) / MICRO
+
+def usd(micro):
+    """Micro-units as a cents string ("-1,234.57"), rounded half-up from the exact integer."""
+    micro = int(micro)
+    cents = (abs(micro) + 5000) // 10000
+    sign = "-" if micro < 0 and cents else ""
+    return f"{sign}{cents // 100:,}.{cents % 100:02d}"
@@ -1,7 +1,6 @@
-import requests
 from datetime import datetime
 
-SUBGRAPH_URL = "https://api.goldsky.com/api/public/project_cl6mb8i9h0003e201j6li0diw/subgraphs/orderbook-subgraph/0.0.1/gn"
+from src.utils.block_index import get_block_index
 
 # Jan 5 00:00 UTC
 START_TS = 1767571200
@@ -11,34 +10,12 @@ END_TS = 1767744000
 def get_block(timestamp, direction="asc"):
     # If asc, we want the first block AFTER timestamp.
     # If desc, we want the last block BEFORE timestamp.
-    
-    order = "asc" if direction == "asc" else "desc"
-    comp = "gte" if direction == "asc" else "lt"
-    
-    query = f"""
-    query {{
-      orderFilledEvents(
-        first: 1,
-        orderBy: timestamp,
-        orderDirection: {order},
-        where: {{ timestamp_{comp}: {timestamp} }}
-      ) {{
-        blockNumber
-        timestamp
-        transactionHash
-      }}
-    }}
-    """
-    try:
-        r = requests.post(SUBGRAPH_URL, json={'query': query})
-        data = r.json()
-        events = data.get('data', {}).get('orderFilledEvents', [])
-        if events:
-            return events[0]
-        return None
-    except Exception as e:
-        print(f"Error: {e}")
+    # Both come from the local block index (eth_getBlockByNumber search, cached on disk).
+    index = get_block_index()
+    found = index.block_for_timestamp(timestamp) if direction == "asc" else index.block_before(timestamp)
+    if found is None:
         return None
+    return {"blockNumber": found[0], "timestamp": found[1]}
 
 print(f"Finding blocks for range: {datetime.fromtimestamp(START_TS)} to {datetime.fromtimestamp(END_TS)}")
 
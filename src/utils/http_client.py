@@ -0,0 +1,122 @@
+import os
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.utils.rate_control import get_controller
+
+try:
+    import httpx
+    import h2  # noqa: F401  (httpx needs it for HTTP/2)
+    HAS_HTTP2 = True
+except ImportError:
+    HAS_HTTP2 = False
+
+# One pooled HTTP client shared by every extractor.
+# Connections are kept alive per host, so pages after the first skip the TCP + TLS handshake.
+# Every attempt goes through the host's rate controller (rate_control.py); transport errors
+# and 5xx/429 responses are retried, with the controller's backoff (and Retry-After) as the
+# delay between attempts. HTTP/2 is used when httpx and h2 are installed.
+#
+#   POLYMARKET_HTTP_POOL_SIZE=32   connections kept per host (default 16, the controller's max concurrency)
+#   POLYMARKET_HTTP2=0             stay on HTTP/1.1 even if httpx is available
+#   POLYMARKET_HTTP_RETRIES=3      retries per request
+
+POOL_SIZE = int(os.environ.get("POLYMARKET_HTTP_POOL_SIZE", 16))
+USE_HTTP2 = HAS_HTTP2 and os.environ.get("POLYMARKET_HTTP2", "1") != "0"
+RETRIES = int(os.environ.get("POLYMARKET_HTTP_RETRIES", 3))
+DEFAULT_TIMEOUT = 30
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Everything a caller needs to catch for a failed request, whichever backend is in use
+HTTP_ERRORS = (requests.RequestException, httpx.HTTPError) if HAS_HTTP2 else (requests.RequestException,)
+
+_client = None
+_client_lock = threading.Lock()
+_metrics = {}
+_metrics_lock = threading.Lock()
+
+def create_session(pool_size=POOL_SIZE):
+    """A requests session with a keep-alive pool of `pool_size` connections per host."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def create_http2_client(pool_size=POOL_SIZE):
+    limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+    return httpx.Client(transport=httpx.HTTPTransport(http2=True, limits=limits, retries=1))
+
+def get_client():
+    """The process-wide session (httpx.Client with HTTP/2, else requests.Session)."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = create_http2_client() if USE_HTTP2 else create_session()
+        return _client
+
+def record(host, latency, response=None, error=False, retry=False):
+    with _metrics_lock:
+        m = _metrics.setdefault(host, {"requests": 0, "errors": 0, "retries": 0, "bytes": 0, "latency_total": 0.0})
+        m["requests"] += 1
+        m["latency_total"] += latency
+        m["errors"] += error
+        m["retries"] += retry
+        if response is not None:
+            m["bytes"] += len(response.content)
+            m["http_version"] = getattr(response, "http_version", "HTTP/1.1")
+
+def request(method, url, retries=RETRIES, timeout=DEFAULT_TIMEOUT, **kwargs):
+    """
+    Sends one request through the shared pool and the host's rate controller.
+    Retries transport errors and RETRY_STATUSES up to `retries` times; the last response
+    (possibly an error status) is returned, the last transport error is raised.
+    """
+    client = get_client()
+    controller = get_controller(url)
+    host = urlparse(url).netloc or url
+    for attempt in range(retries + 1):
+        started = time.monotonic()
+        try:
+            response = controller.request(lambda: client.request(method, url, timeout=timeout, **kwargs))
+        except HTTP_ERRORS:
+            record(host, time.monotonic() - started, error=True, retry=attempt < retries)
+            if attempt == retries:
+                raise
+            continue
+        failed = response.status_code in RETRY_STATUSES
+        record(host, time.monotonic() - started, response, error=failed, retry=failed and attempt < retries)
+        if not failed or attempt == retries:
+            return response
+        # The controller has already backed off (and honours Retry-After) before the next attempt
+
+def get(url, params=None, **kwargs):
+    return request("GET", url, params=params, **kwargs)
+
+def post(url, json=None, **kwargs):
+    return request("POST", url, json=json, **kwargs)
+
+def pool_connections(host):
+    """Connections opened to `host` so far (requests backend only, else None)."""
+    client = get_client()
+    if not isinstance(client, requests.Session):
+        return None
+    adapter = client.get_adapter(f"https://{host}")
+    total = 0
+    for key in list(adapter.poolmanager.pools.keys()):
+        if key.key_host == host.split(":")[0]:
+            total += adapter.poolmanager.pools[key].num_connections
+    return total
+
+def host_metrics():
+    """Per-host request, retry, error, byte and latency counters, plus the connections opened."""
+    with _metrics_lock:
+        snapshot = {host: dict(m) for host, m in _metrics.items()}
+    for host, m in snapshot.items():
+        m["avg_latency"] = round(m.pop("latency_total") / m["requests"], 3) if m["requests"] else 0.0
+        m["connections"] = pool_connections(host)
+    return snapshot
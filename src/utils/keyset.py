@@ -0,0 +1,125 @@
+import os
+from datetime import datetime
+
+import pandas as pd
+
+from src.utils.checkpoint import load_checkpoint, save_checkpoint, rewind_output, append_page
+from src.utils.columnar import is_columnar, PartWriter
+from src.utils.subgraph_client import Enum, SubgraphError, subquery
+
+# Keyset (id_gt) pagination over a subgraph entity inside a [min_ts, max_ts) window.
+# Many cursors advance in lockstep: every round, each active cursor contributes its next
+# page as one aliased sub-query, and the client packs them into as few requests as it can.
+
+PAGE_SIZE = 1000
+MAX_FAILURES = 5
+
+class KeysetCursor:
+    """
+    Pages one entity by id within a time window and appends each page to a CSV.
+    The cursor is checkpointed after every page, so an interrupted run resumes where it stopped.
+    Events whose id is in skip_ids are already stored and are not written again.
+    A .parquet output is written in row groups; the checkpoint then only advances when a
+    row group is committed, and pages buffered since are re-fetched after a crash.
+    """
+
+    def __init__(self, label, field, where, selection, to_row, columns, min_ts, max_ts, output_file, skip_ids=None):
+        self.label = label
+        self.field = field
+        self.where = where
+        self.selection = selection
+        self.to_row = to_row
+        self.columns = columns
+        self.window = (min_ts, max_ts)
+        self.output_file = output_file
+        self.skip_ids = skip_ids
+        self.job = os.path.splitext(os.path.basename(output_file))[0]
+        self.last_id = ""
+        self.total_count = 0
+        self.done = False
+        self.writer = PartWriter(output_file, columns) if is_columnar(output_file) else None
+
+        state = load_checkpoint(self.job, self.window)
+        if state and "last_id" in state.get("cursor", {}) and rewind_output(output_file, state):
+            self.last_id = state["cursor"]["last_id"]
+            self.total_count = state["rows"]
+            self.done = state.get("done", False)
+            if self.done:
+                print(f"{label} Already complete. {self.total_count} events.")
+            else:
+                print(f"{label} Resuming after {self.total_count} events (last id {self.last_id}).")
+
+        if not os.path.exists(output_file) and self.writer is None:
+            pd.DataFrame(columns=columns).to_csv(output_file, index=False)
+
+    def subquery(self):
+        min_ts, max_ts = self.window
+        where = dict(self.where)
+        where.update({"timestamp_gte": str(min_ts), "timestamp_lt": str(max_ts), "id_gt": self.last_id})
+        args = {"first": PAGE_SIZE, "orderBy": Enum("id"), "orderDirection": Enum("asc"), "where": where}
+        return subquery(self.field, args, self.selection, final_at=max_ts)
+
+    def consume(self, events):
+        """Writes one page and commits the cursor that points past it. An empty page finishes the cursor."""
+        if not events:
+            self.done = True
+            if self.writer is not None:
+                self.writer.flush()
+            save_checkpoint(self.job, self.window, {"last_id": self.last_id}, self.total_count, self.output_file, done=True)
+            print(f"{self.label} Done. {self.total_count} events.")
+            return
+
+        rows = [self.to_row(ev) for ev in events if not (self.skip_ids and ev["id"] in self.skip_ids)]
+        page = pd.DataFrame(rows, columns=self.columns)
+        self.total_count += len(rows)
+        self.last_id = events[-1]["id"]
+        if self.writer is None:
+            append_page(page, self.output_file)
+            save_checkpoint(self.job, self.window, {"last_id": self.last_id}, self.total_count, self.output_file)
+        elif self.writer.append(page):
+            save_checkpoint(self.job, self.window, {"last_id": self.last_id}, self.total_count, self.output_file)
+
+        last_ts_disp = datetime.fromtimestamp(int(events[-1]["timestamp"])).strftime("%Y-%m-%d %H:%M:%S")
+        print(f"{self.label} Fetched {self.total_count} events. Last: {last_ts_disp}")
+
+def run_cursors(cursors, client, workers=1):
+    """
+    Advances all cursors until each has hit an empty page.
+    Each round sends the next page of every active cursor through the batching client;
+    pacing between rounds is left to the client's rate controller.
+    A failed round backs the controller off and counts against the cursor that caused it
+    (every active cursor when the client cannot tell); a cursor that fails MAX_FAILURES
+    rounds in a row is dropped, and once the others finish a SubgraphError names it.
+    Its checkpoint is kept, so a re-run resumes it.
+    Returns the total number of rows written.
+    """
+    active = [c for c in cursors if not c.done]
+    failures = {}
+    dropped = []
+    while active:
+        subqueries = [c.subquery() for c in active]
+        try:
+            pages = client.execute(subqueries, workers=workers)
+        except SubgraphError as e:
+            failed = [c for c, sq in zip(active, subqueries) if sq is e.subquery] or active
+            # GraphQL errors arrive inside HTTP 200s, which the rate controller counted as successes
+            client.controller.backoff()
+            for cursor in failed:
+                failures[cursor] = failures.get(cursor, 0) + 1
+                print(f"{cursor.label} Error (attempt {failures[cursor]}/{MAX_FAILURES}): {e}")
+                if failures[cursor] >= MAX_FAILURES:
+                    print(f"{cursor.label} Giving up after {MAX_FAILURES} failed attempts at id > {cursor.last_id!r}.")
+                    dropped.append(cursor)
+            active = [c for c in active if c not in dropped]
+            continue
+
+        for cursor, events in zip(active, pages):
+            # A missing alias means that sub-query did not run; retry it next round
+            if events is not None:
+                failures.pop(cursor, None)
+                cursor.consume(events)
+        active = [c for c in active if not c.done]
+    if dropped:
+        raise SubgraphError(f"{len(dropped)} cursor(s) failed {MAX_FAILURES} times in a row and were not completed: "
+                            + ", ".join(f"{c.label} (after id {c.last_id!r})" for c in dropped))
+    return sum(c.total_count for c in cursors)
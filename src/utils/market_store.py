@@ -0,0 +1,325 @@
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from src.utils.ctf_ids import outcome_position_ids
+from src.utils.endpoints import GAMMA_MARKETS_URL
+from src.utils.rate_control import get_controller
+from src.utils import http_client
+
+# Persistent Gamma market metadata, shared by build_market_map, enrich_data and enrich_pnl.
+#
+#   markets     one row per market: condition id, question, slug, outcomes, closed, resolution
+#   outcomes    one row per tradable asset id -> (market, condition, outcome index, label).
+#               `kind` is 'clob' for Gamma's clobTokenIds, 'position' for computed CTF ids
+#   sync_state  per crawl window, the newest updatedAt already stored
+#
+# refresh() walks a window newest-updatedAt first and stops at the first page that is
+# older than the window's watermark, so a re-run only downloads markets created or
+# changed since the last sync. resolve() is the on-demand path: given the asset ids
+# (and condition ids) that actually appear in the fills, it asks Gamma only for the ones
+# the store does not know yet, in concurrent batched clob_token_ids / condition_ids
+# queries. Lookups are indexed sqlite queries, no crawl.
+#
+#   python -m src.utils.market_store --start 2026-01-05T00:00:00Z --end 2026-01-07T00:00:00Z
+
+MARKET_STORE_FILE = "data/interim/markets.sqlite"
+PAGE_LIMIT = 100
+TOKEN_BATCH = 50
+RESOLVE_WORKERS = 4
+UNRESOLVED_TTL = 86400
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS markets (
+    id TEXT PRIMARY KEY,
+    condition_id TEXT,
+    question TEXT,
+    slug TEXT,
+    outcomes TEXT,
+    closed INTEGER,
+    end_date TEXT,
+    updated_at TEXT,
+    resolution INTEGER
+);
+CREATE INDEX IF NOT EXISTS markets_condition ON markets (condition_id);
+CREATE TABLE IF NOT EXISTS outcomes (
+    asset_id TEXT PRIMARY KEY,
+    market_id TEXT NOT NULL,
+    condition_id TEXT,
+    outcome_index INTEGER,
+    outcome TEXT,
+    kind TEXT
+);
+CREATE INDEX IF NOT EXISTS outcomes_condition ON outcomes (condition_id, outcome_index);
+CREATE TABLE IF NOT EXISTS sync_state (window TEXT PRIMARY KEY, updated_at TEXT);
+CREATE TABLE IF NOT EXISTS unresolved (asset_id TEXT PRIMARY KEY, checked_at INTEGER);
+"""
+
+def parse_list(value):
+    """Gamma returns list fields either as JSON strings or as lists."""
+    if isinstance(value, list):
+        return value
+    if isinstance(value, str):
+        try:
+            parsed = json.loads(value)
+            return parsed if isinstance(parsed, list) else []
+        except ValueError:
+            return []
+    return []
+
+def resolution_index(market):
+    """Winning outcome index of a closed market (the outcome priced at 1), else None."""
+    if not market.get("closed"):
+        return None
+    prices = parse_list(market.get("outcomePrices"))
+    for i, price in enumerate(prices):
+        try:
+            if float(price) == 1.0:
+                return i
+        except (TypeError, ValueError):
+            continue
+    return None
+
+class MarketStore:
+    """sqlite-backed market/outcome tables with incremental refresh from Gamma."""
+
+    def __init__(self, path=MARKET_STORE_FILE, url=GAMMA_MARKETS_URL):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.url = url
+        self.requests = 0
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def upsert_markets(self, markets):
+        """Stores Gamma market objects and their clob token ids. Returns how many were stored."""
+        market_rows = []
+        outcome_rows = []
+        for m in markets:
+            if not m.get("id"):
+                continue
+            outcomes = parse_list(m.get("outcomes"))
+            tokens = parse_list(m.get("clobTokenIds"))
+            condition = (m.get("conditionId") or "").lower() or None
+            market_rows.append((str(m["id"]), condition, m.get("question"), m.get("slug"), json.dumps(outcomes),
+                                int(bool(m.get("closed"))), m.get("endDate"), m.get("updatedAt"), resolution_index(m)))
+            if len(tokens) == len(outcomes):
+                for i, token in enumerate(tokens):
+                    outcome_rows.append((str(token), str(m["id"]), condition, i, outcomes[i], "clob"))
+        with self.lock:
+            self.conn.executemany("INSERT OR REPLACE INTO markets VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", market_rows)
+            self.conn.executemany("INSERT OR REPLACE INTO outcomes VALUES (?, ?, ?, ?, ?, ?)", outcome_rows)
+            self.conn.commit()
+        return len(market_rows)
+
+    def add_outcomes(self, rows, kind="position"):
+        """Adds extra asset ids for known markets: rows of (asset_id, market_id, condition_id, index, label)."""
+        with self.lock:
+            self.conn.executemany("INSERT OR IGNORE INTO outcomes VALUES (?, ?, ?, ?, ?, ?)",
+                                  [tuple(r) + (kind,) for r in rows])
+            self.conn.commit()
+
+    def fetch_page(self, params):
+        with self.lock:
+            self.requests += 1
+        r = http_client.get(self.url, params=params, timeout=10)
+        r.raise_for_status()
+        return r.json()
+
+    def watermark(self, window):
+        row = self.conn.execute("SELECT updated_at FROM sync_state WHERE window = ?", (window,)).fetchone()
+        return row[0] if row else None
+
+    def refresh(self, start_date, end_date, closed=None):
+        """
+        Brings the markets ending in [start_date, end_date] up to date.
+        Only pages updated after the window's last sync are downloaded.
+        """
+        window = f"{start_date}|{end_date}|{closed}"
+        since = self.watermark(window)
+        controller = get_controller(self.url)
+        newest = since
+        offset = 0
+        stored = 0
+        while True:
+            params = {"limit": PAGE_LIMIT, "offset": offset, "order": "updatedAt", "ascending": "false",
+                      "end_date_min": start_date, "end_date_max": end_date}
+            if closed is not None:
+                params["closed"] = "true" if closed else "false"
+            try:
+                data = self.fetch_page(params)
+            except http_client.HTTP_ERRORS + (ValueError,) as e:
+                # Leave the watermark alone: the next run re-crawls from the top
+                print(f"Market refresh stopped at offset {offset}: {e}. Rate now {controller.current_rate:.1f} req/s")
+                return stored
+            if not data:
+                break
+            fresh = [m for m in data if not since or (m.get("updatedAt") or "") > since]
+            stored += self.upsert_markets(fresh)
+            for m in fresh:
+                if (m.get("updatedAt") or "") > (newest or ""):
+                    newest = m.get("updatedAt")
+            if len(fresh) < len(data) or len(data) < PAGE_LIMIT:
+                break
+            offset += PAGE_LIMIT
+        if newest:
+            with self.lock:
+                self.conn.execute("INSERT OR REPLACE INTO sync_state VALUES (?, ?)", (window, newest))
+                self.conn.commit()
+        print(f"Market store: {stored} markets new or updated since {since or 'the first sync'} "
+              f"({self.requests} Gamma requests, {self.count()} markets stored).")
+        return stored
+
+    def markets_without_positions(self):
+        """(market_id, condition_id, outcomes) of markets whose CTF position ids were not computed yet."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT id, condition_id, outcomes FROM markets m WHERE condition_id IS NOT NULL AND NOT EXISTS "
+                "(SELECT 1 FROM outcomes o WHERE o.market_id = m.id AND o.kind = 'position')").fetchall()
+        return [(market_id, condition, parse_list(outcomes)) for market_id, condition, outcomes in rows]
+
+    def missing(self, asset_ids):
+        """Asset ids (decimal strings) not in the store, leaving out USDC ("0")."""
+        known = self.lookup(asset_ids)
+        return sorted({str(a) for a in asset_ids} - set(known) - {"", "0", "nan"})
+
+    def recently_unresolved(self, asset_ids):
+        """Ids Gamma had no market for within the last UNRESOLVED_TTL seconds."""
+        ids = sorted({str(a) for a in asset_ids})
+        cutoff = int(time.time()) - UNRESOLVED_TTL
+        found = set()
+        with self.lock:
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                marks = ",".join("?" * len(chunk))
+                found.update(r[0] for r in self.conn.execute(
+                    f"SELECT asset_id FROM unresolved WHERE checked_at >= ? AND asset_id IN ({marks})", [cutoff] + chunk))
+        return found
+
+    def fetch_by(self, param, values, workers=RESOLVE_WORKERS):
+        """
+        Fetches the markets matching `values` of a Gamma filter (clob_token_ids or condition_ids),
+        TOKEN_BATCH values per request with `workers` requests in flight. Returns how many markets were stored.
+        """
+        batches = [values[i:i + TOKEN_BATCH] for i in range(0, len(values), TOKEN_BATCH)]
+
+        def run(batch):
+            try:
+                return self.fetch_page({param: batch, "limit": TOKEN_BATCH * 2})
+            except http_client.HTTP_ERRORS + (ValueError,) as e:
+                print(f"Market lookup by {param} failed: {e}")
+                return []
+
+        stored = set()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for data in pool.map(run, batches):
+                self.upsert_markets(data)
+                stored.update(str(m.get("id")) for m in data)
+        if stored:
+            # Computed CTF ids of the new markets resolve too
+            self.add_outcomes(outcome_position_ids(self.markets_without_positions()), kind="position")
+        return len(stored)
+
+    def fetch_tokens(self, asset_ids, workers=RESOLVE_WORKERS):
+        """
+        Fetches the markets of asset ids the store does not know yet. Ids Gamma has no market for
+        are remembered for UNRESOLVED_TTL so they are not asked for on every run.
+        Returns how many markets were added.
+        """
+        missing = self.missing(asset_ids)
+        skipped = self.recently_unresolved(missing)
+        todo = [a for a in missing if a not in skipped]
+        if not todo:
+            return 0
+        stored = self.fetch_by("clob_token_ids", todo, workers)
+        still_missing = self.missing(todo)
+        with self.lock:
+            now = int(time.time())
+            self.conn.executemany("INSERT OR REPLACE INTO unresolved VALUES (?, ?)", [(a, now) for a in still_missing])
+            self.conn.commit()
+        print(f"Market store: {len(todo)} unknown asset ids, {stored} markets fetched for them, "
+              f"{len(still_missing)} unresolved ({len(skipped)} skipped as recently unresolved).")
+        return stored
+
+    def fetch_conditions(self, condition_ids, workers=RESOLVE_WORKERS):
+        """Fetches the markets of condition ids the store does not know yet."""
+        wanted = sorted({str(c).lower() for c in condition_ids if isinstance(c, str) and c.startswith("0x")})
+        known = set()
+        with self.lock:
+            for i in range(0, len(wanted), 500):
+                chunk = wanted[i:i + 500]
+                marks = ",".join("?" * len(chunk))
+                known.update(r[0] for r in self.conn.execute(
+                    f"SELECT condition_id FROM markets WHERE condition_id IN ({marks})", chunk))
+        todo = [c for c in wanted if c not in known]
+        if not todo:
+            return 0
+        stored = self.fetch_by("condition_ids", todo, workers)
+        print(f"Market store: {len(todo)} unknown condition ids, {stored} markets fetched for them.")
+        return stored
+
+    def resolve(self, asset_ids, condition_ids=(), workers=RESOLVE_WORKERS):
+        """
+        On-demand resolution: fetches only what the store is missing for these assets and
+        conditions, then returns lookup(asset_ids).
+        """
+        if len(condition_ids):
+            self.fetch_conditions(condition_ids, workers)
+        self.fetch_tokens(asset_ids, workers)
+        return self.lookup(asset_ids)
+
+    def lookup(self, asset_ids):
+        """Returns {asset_id: {title, slug, outcome, condition, index, closed, resolution}} for known ids."""
+        ids = sorted({str(a) for a in asset_ids})
+        found = {}
+        with self.lock:
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                marks = ",".join("?" * len(chunk))
+                for row in self.conn.execute(
+                        "SELECT o.asset_id, m.question, m.slug, o.outcome, o.condition_id, o.outcome_index, "
+                        "m.closed, m.resolution FROM outcomes o JOIN markets m ON m.id = o.market_id "
+                        f"WHERE o.asset_id IN ({marks})", chunk):
+                    found[row[0]] = {"title": row[1], "slug": row[2], "outcome": row[3], "condition": row[4],
+                                     "index": row[5], "closed": bool(row[6]), "resolution": row[7]}
+        return found
+
+    def outcome_table(self):
+        """Every known asset id with its market fields, as a DataFrame."""
+        with self.lock:
+            return pd.read_sql_query(
+                "SELECT o.asset_id, o.kind, o.condition_id, o.outcome_index, o.outcome, m.id AS market_id, "
+                "m.question AS title, m.slug, m.closed, m.resolution FROM outcomes o "
+                "JOIN markets m ON m.id = o.market_id", self.conn)
+
+    def markets_table(self):
+        with self.lock:
+            return pd.read_sql_query("SELECT * FROM markets", self.conn)
+
+    def count(self, table="markets"):
+        with self.lock:
+            return self.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresh the local Gamma market store.")
+    parser.add_argument("--start", default="2026-01-05T00:00:00Z", help="end_date_min of the window (ISO).")
+    parser.add_argument("--end", default="2026-01-07T00:00:00Z", help="end_date_max of the window (ISO).")
+    parser.add_argument("--closed", action="store_true", help="Only closed markets.")
+    parser.add_argument("--store", default=MARKET_STORE_FILE, help="sqlite file.")
+
+    args = parser.parse_args()
+    store = MarketStore(args.store)
+    store.refresh(args.start, args.end, closed=True if args.closed else None)
+    store.close()
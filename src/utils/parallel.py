@@ -0,0 +1,32 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# Partition-parallel helpers for the processors.
+# Chunks of fills (partitions in file, i.e. time, order) are fanned out to a process pool
+# and their results come back in submission order, so the output is identical to a serial
+# run. At most workers * LOOKAHEAD partitions are in flight, which keeps memory bounded
+# while the writer drains results. Large read-only tables (the memory-mapped asset index)
+# are opened once per worker by an initializer instead of being pickled with every task.
+
+LOOKAHEAD = 2
+
+def default_workers():
+    return os.cpu_count() or 1
+
+def imap_ordered(func, items, workers=1, initializer=None, initargs=()):
+    """Yields func(item) for every item, in order; runs on `workers` processes when workers > 1."""
+    if workers <= 1:
+        if initializer:
+            initializer(*initargs)
+        for item in items:
+            yield func(item)
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=initargs) as pool:
+        pending = deque()
+        for item in items:
+            pending.append(pool.submit(func, item))
+            if len(pending) >= workers * LOOKAHEAD:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
@@ -0,0 +1,158 @@
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+# AIMD (additive increase, multiplicative decrease) pacing for the HTTP extractors.
+# Replaces the fixed time.sleep() between pages: while latency and error rate stay
+# healthy the request rate creeps up by `increase` req/s per success; a 429/5xx or a
+# transport error cuts it (and the allowed concurrency) by `decrease`. Retry-After
+# headers block the host for at least the requested time.
+
+THROTTLE_STATUSES = {429, 500, 502, 503, 504}
+
+def parse_retry_after(value):
+    """Retry-After is either delta-seconds or an HTTP date. Returns seconds, or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+class RateController:
+    """
+    Shared rate and concurrency limiter for one host.
+    Callers wrap each request in request(); current_rate / snapshot() expose the state as metrics.
+    """
+
+    def __init__(self, name, rate=5.0, min_rate=0.2, max_rate=50.0, increase=0.5, decrease=0.5,
+                 latency_target=3.0, concurrency=4, max_concurrency=16):
+        self.name = name
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_target = latency_target
+        self.concurrency = concurrency
+        self.max_concurrency = max_concurrency
+
+        self.in_flight = 0
+        self.next_slot = 0.0
+        self.blocked_until = 0.0
+        self.successes = 0
+        self.requests = 0
+        self.errors = 0
+        self.throttled = 0
+        self.latency_total = 0.0
+        self.cond = threading.Condition()
+
+    @property
+    def current_rate(self):
+        return self.rate
+
+    def acquire(self):
+        """Blocks until a concurrency slot is free and the pacing interval has passed."""
+        with self.cond:
+            while True:
+                now = time.monotonic()
+                start_at = max(self.next_slot, self.blocked_until)
+                if self.in_flight < self.concurrency and now >= start_at:
+                    self.in_flight += 1
+                    self.next_slot = now + 1.0 / self.rate
+                    return
+                timeout = start_at - now if now < start_at else None
+                self.cond.wait(timeout)
+
+    def release(self):
+        with self.cond:
+            self.in_flight -= 1
+            self.cond.notify_all()
+
+    def record(self, latency, status=None, retry_after=None, error=False):
+        """Feeds one request outcome back into the controller."""
+        with self.cond:
+            self.requests += 1
+            self.latency_total += latency
+            if error or status in THROTTLE_STATUSES:
+                self.errors += 1
+                self.throttled += status == 429
+                self._back_off(retry_after)
+            elif latency > self.latency_target:
+                # Slow but successful: stop growing and ease off a little
+                self.successes = 0
+                self.rate = max(self.min_rate, self.rate * (1 + self.decrease) / 2)
+            else:
+                self.successes += 1
+                self.rate = min(self.max_rate, self.rate + self.increase)
+                if self.successes % 10 == 0:
+                    self.concurrency = min(self.max_concurrency, self.concurrency + 1)
+            self.cond.notify_all()
+
+    def backoff(self, retry_after=None):
+        """
+        Backs off as after a failed request, for failures the transport saw as successes
+        (e.g. GraphQL errors inside an HTTP 200).
+        """
+        with self.cond:
+            self.errors += 1
+            self._back_off(retry_after)
+            self.cond.notify_all()
+
+    def _back_off(self, retry_after):
+        self.successes = 0
+        self.rate = max(self.min_rate, self.rate * self.decrease)
+        self.concurrency = max(1, int(self.concurrency * self.decrease))
+        wait = parse_retry_after(retry_after)
+        if wait is None:
+            wait = 1.0 / self.rate
+        self.blocked_until = max(self.blocked_until, time.monotonic() + wait)
+
+    def request(self, send):
+        """
+        Runs send() (which performs one HTTP request and returns the response) under the limiter.
+        Transport errors are recorded and re-raised; HTTP error statuses are returned to the caller.
+        """
+        self.acquire()
+        started = time.monotonic()
+        try:
+            response = send()
+        except Exception:
+            self.record(time.monotonic() - started, error=True)
+            raise
+        finally:
+            self.release()
+        self.record(time.monotonic() - started, response.status_code, response.headers.get("Retry-After"))
+        return response
+
+    def snapshot(self):
+        with self.cond:
+            return {
+                "host": self.name,
+                "rate": round(self.rate, 2),
+                "concurrency": self.concurrency,
+                "requests": self.requests,
+                "errors": self.errors,
+                "throttled": self.throttled,
+                "avg_latency": round(self.latency_total / self.requests, 3) if self.requests else 0.0
+            }
+
+_controllers = {}
+_controllers_lock = threading.Lock()
+
+def get_controller(url, **kwargs):
+    """Returns the process-wide controller for the host of `url`, creating it on first use."""
+    host = urlparse(url).netloc or url
+    with _controllers_lock:
+        if host not in _controllers:
+            _controllers[host] = RateController(host, **kwargs)
+        return _controllers[host]
@@ -0,0 +1,227 @@
+import argparse
+import hashlib
+import json
+import os
+import zlib
+
+import numpy as np
+import pandas as pd
+
+try:
+    import zstandard
+    HAS_ZSTD = True
+except ImportError:
+    HAS_ZSTD = False
+
+# Append-only sidecar for raw API payloads, so the main extract stays narrow.
+#
+#   <output>.raw       compressed blocks of NDJSON, one block per append (zstd, or zlib without zstandard)
+#   <output>.raw.idx   binary index, one fixed-width INDEX_DTYPE entry (55 bytes) per record:
+#                      tx_hash (32-byte key), timestamp, offset, length, line, codec
+#
+# `offset`/`length` locate the record's block in the .raw file and `line` is its position
+# inside the block, so a single record is read back by decompressing one small block.
+# The index is read once per store and sorted in memory by hash and by time; get() and
+# between() are binary searches. A block is fsync'd before its index entries are written;
+# a torn index entry and bytes past the last indexed block (an append interrupted half-way)
+# are cut off the next time the store is opened. Indexes written as CSV by earlier versions
+# are converted on open.
+#
+#   python -m src.utils.raw_store data/raw/polymarket_user_transactions.csv 0xabc...
+
+INDEX_COLUMNS = ["tx_hash", "timestamp", "offset", "length", "line", "codec"]
+INDEX_DTYPE = np.dtype([("tx_hash", "S32"), ("timestamp", "<i8"), ("offset", "<i8"),
+                        ("length", "<i4"), ("line", "<u2"), ("codec", "u1")])
+CODECS = ["zlib", "zstd"]
+BLOCK_RECORDS = 256
+
+def index_key(value):
+    """32-byte key of a transaction hash (0x hex), or a digest of any other value."""
+    text = str(value).strip().lower()
+    try:
+        raw = bytes.fromhex(text[2:] if text.startswith("0x") else text)
+        if len(raw) == 32:
+            return raw
+    except ValueError:
+        pass
+    return hashlib.blake2b(text.encode(), digest_size=32).digest()
+
+def compress(data):
+    if HAS_ZSTD:
+        return zstandard.ZstdCompressor(level=9).compress(data), "zstd"
+    return zlib.compress(data, 9), "zlib"
+
+def decompress(blob, codec):
+    if codec == "zstd":
+        if not HAS_ZSTD:
+            raise ImportError("This raw store was written with zstd; pip install zstandard to read it.")
+        return zstandard.ZstdDecompressor().decompress(blob)
+    return zlib.decompress(blob)
+
+class RawStore:
+    """Compressed, indexed raw records keyed by transaction hash and timestamp."""
+
+    def __init__(self, output_file):
+        self.data_path = f"{output_file}.raw"
+        self.index_path = f"{output_file}.raw.idx"
+        self.index = None
+        self.sorted = None
+        self.convert_csv_index()
+        self.repair()
+
+    def repair(self):
+        """Truncates a torn index entry and a half-written trailing block left by an interrupted append."""
+        if os.path.exists(self.index_path):
+            size = os.path.getsize(self.index_path)
+            if size % INDEX_DTYPE.itemsize:
+                with open(self.index_path, "r+b") as f:
+                    f.truncate(size - size % INDEX_DTYPE.itemsize)
+        if not os.path.exists(self.data_path):
+            return
+        index = self.load_index()
+        end = int((index["offset"] + index["length"]).max()) if len(index) else 0
+        if os.path.getsize(self.data_path) > end:
+            with open(self.data_path, "r+b") as f:
+                f.truncate(end)
+
+    def convert_csv_index(self):
+        """Rewrites a CSV index from an earlier version in the binary format."""
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, "rb") as f:
+            if f.read(8) != b"tx_hash,":
+                return
+        old = pd.read_csv(self.index_path, dtype=str, keep_default_na=False)
+        numbers = old[INDEX_COLUMNS[1:5]].apply(pd.to_numeric, errors="coerce")
+        # A torn last line (crash while indexing) has empty fields; its block is rewritten by the rerun
+        whole = numbers.notna().all(axis=1).to_numpy() & old["codec"].isin(CODECS).to_numpy()
+        old, numbers = old[whole], numbers[whole]
+        entries = np.zeros(len(old), dtype=INDEX_DTYPE)
+        entries["tx_hash"] = [index_key(h) for h in old["tx_hash"]]
+        for column in INDEX_COLUMNS[1:5]:
+            entries[column] = numbers[column].to_numpy(np.int64)
+        entries["codec"] = [CODECS.index(c) for c in old["codec"]]
+        tmp = f"{self.index_path}.tmp"
+        entries.tofile(tmp)
+        os.replace(tmp, self.index_path)
+        print(f"Converted {self.index_path} to the binary index ({len(entries)} records).")
+
+    def load_index(self):
+        if self.index is None:
+            if os.path.exists(self.index_path):
+                count = os.path.getsize(self.index_path) // INDEX_DTYPE.itemsize
+                self.index = np.fromfile(self.index_path, dtype=INDEX_DTYPE, count=count)
+            else:
+                self.index = np.zeros(0, dtype=INDEX_DTYPE)
+            self.sorted = None
+        return self.index
+
+    def sorted_index(self):
+        """(hash order, sorted hashes, time order, sorted timestamps), built once per load or append."""
+        if self.sorted is None:
+            index = self.load_index()
+            by_hash = np.argsort(index["tx_hash"], kind="stable")
+            by_time = np.argsort(index["timestamp"], kind="stable")
+            self.sorted = (by_hash, index["tx_hash"][by_hash], by_time, index["timestamp"][by_time])
+        return self.sorted
+
+    def append(self, records, hash_key="transactionHash", ts_key="timestamp"):
+        """Appends raw records (dicts) in blocks of BLOCK_RECORDS."""
+        for start in range(0, len(records), BLOCK_RECORDS):
+            block = records[start:start + BLOCK_RECORDS]
+            payload = "\n".join(json.dumps(r, separators=(",", ":")) for r in block).encode()
+            blob, codec = compress(payload)
+            with open(self.data_path, "ab") as f:
+                offset = f.tell()
+                f.write(blob)
+                f.flush()
+                os.fsync(f.fileno())
+            entries = np.zeros(len(block), dtype=INDEX_DTYPE)
+            entries["tx_hash"] = [index_key(r.get(hash_key, "")) for r in block]
+            entries["timestamp"] = [int(r.get(ts_key) or 0) for r in block]
+            entries["offset"] = offset
+            entries["length"] = len(blob)
+            entries["line"] = np.arange(len(block))
+            entries["codec"] = CODECS.index(codec)
+            with open(self.index_path, "ab") as f:
+                f.write(entries.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            if self.index is not None:
+                self.index = np.concatenate([self.index, entries])
+                self.sorted = None
+
+    def read_entries(self, entries):
+        """
+        Reads the records behind index rows, decompressing each block once.
+        A window re-harvested after a crash may have been appended twice; repeats are dropped.
+        """
+        records = []
+        seen = set()
+        blocks = {}
+        with open(self.data_path, "rb") as f:
+            for e in entries:
+                key = int(e["offset"])
+                if key not in blocks:
+                    f.seek(key)
+                    blocks[key] = decompress(f.read(int(e["length"])), CODECS[e["codec"]]).split(b"\n")
+                line = blocks[key][int(e["line"])]
+                if line not in seen:
+                    seen.add(line)
+                    records.append(json.loads(line))
+        return records
+
+    def get(self, tx_hash):
+        """All raw records of one transaction, in the order they were appended."""
+        by_hash, hashes, _, _ = self.sorted_index()
+        key = np.array([index_key(tx_hash)], dtype="S32")
+        lo, hi = np.searchsorted(hashes, key, "left")[0], np.searchsorted(hashes, key, "right")[0]
+        return self.read_entries(self.index[np.sort(by_hash[lo:hi])])
+
+    def between(self, start_ts, end_ts):
+        """Raw records with start_ts <= timestamp < end_ts, oldest first."""
+        _, _, by_time, times = self.sorted_index()
+        lo, hi = np.searchsorted(times, [start_ts, end_ts], "left")
+        # Stable time order keeps records of the same second in append (offset, line) order
+        return self.read_entries(self.index[by_time[lo:hi]])
+
+    def remove(self):
+        for path in (self.data_path, self.index_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self.index = None
+        self.sorted = None
+
+def split_raw_column(output_file, column="raw_json", chunksize=100000):
+    """
+    Moves a legacy raw_json column of an existing extract into its sidecar and rewrites the
+    CSV without it. Returns True if the file was migrated.
+    """
+    if not os.path.exists(output_file):
+        return False
+    header = pd.read_csv(output_file, nrows=0).columns
+    if column not in header:
+        return False
+    store = RawStore(output_file)
+    store.remove()
+    tmp = f"{output_file}.tmp"
+    moved = 0
+    with open(tmp, "w", newline="") as out:
+        for i, chunk in enumerate(pd.read_csv(output_file, chunksize=chunksize, dtype=str, keep_default_na=False)):
+            store.append([json.loads(raw) for raw in chunk[column] if raw])
+            moved += len(chunk)
+            chunk.drop(columns=[column]).to_csv(out, header=i == 0, index=False)
+        out.flush()
+        os.fsync(out.fileno())
+    os.replace(tmp, output_file)
+    print(f"Moved {moved} raw_json payloads from {output_file} into {store.data_path}.")
+    return True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Print the raw API records stored next to an extract.")
+    parser.add_argument("output", help="The extract the sidecar belongs to (e.g. data/raw/polymarket_user_transactions.csv).")
+    parser.add_argument("tx_hash", help="Transaction hash to look up.")
+
+    args = parser.parse_args()
+    for record in RawStore(args.output).get(args.tx_hash):
+        print(json.dumps(record, indent=2))
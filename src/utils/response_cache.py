@@ -0,0 +1,126 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+
+# Content-addressed on-disk cache for subgraph responses.
+# Historical pages (fills, redemptions, block-pinned userPositions) never change once their
+# window is final, so each one is stored under sha256(endpoint, query, variables) as
+# zlib-compressed JSON. Queries whose window ends inside the finality horizon are never
+# cached. The store is bounded by size; the least recently used entries are evicted first
+# (file mtime is bumped on every hit and serves as the LRU clock).
+#
+#   POLYMARKET_CACHE=0              disable the cache
+#   POLYMARKET_CACHE_DIR=...        store location (default data/interim/cache)
+#   POLYMARKET_CACHE_MAX_MB=512     size bound
+#   POLYMARKET_FINALITY_HORIZON=3600  seconds before a window counts as final
+
+CACHE_DIR = os.environ.get("POLYMARKET_CACHE_DIR", "data/interim/cache")
+CACHE_MAX_BYTES = int(float(os.environ.get("POLYMARKET_CACHE_MAX_MB", 512)) * 1024 * 1024)
+FINALITY_HORIZON = int(os.environ.get("POLYMARKET_FINALITY_HORIZON", 3600))
+CACHE_ENABLED = os.environ.get("POLYMARKET_CACHE", "1") != "0"
+
+def cache_key(endpoint, query, variables=None):
+    payload = json.dumps([endpoint, query, variables], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+class ResponseCache:
+    """
+    Size-bounded store of finalized responses.
+    Callers check is_final() for the query's window end before calling get()/put().
+    """
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=CACHE_MAX_BYTES, horizon=FINALITY_HORIZON):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.horizon = horizon
+        self.hits = 0
+        self.misses = 0
+        self.size = None
+        self.lock = threading.Lock()
+
+    def is_final(self, final_at):
+        """True if data up to `final_at` (unix seconds) is older than the finality horizon."""
+        return final_at is not None and int(final_at) <= time.time() - self.horizon
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key[2:] + ".json.z")
+
+    def get(self, key):
+        """Returns the cached value, or None on a miss."""
+        path = self.path(key)
+        try:
+            with open(path, "rb") as f:
+                value = json.loads(zlib.decompress(f.read()))
+            os.utime(path)
+        except (OSError, ValueError, zlib.error):
+            with self.lock:
+                self.misses += 1
+            return None
+        with self.lock:
+            self.hits += 1
+        return value
+
+    def put(self, key, value):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        blob = zlib.compress(json.dumps(value, separators=(",", ":")).encode(), 6)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(blob)
+        os.replace(tmp, path)
+
+        with self.lock:
+            if self.size is None:
+                self.size = self.disk_usage()
+            else:
+                self.size += len(blob)
+            if self.size > self.max_bytes:
+                self.evict()
+
+    def entries(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".json.z"):
+                    path = os.path.join(root, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    yield st.st_mtime, st.st_size, path
+
+    def disk_usage(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        """Drops least recently used entries until the store is back under 90% of its bound."""
+        entries = sorted(self.entries())
+        self.size = sum(size for _, size, _ in entries)
+        target = int(self.max_bytes * 0.9)
+        removed = 0
+        for _, size, path in entries:
+            if self.size <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self.size -= size
+            removed += 1
+        print(f"Response cache: evicted {removed} entries, {self.size / 1e6:.1f} MB kept.")
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
+
+_default_cache = None
+
+def get_cache():
+    """Process-wide cache, or None when disabled through POLYMARKET_CACHE=0."""
+    global _default_cache
+    if not CACHE_ENABLED:
+        return None
+    if _default_cache is None:
+        _default_cache = ResponseCache()
+    return _default_cache
@@ -0,0 +1,575 @@
+import argparse
+import json
+import os
+import random
+import re
+import threading
+import calendar
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+# Offline stand-in for the Goldsky subgraphs, the Gamma API and the data-api.
+# Serves recorded fixtures (--fixtures DIR) or a deterministic synthetic dataset so the
+# extractors can be benchmarked and replay-tested without touching the live endpoints.
+#
+#   python -m src.utils.standin_server --port 8765 --fills 200000 --latency-ms 80 --error-rate 0.01 --rate-limit 20
+#   POLYMARKET_STANDIN_URL=http://127.0.0.1:8765 python -m src.extractors.extract_subgraph --role both --shards 8
+#
+# Routes (mirroring src/utils/endpoints.py):
+#   POST /goldsky/subgraphs/<name>/<version>/gn   orderFilledEvents, redemptions, userPositions, _meta
+#   GET  /gamma/markets                            limit/offset, closed, end_date_min/max, clob_token_ids, condition_ids
+#   GET  /data-api/activity                        user, limit/offset, start/end
+#   POST /rpc                                      JSON-RPC (single or batch): eth_getTransactionReceipt,
+#                                                  eth_getBlockByNumber, eth_blockNumber
+#
+# Fixture files are JSON arrays named after the entity: orderFilledEvents.json,
+# redemptions.json, userPositions.json, markets.json, activity.json.
+
+USER_ADDRESS = "0x63ce342161250d705dc0b16df89036c8e5f9ba9a"
+START_TS = 1767571200
+END_TS = 1767744000
+
+# Rough Polygon anchor (2s blocks) used to give synthetic events a block number
+BASE_BLOCK = 81139400
+BLOCK_TIME = 2
+
+NUMERIC_FIELDS = {"timestamp", "blockNumber", "makerAmountFilled", "takerAmountFilled", "payout", "fee", "number"}
+
+# --- GraphQL subset -------------------------------------------------------
+# Enough of the query language for what the extractors send: optional operation header
+# with variable definitions, aliased fields, arguments with object/list literals and
+# $variables, and nested selection sets.
+
+TOKEN_RE = re.compile(r'\s*(?:(\.\.\.)|("(?:[^"\\]|\\.)*")|(-?\d+(?:\.\d+)?)|([A-Za-z_][A-Za-z0-9_]*)|(\$)|([{}()\[\]:,!=@]))')
+
+def tokenize(text):
+    tokens = []
+    pos = 0
+    text = re.sub(r"#[^\n]*", "", text)
+    while pos < len(text):
+        if text[pos:].strip() == "":
+            break
+        m = TOKEN_RE.match(text, pos)
+        if not m:
+            raise ValueError(f"Unexpected character at {pos}: {text[pos:pos + 20]!r}")
+        spread, string, number, name, dollar, punct = m.groups()
+        if string is not None:
+            tokens.append(("str", json.loads(string)))
+        elif number is not None:
+            tokens.append(("num", number))
+        elif name is not None:
+            tokens.append(("name", name))
+        elif dollar is not None:
+            tokens.append(("punct", "$"))
+        else:
+            tokens.append(("punct", spread or punct))
+        pos = m.end()
+    return tokens
+
+class QueryParser:
+    def __init__(self, text, variables):
+        self.tokens = tokenize(text)
+        self.pos = 0
+        self.variables = variables or {}
+
+    def peek(self, offset=0):
+        i = self.pos + offset
+        return self.tokens[i] if i < len(self.tokens) else (None, None)
+
+    def take(self, value=None):
+        tok = self.peek()
+        if value is not None and tok[1] != value:
+            raise ValueError(f"Expected {value!r}, got {tok[1]!r}")
+        self.pos += 1
+        return tok
+
+    def parse(self):
+        if self.peek()[1] in ("query", "subscription"):
+            self.take()
+            if self.peek()[0] == "name":
+                self.take()
+            if self.peek()[1] == "(":
+                self.skip_variable_definitions()
+        return self.selection_set()
+
+    def skip_variable_definitions(self):
+        depth = 0
+        while True:
+            _, value = self.take()
+            if value == "(":
+                depth += 1
+            elif value == ")":
+                depth -= 1
+                if depth == 0:
+                    return
+
+    def selection_set(self):
+        self.take("{")
+        fields = []
+        while self.peek()[1] != "}":
+            name = self.take()[1]
+            alias = name
+            if self.peek()[1] == ":":
+                self.take(":")
+                name = self.take()[1]
+            args = {}
+            if self.peek()[1] == "(":
+                self.take("(")
+                while self.peek()[1] != ")":
+                    key = self.take()[1]
+                    self.take(":")
+                    args[key] = self.value()
+                    if self.peek()[1] == ",":
+                        self.take(",")
+                self.take(")")
+            selection = self.selection_set() if self.peek()[1] == "{" else None
+            fields.append({"alias": alias, "name": name, "args": args, "selection": selection})
+            if self.peek()[1] == ",":
+                self.take(",")
+        self.take("}")
+        return fields
+
+    def value(self):
+        kind, value = self.take()
+        if value == "$":
+            return self.variables.get(self.take()[1])
+        if kind == "str":
+            return value
+        if kind == "num":
+            return int(value) if re.fullmatch(r"-?\d+", value) else float(value)
+        if kind == "name":
+            return {"true": True, "false": False, "null": None}.get(value, value)
+        if value == "[":
+            items = []
+            while self.peek()[1] != "]":
+                items.append(self.value())
+                if self.peek()[1] == ",":
+                    self.take(",")
+            self.take("]")
+            return items
+        if value == "{":
+            obj = {}
+            while self.peek()[1] != "}":
+                key = self.take()[1]
+                self.take(":")
+                obj[key] = self.value()
+                if self.peek()[1] == ",":
+                    self.take(",")
+            self.take("}")
+            return obj
+        raise ValueError(f"Unexpected token {value!r}")
+
+# --- Entity filtering --------------------------------------------------------
+
+def field_value(entity, key):
+    value = entity.get(key)
+    if isinstance(value, dict) and "id" in value:
+        value = value["id"]
+    return value
+
+def compare_key(key, value):
+    if key in NUMERIC_FIELDS and value is not None:
+        return int(value)
+    return value.lower() if isinstance(value, str) and value.startswith("0x") else value
+
+def matches(entity, where):
+    for cond, expected in (where or {}).items():
+        if cond == "and":
+            if not all(matches(entity, w) for w in expected):
+                return False
+            continue
+        if cond == "or":
+            if not any(matches(entity, w) for w in expected):
+                return False
+            continue
+        key, _, op = cond.partition("_")
+        if op not in ("", "gt", "gte", "lt", "lte", "in", "not"):
+            key, op = cond, ""
+        actual = compare_key(key, field_value(entity, key))
+        if op == "in":
+            if actual not in [compare_key(key, v) for v in expected]:
+                return False
+            continue
+        target = compare_key(key, expected)
+        if actual is None:
+            return False
+        if op == "" and actual != target:
+            return False
+        if op == "not" and actual == target:
+            return False
+        if op == "gt" and not actual > target:
+            return False
+        if op == "gte" and not actual >= target:
+            return False
+        if op == "lt" and not actual < target:
+            return False
+        if op == "lte" and not actual <= target:
+            return False
+    return True
+
+def project(entity, selection):
+    if selection is None:
+        return entity
+    out = {}
+    for f in selection:
+        value = entity.get(f["name"])
+        if f["selection"] is not None and isinstance(value, dict):
+            value = project(value, f["selection"])
+        out[f["alias"]] = value
+    return out
+
+def run_collection(rows, args, selection):
+    rows = [r for r in rows if matches(r, args.get("where"))]
+    order_by = args.get("orderBy", "id")
+    reverse = args.get("orderDirection", "asc") == "desc"
+    rows.sort(key=lambda r: (compare_key(order_by, field_value(r, order_by)), r["id"]), reverse=reverse)
+    skip = int(args.get("skip", 0))
+    first = min(int(args.get("first", 100)), 1000)
+    return [project(r, selection) for r in rows[skip:skip + first]]
+
+# --- Synthetic dataset -------------------------------------------------------
+
+def block_at(ts):
+    return BASE_BLOCK + (int(ts) - START_TS) // BLOCK_TIME
+
+def synthetic_dataset(fills=20000, markets=200, seed=7, user=USER_ADDRESS, start_ts=START_TS, end_ts=END_TS):
+    """Builds a self-consistent dataset: markets with token ids, the user's fills, redemptions and activity."""
+    rng = random.Random(seed)
+    span = end_ts - start_ts
+    market_rows = []
+    for i in range(markets):
+        end_date = start_ts + (i + 1) * span // markets
+        condition = "0x" + "%064x" % rng.getrandbits(256)
+        tokens = [str(rng.getrandbits(255)), str(rng.getrandbits(255))]
+        market_rows.append({
+            "id": str(500000 + i),
+            "question": f"Bitcoin Up or Down - window {i}",
+            "slug": f"btc-updown-15m-{end_date}",
+            "conditionId": condition,
+            "outcomes": json.dumps(["Up", "Down"]),
+            "clobTokenIds": json.dumps(tokens),
+            "closed": end_date < end_ts,
+            "endDate": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(end_date)),
+            "createdAt": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(end_date - 900)),
+            "updatedAt": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(end_date + 60)),
+            "winner": rng.randrange(2)
+        })
+        m = market_rows[-1]
+        m["outcomePrices"] = json.dumps(["1", "0"] if m["winner"] == 0 else ["0", "1"]) if m["closed"] else json.dumps(["0.5", "0.5"])
+
+    counterparties = ["0x" + "%040x" % rng.getrandbits(160) for _ in range(50)]
+    fill_rows = []
+    activity_rows = []
+    for n in range(fills):
+        ts = start_ts + rng.randrange(span)
+        market = market_rows[min(markets - 1, (ts - start_ts) * markets // span)]
+        outcome = rng.randrange(2)
+        token = json.loads(market["clobTokenIds"])[outcome]
+        tx = "0x" + "%064x" % rng.getrandbits(256)
+        roll = rng.random()
+        maker, taker = (user, rng.choice(counterparties)) if roll < 0.45 else \
+            ((rng.choice(counterparties), user) if roll < 0.97 else (user, user))
+        size = rng.randrange(1, 500) * 10 ** 6
+        price_c = rng.randrange(1, 100)
+        usdc = size * price_c // 100
+        user_buys = rng.random() < 0.8
+        maker_gives_usdc = user_buys if maker == user else not user_buys
+        if maker_gives_usdc:
+            maker_asset, taker_asset, maker_amt, taker_amt = "0", token, usdc, size
+        else:
+            maker_asset, taker_asset, maker_amt, taker_amt = token, "0", size, usdc
+        fill_rows.append({
+            "id": f"{tx}_0x{rng.getrandbits(64):016x}",
+            "transactionHash": tx,
+            "timestamp": str(ts),
+            "blockNumber": str(block_at(ts)),
+            "block": {"number": str(block_at(ts))},
+            "maker": maker,
+            "taker": taker,
+            "makerAssetId": maker_asset,
+            "takerAssetId": taker_asset,
+            "makerAmountFilled": str(maker_amt),
+            "takerAmountFilled": str(taker_amt),
+            "fee": "0"
+        })
+        activity_rows.append({
+            "proxyWallet": user,
+            "timestamp": ts,
+            "conditionId": market["conditionId"],
+            "type": "TRADE",
+            "size": size / 1e6,
+            "usdcSize": usdc / 1e6,
+            "transactionHash": tx,
+            "price": price_c / 100,
+            "asset": token,
+            "side": "BUY" if user_buys else "SELL",
+            "outcomeIndex": outcome,
+            "title": market["question"],
+            "slug": market["slug"],
+            "outcome": json.loads(market["outcomes"])[outcome],
+            "name": "0x8dxd",
+            "pseudonym": "Blushing-Fine"
+        })
+
+    redemption_rows = []
+    for market in market_rows:
+        if not market["closed"] or rng.random() < 0.3:
+            continue
+        ts = calendar.timegm(time.strptime(market["endDate"], "%Y-%m-%dT%H:%M:%SZ")) + rng.randrange(60, 600)
+        if ts >= end_ts:
+            continue
+        redemption_rows.append({
+            "id": "0x" + "%064x" % rng.getrandbits(256),
+            "timestamp": str(ts),
+            "redeemer": user,
+            "payout": str(rng.randrange(0, 2000) * 10 ** 6),
+            "indexSets": ["1", "2"],
+            "condition": {"id": market["conditionId"]}
+        })
+
+    # One cumulative PnL position per user, sampled at every 1000 blocks
+    positions = []
+    pnl = 0.0
+    for block in range(block_at(start_ts) - 1000, block_at(end_ts) + 1000, 1000):
+        pnl += rng.uniform(-500, 800)
+        positions.append({"id": f"{user}-agg", "user": user, "block": block, "realizedPnl": f"{pnl:.6f}", "totalBought": "0"})
+
+    return {
+        "orderFilledEvents": fill_rows,
+        "redemptions": redemption_rows,
+        "userPositions": positions,
+        "markets": market_rows,
+        "activity": activity_rows
+    }
+
+def load_fixtures(directory):
+    data = {}
+    for name in ("orderFilledEvents", "redemptions", "userPositions", "markets", "activity"):
+        path = os.path.join(directory, f"{name}.json")
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                data[name] = json.load(f)
+        else:
+            data[name] = []
+    return data
+
+# --- HTTP server -------------------------------------------------------------
+
+class StandinState:
+    """Dataset plus the fault-injection knobs shared by all handler threads."""
+
+    def __init__(self, data, latency_ms=0, jitter_ms=0, error_rate=0.0, rate_limit=0.0, seed=7):
+        self.data = data
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.tokens = rate_limit
+        self.last_refill = time.monotonic()
+        self.stats = {"requests": 0, "errors_injected": 0, "rate_limited": 0}
+
+        self.tx_blocks = {}
+        for ev in data.get("orderFilledEvents", []):
+            block = ev.get("blockNumber") or (ev.get("block") or {}).get("number")
+            if block is not None:
+                self.tx_blocks[ev["transactionHash"].lower()] = int(block)
+
+        by_user = {}
+        for p in data.get("userPositions", []):
+            by_user.setdefault(p["user"].lower(), []).append(p)
+        self.positions_by_user = {u: sorted(rows, key=lambda r: r.get("block", 0)) for u, rows in by_user.items()}
+
+    def admit(self):
+        """Returns None to serve the request, or (status, retry_after) to reject it."""
+        with self.lock:
+            self.stats["requests"] += 1
+            if self.rate_limit > 0:
+                now = time.monotonic()
+                self.tokens = min(self.rate_limit, self.tokens + (now - self.last_refill) * self.rate_limit)
+                self.last_refill = now
+                if self.tokens < 1:
+                    self.stats["rate_limited"] += 1
+                    return 429, max(1, int((1 - self.tokens) / self.rate_limit + 0.999))
+                self.tokens -= 1
+            if self.error_rate and self.rng.random() < self.error_rate:
+                self.stats["errors_injected"] += 1
+                return 500, None
+            delay = self.latency_ms + (self.rng.uniform(0, self.jitter_ms) if self.jitter_ms else 0)
+        if delay:
+            time.sleep(delay / 1000.0)
+        return None
+
+    def user_positions(self, args, selection):
+        user = str((args.get("where") or {}).get("user", "")).lower()
+        rows = self.positions_by_user.get(user, [])
+        block = (args.get("block") or {}).get("number")
+        if block is not None:
+            # Time travel: the latest snapshot at or before the requested block
+            rows = [r for r in rows if r.get("block", 0) <= int(block)][-1:]
+        else:
+            rows = rows[-1:]
+        return [project(r, selection) for r in rows]
+
+    def graphql(self, body):
+        fields = QueryParser(body.get("query", ""), body.get("variables")).parse()
+        out = {}
+        for f in fields:
+            if f["name"] == "_meta":
+                head = max([int(r["blockNumber"]) for r in self.data["orderFilledEvents"]] or [BASE_BLOCK])
+                out[f["alias"]] = project({"block": {"number": head}}, f["selection"])
+            elif f["name"] == "userPositions":
+                out[f["alias"]] = self.user_positions(f["args"], f["selection"])
+            elif f["name"] in ("orderFilledEvents", "redemptions"):
+                out[f["alias"]] = run_collection(self.data[f["name"]], f["args"], f["selection"])
+            else:
+                return {"errors": [{"message": f"Type `Query` has no field `{f['name']}`"}]}
+        return {"data": out}
+
+    def rpc_call(self, call):
+        """One JSON-RPC call against the synthetic chain (2s blocks from BASE_BLOCK at START_TS)."""
+        method = call.get("method")
+        params = call.get("params") or []
+        if method == "eth_blockNumber":
+            result = hex(block_at(time.time()))
+        elif method == "eth_getTransactionReceipt":
+            block = self.tx_blocks.get(str(params[0]).lower())
+            result = None if block is None else {"transactionHash": params[0], "blockNumber": hex(block), "status": "0x1"}
+        elif method == "eth_getBlockByNumber":
+            tag = params[0]
+            number = block_at(time.time()) if tag == "latest" else int(tag, 16)
+            ts = START_TS + (number - BASE_BLOCK) * BLOCK_TIME
+            result = {"number": hex(number), "timestamp": hex(ts)}
+        else:
+            return {"jsonrpc": "2.0", "id": call.get("id"), "error": {"code": -32601, "message": f"Method {method} not found"}}
+        return {"jsonrpc": "2.0", "id": call.get("id"), "result": result}
+
+    def rpc(self, body):
+        if isinstance(body, list):
+            return [self.rpc_call(call) for call in body]
+        return self.rpc_call(body)
+
+    def markets(self, params):
+        rows = self.data["markets"]
+        if "closed" in params:
+            closed = params["closed"][0] == "true"
+            rows = [m for m in rows if m.get("closed") == closed]
+        if "end_date_min" in params:
+            rows = [m for m in rows if m.get("endDate", "") >= params["end_date_min"][0]]
+        if "end_date_max" in params:
+            rows = [m for m in rows if m.get("endDate", "") <= params["end_date_max"][0]]
+        if "clob_token_ids" in params:
+            wanted = set(params["clob_token_ids"])
+            rows = [m for m in rows if wanted & set(json.loads(m.get("clobTokenIds") or "[]"))]
+        if "condition_ids" in params:
+            wanted = {c.lower() for c in params["condition_ids"]}
+            rows = [m for m in rows if m.get("conditionId", "").lower() in wanted]
+        order = params.get("order", ["id"])[0]
+        ascending = params.get("ascending", ["true"])[0] == "true"
+        rows = sorted(rows, key=lambda m: (str(m.get(order, "")), m["id"]), reverse=not ascending)
+        offset = int(params.get("offset", ["0"])[0])
+        limit = int(params.get("limit", ["100"])[0])
+        return [{k: v for k, v in m.items() if k != "winner"} for m in rows[offset:offset + limit]]
+
+    def activity(self, params):
+        user = params.get("user", [""])[0].lower()
+        rows = [a for a in self.data["activity"] if a.get("proxyWallet", "").lower() == user]
+        if "start" in params:
+            rows = [a for a in rows if a["timestamp"] >= int(params["start"][0])]
+        if "end" in params:
+            rows = [a for a in rows if a["timestamp"] <= int(params["end"][0])]
+        ascending = params.get("sortDirection", ["DESC"])[0].upper() == "ASC"
+        rows = sorted(rows, key=lambda a: (a["timestamp"], a["transactionHash"]), reverse=not ascending)
+        offset = int(params.get("offset", ["0"])[0])
+        limit = min(int(params.get("limit", ["100"])[0]), 500)
+        return rows[offset:offset + limit]
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, fmt, *args):
+            pass
+
+        def send_json(self, status, payload, headers=None):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def reject(self):
+            verdict = state.admit()
+            if verdict is None:
+                return False
+            status, retry_after = verdict
+            headers = {"Retry-After": str(retry_after)} if retry_after else None
+            self.send_json(status, {"error": "rate limited" if status == 429 else "injected error"}, headers)
+            return True
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            raw = self.rfile.read(length)
+            if self.reject():
+                return
+            path = urlparse(self.path).path
+            if path == "/rpc":
+                return self.send_json(200, state.rpc(json.loads(raw or b"{}")))
+            if not path.startswith("/goldsky/"):
+                return self.send_json(404, {"error": f"unknown route {path}"})
+            try:
+                self.send_json(200, state.graphql(json.loads(raw or b"{}")))
+            except (ValueError, KeyError, TypeError) as e:
+                self.send_json(200, {"errors": [{"message": f"Failed to parse query: {e}"}]})
+
+        def do_GET(self):
+            if self.reject():
+                return
+            url = urlparse(self.path)
+            params = parse_qs(url.query)
+            if url.path == "/gamma/markets":
+                return self.send_json(200, state.markets(params))
+            if url.path == "/data-api/activity":
+                return self.send_json(200, state.activity(params))
+            if url.path == "/stats":
+                return self.send_json(200, state.stats)
+            self.send_json(404, {"error": f"unknown route {url.path}"})
+
+    return Handler
+
+def start_server(state, host="127.0.0.1", port=0):
+    """Starts the stand-in on a background thread. Returns (server, base_url)."""
+    server = ThreadingHTTPServer((host, port), make_handler(state))
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline stand-in for Goldsky / Gamma / data-api.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fixtures", default=None, help="Directory of recorded JSON fixtures (default: synthetic data).")
+    parser.add_argument("--fills", type=int, default=20000, help="Synthetic fills to generate.")
+    parser.add_argument("--markets", type=int, default=200, help="Synthetic markets to generate.")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--latency-ms", type=float, default=0, help="Added latency per request.")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="Extra random latency per request.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with HTTP 500.")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="Requests/sec before answering 429 with Retry-After (0 = off).")
+
+    args = parser.parse_args()
+    data = load_fixtures(args.fixtures) if args.fixtures else synthetic_dataset(args.fills, args.markets, args.seed)
+    state = StandinState(data, args.latency_ms, args.jitter_ms, args.error_rate, args.rate_limit, args.seed)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(state))
+    print(f"Stand-in serving {len(data['orderFilledEvents'])} fills, {len(data['markets'])} markets on http://{args.host}:{args.port}")
+    print(f"Point the extractors at it with POLYMARKET_STANDIN_URL=http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\nStats: {state.stats}")
@@ -0,0 +1,176 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from src.utils import http_client
+from src.utils.rate_control import get_controller
+from src.utils.response_cache import cache_key, get_cache
+
+# Shared client for the Goldsky subgraphs.
+# Independent sub-queries (different shards, users, roles or block heights) are packed
+# into one HTTP request with GraphQL aliases:
+#
+#   query { q0: orderFilledEvents(where: {...}) { id ... }  q1: orderFilledEvents(...) { ... } }
+#
+# and the response is split back per alias. Round-trip latency, not payload size, is what
+# limits the extractors, so this cuts the number of requests by the batch size.
+#
+# Sub-queries that carry a `final_at` timestamp older than the finality horizon are
+# answered from the on-disk response cache (see response_cache.py) when possible.
+
+class SubgraphError(Exception):
+    """A failed subgraph request; `subquery` is set when one sub-query was isolated as the cause."""
+
+    def __init__(self, message, subquery=None):
+        super().__init__(message)
+        self.subquery = subquery
+
+class Enum(str):
+    """A GraphQL enum value (e.g. orderBy: id), rendered without quotes."""
+
+def render_value(value):
+    """Renders a Python value as an inline GraphQL literal."""
+    if isinstance(value, Enum):
+        return str(value)
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float)):
+        return str(value)
+    if isinstance(value, str):
+        return json.dumps(value)
+    if isinstance(value, dict):
+        return "{" + ", ".join(f"{k}: {render_value(v)}" for k, v in value.items()) + "}"
+    if isinstance(value, (list, tuple)):
+        return "[" + ", ".join(render_value(v) for v in value) + "]"
+    if value is None:
+        return "null"
+    raise TypeError(f"Cannot render {value!r} as a GraphQL value")
+
+def subquery(field, args, selection, final_at=None):
+    """
+    One aliased query: the entity field, its arguments and the selection set.
+    `final_at` is the latest timestamp the result depends on; once that is final the
+    response can be cached. Leave it unset for queries against the chain head.
+    """
+    return {"field": field, "args": args, "selection": selection, "final_at": final_at}
+
+def render_query(subqueries, prefix="q"):
+    parts = []
+    for i, sq in enumerate(subqueries):
+        args = ", ".join(f"{k}: {render_value(v)}" for k, v in sq["args"].items())
+        call = f"{sq['field']}({args})" if args else sq["field"]
+        parts.append(f"  {prefix}{i}: {call} {{ {sq['selection']} }}")
+    return "query {\n" + "\n".join(parts) + "\n}"
+
+class SubgraphClient:
+    """
+    Sends batches of aliased sub-queries to one subgraph endpoint.
+
+    The batch size adapts: it grows by one after a response under half of `target_bytes` and
+    halves when a response exceeds `target_bytes` or the endpoint returns an error (latency is
+    left to the rate controller). Batches run on several threads share it under a lock. A batch whose request
+    fails is re-sent cut into batches of the halved size (up to `retries` attempts); one that
+    fails with GraphQL errors is split in half until the failing sub-query is isolated.
+    """
+
+    def __init__(self, url, batch_size=4, max_batch=16, target_bytes=4_000_000, timeout=30, retries=5, cache=True):
+        self.url = url
+        self.batch_size = batch_size
+        self.max_batch = max_batch
+        self.target_bytes = target_bytes
+        self.timeout = timeout
+        self.retries = retries
+        self.requests_sent = 0
+        self.lock = threading.Lock()
+        self.controller = get_controller(url)
+        self.cache = get_cache() if cache is True else (cache or None)
+        self.cache_hits = 0
+
+    def post(self, query):
+        """
+        POSTs one query document over the shared connection pool. Returns (json, response_bytes).
+        Pacing and backoff (including Retry-After) come from the host's rate controller.
+        """
+        try:
+            r = http_client.post(self.url, json={"query": query}, timeout=self.timeout, retries=0)
+            with self.lock:
+                self.requests_sent += 1
+            r.raise_for_status()
+            return r.json(), len(r.content)
+        except http_client.HTTP_ERRORS + (ValueError,) as e:
+            raise SubgraphError(f"Request to {self.url} failed: {e}")
+
+    def shrink(self):
+        with self.lock:
+            self.batch_size = max(1, self.batch_size // 2)
+            return self.batch_size
+
+    def grow(self):
+        with self.lock:
+            self.batch_size = min(self.max_batch, self.batch_size + 1)
+            return self.batch_size
+
+    def send_batch(self, subqueries, attempt=0):
+        """Runs one batch and returns the result of each sub-query, splitting it on errors."""
+        try:
+            data, size = self.post(render_query(subqueries))
+        except SubgraphError as e:
+            size = self.shrink()
+            if attempt + 1 >= self.retries:
+                raise
+            print(f"Subgraph request failed ({e}). Retrying {len(subqueries)} sub-queries in batches of {size}, "
+                  f"rate {self.controller.current_rate:.1f} req/s...")
+            return [result for i in range(0, len(subqueries), size)
+                    for result in self.send_batch(subqueries[i:i + size], attempt + 1)]
+        if data.get("errors"):
+            if len(subqueries) == 1:
+                raise SubgraphError(f"Subgraph errors: {data['errors']}", subqueries[0])
+            self.shrink()
+            mid = len(subqueries) // 2
+            return self.send_batch(subqueries[:mid]) + self.send_batch(subqueries[mid:])
+
+        if size > self.target_bytes:
+            self.shrink()
+        elif size < self.target_bytes // 2:
+            self.grow()
+
+        results = data.get("data") or {}
+        return [results.get(f"q{i}") for i in range(len(subqueries))]
+
+    def cache_key(self, sq):
+        if self.cache is None or not self.cache.is_final(sq.get("final_at")):
+            return None
+        return cache_key(self.url, render_query([sq]))
+
+    def execute(self, subqueries, workers=1):
+        """
+        Runs all sub-queries and returns their results in order.
+        Finalized sub-queries are served from the response cache; the rest are cut into
+        batches at the current batch size and sent on up to `workers` threads.
+        """
+        keys = [self.cache_key(sq) for sq in subqueries]
+        results = [self.cache.get(k) if k else None for k in keys]
+        pending = [i for i, r in enumerate(results) if r is None]
+        self.cache_hits += len(subqueries) - len(pending)
+
+        fetched = self.send_all([subqueries[i] for i in pending], workers)
+        for i, result in zip(pending, fetched):
+            results[i] = result
+            if keys[i] and result is not None:
+                self.cache.put(keys[i], result)
+        return results
+
+    def send_all(self, subqueries, workers):
+        if not subqueries:
+            return []
+        size = self.batch_size
+        batches = [subqueries[i:i + size] for i in range(0, len(subqueries), size)]
+        if workers <= 1 or len(batches) == 1:
+            results = [self.send_batch(b) for b in batches]
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(self.send_batch, batches))
+        return [r for batch in results for r in batch]
+
+    def query(self, field, args, selection):
+        return self.execute([subquery(field, args, selection)])[0]
@@ -0,0 +1,89 @@
+import logging
+import os
+import sys
+
+import requests
+
+sys.path.append(os.getcwd())
+from src.extractors import extract_polymarket_activity as activity
+from src.utils import http_client
+
+# Deterministic checks of the /activity page fetch, without a network: a 4xx is raised at once,
+# transient failures are retried a bounded number of times with a backoff in between.
+#
+#   python tests/check_activity_fetch.py
+
+PARAMS = {"start": 1, "end": 2, "offset": 0}
+failures = []
+
+def check(name, ok):
+    print(f"{'SUCCESS' if ok else 'FAIL'}: {name}")
+    if not ok:
+        failures.append(name)
+
+class Controller:
+    current_rate = 1.0
+
+    def __init__(self):
+        self.backoffs = 0
+
+    def backoff(self):
+        self.backoffs += 1
+
+def response(status, body=b"[]"):
+    r = requests.Response()
+    r.status_code = status
+    r._content = body
+    r.url = activity.API_URL
+    return r
+
+def fetch(answers):
+    """Runs fetch_page against canned answers; returns (result or exception, calls, backoffs)."""
+    calls = []
+
+    def fake_get(url, params=None, **kwargs):
+        answer = answers[min(len(calls), len(answers) - 1)]
+        calls.append(params)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+    http_client.get = fake_get
+    controller = Controller()
+    try:
+        result = activity.fetch_page(PARAMS, logger, controller)
+    except http_client.HTTP_ERRORS as e:
+        result = e
+    return result, len(calls), controller.backoffs
+
+logger = logging.getLogger("check_activity_fetch")
+logger.addHandler(logging.NullHandler())
+logger.propagate = False
+real_get = http_client.get
+try:
+    result, calls, backoffs = fetch([response(404)])
+    check("a 404 is raised without retrying", isinstance(result, requests.HTTPError) and (calls, backoffs) == (1, 0))
+
+    result, calls, backoffs = fetch([response(503)])
+    check("a 5xx that persists is raised after FETCH_ATTEMPTS",
+          isinstance(result, requests.HTTPError) and calls == activity.FETCH_ATTEMPTS
+          and backoffs == activity.FETCH_ATTEMPTS - 1)
+
+    result, calls, backoffs = fetch([requests.ConnectionError("reset")])
+    check("a transport error that persists is raised after FETCH_ATTEMPTS",
+          isinstance(result, requests.ConnectionError) and calls == activity.FETCH_ATTEMPTS)
+
+    result, calls, backoffs = fetch([requests.Timeout("slow"), response(429), response(200, b'[{"type": "TRADE"}]')])
+    check("transient failures back off and then succeed", result == [{"type": "TRADE"}] and (calls, backoffs) == (3, 2))
+
+    activity.running = False
+    result, calls, _ = fetch([response(503)])
+    check("an interrupted run stops fetching", result is None and calls == 0)
+finally:
+    http_client.get = real_get
+    activity.running = True
+
+if failures:
+    print(f"\n{len(failures)} check(s) failed.")
+    sys.exit(1)
+print("\nAll activity fetch checks passed.")
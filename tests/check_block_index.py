@@ -0,0 +1,83 @@
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+
+import numpy as np
+
+sys.path.append(os.getcwd())
+from src.utils import block_index
+from src.utils.block_index import BlockIndex
+
+# Deterministic checks of the timestamp -> block index against a synthetic chain:
+# exact answers versus a brute-force search, a logarithmic number of probes, and no
+# RPC at all for timestamps the saved samples already pin down.
+#
+#   python tests/check_block_index.py
+
+GENESIS = 1767000000
+HEAD = 200_000
+failures = []
+
+def check(name, ok):
+    print(f"{'SUCCESS' if ok else 'FAIL'}: {name}")
+    if not ok:
+        failures.append(name)
+
+# Irregular block times around Polygon's ~2s, including repeated timestamps
+rng = random.Random(7)
+CHAIN = np.cumsum([0] + [rng.choice([0, 1, 2, 2, 2, 3, 5]) for _ in range(HEAD)]) + GENESIS
+
+def fake_rpc_batch(calls, url=None):
+    results = []
+    for method, (number, _) in calls:
+        n = HEAD if number == "latest" else int(number, 16)
+        results.append({"number": hex(n), "timestamp": hex(int(CHAIN[n]))} if n <= HEAD else None)
+    return results
+
+def expected(ts):
+    n = int(np.searchsorted(CHAIN, ts, "left"))
+    return (n, int(CHAIN[n])) if n <= HEAD else None
+
+block_index.rpc_batch = fake_rpc_batch
+wanted = [int(t) for t in rng.sample(range(GENESIS - 100, int(CHAIN[-1]) + 100), 40)]
+PAST_HEAD = int(CHAIN[-1]) + 50
+wanted += [int(CHAIN[0]), int(CHAIN[12345]), int(CHAIN[12345]) + 1, int(CHAIN[-1]), PAST_HEAD]
+
+cwd = os.getcwd()
+with tempfile.TemporaryDirectory() as tmp:
+    os.chdir(tmp)
+    try:
+        index = BlockIndex("data/interim/block_index.npy", rpc_url=None)
+        with contextlib.redirect_stdout(io.StringIO()):
+            found = index.blocks_for_timestamps(wanted)
+        check("first block at or after each timestamp matches a brute-force search",
+              all(found[ts] == expected(ts) for ts in wanted))
+        check("timestamps past the head are not resolved", found[PAST_HEAD] is None)
+        check("interpolation search probes O(log n) blocks per timestamp",
+              index.rpc_calls < 30 * len(wanted) and len(index.blocks) == index.rpc_calls)
+        before = expected(int(CHAIN[12345]) + 1)[0] - 1
+        check("last block before a timestamp", index.block_before(int(CHAIN[12345]) + 1) == (before, int(CHAIN[before])))
+
+        # Past the head the chain head is read again on every lookup, since it moves
+        settled = [ts for ts in wanted if ts != PAST_HEAD]
+        calls = index.rpc_calls
+        again = index.blocks_for_timestamps(settled)
+        check("repeated lookups need no RPC", all(again[ts] == found[ts] for ts in settled) and index.rpc_calls == calls)
+
+        reloaded = BlockIndex("data/interim/block_index.npy", rpc_url=None)
+        check("saved samples answer a new process without RPC",
+              reloaded.blocks_for_timestamps(settled) == again and reloaded.rpc_calls == 0)
+        with contextlib.redirect_stdout(io.StringIO()):
+            nearby = reloaded.blocks_for_timestamps([ts + 7 for ts in wanted])
+        check("nearby timestamps resolve from the existing brackets",
+              all(nearby[ts + 7] == expected(ts + 7) for ts in wanted) and reloaded.rpc_calls < index.rpc_calls)
+    finally:
+        os.chdir(cwd)
+
+if failures:
+    print(f"\n{len(failures)} check(s) failed.")
+    sys.exit(1)
+print("\nAll block index checks passed.")
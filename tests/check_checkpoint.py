@@ -0,0 +1,99 @@
+import contextlib
+import io
+import os
+import sys
+import tempfile
+
+import pandas as pd
+
+sys.path.append(os.getcwd())
+from src.utils.checkpoint import checkpoint_path, load_checkpoint, rewind_output, save_checkpoint, write_json_atomic
+from src.utils.keyset import KeysetCursor
+
+# Deterministic checks of the cursor checkpoints: a run interrupted after a page was written
+# but before it was committed rewinds the output and resumes after the last committed id.
+#
+#   python tests/check_checkpoint.py
+
+WINDOW = (1767571200, 1767744000)
+COLUMNS = ["id", "timestamp"]
+failures = []
+
+def check(name, ok):
+    print(f"{'SUCCESS' if ok else 'FAIL'}: {name}")
+    if not ok:
+        failures.append(name)
+
+def events(first, last):
+    return [{"id": f"ev-{i:04d}", "timestamp": str(WINDOW[0] + i)} for i in range(first, last)]
+
+def cursor(path):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return KeysetCursor("[test]", "orderFilledEvents", {}, "id timestamp",
+                            lambda ev: [ev["id"], ev["timestamp"]], COLUMNS, *WINDOW, path)
+
+def consume(c, page):
+    with contextlib.redirect_stdout(io.StringIO()):
+        c.consume(page)
+
+cwd = os.getcwd()
+with tempfile.TemporaryDirectory() as tmp:
+    os.chdir(tmp)
+    try:
+        # 1. Checkpoint files
+        write_json_atomic("data/a.json", {"x": 1})
+        check("atomic write leaves no temp file", os.listdir("data") == ["a.json"])
+        with open("out.csv", "w") as f:
+            f.write("id\n1\n")
+        state = save_checkpoint("job", WINDOW, {"last_id": "1"}, 1, "out.csv")
+        check("checkpoint records the committed size", state["bytes"] == os.path.getsize("out.csv"))
+        with contextlib.redirect_stdout(io.StringIO()):
+            other_window = load_checkpoint("job", (0, 1))
+        check("checkpoint for another window is ignored",
+              load_checkpoint("job", WINDOW) == state and other_window is None)
+        with open(checkpoint_path("job"), "w") as f:
+            f.write('{"job": "jo')
+        with contextlib.redirect_stdout(io.StringIO()):
+            torn = load_checkpoint("job", WINDOW)
+        check("unreadable checkpoint starts fresh", torn is None)
+
+        # 2. Rewind cuts a page written after the last checkpoint
+        with open("out.csv", "a") as f:
+            f.write("2\n3")
+        check("rewind truncates to the committed size",
+              rewind_output("out.csv", state) and open("out.csv").read() == "id\n1\n")
+        with contextlib.redirect_stdout(io.StringIO()):
+            short = rewind_output("out.csv", dict(state, bytes=state["bytes"] + 10))
+        check("output shorter than its checkpoint cannot resume", short is False)
+
+        # 3. Parquet parts past the checkpoint are dropped
+        os.makedirs("out.parquet")
+        for i in range(4):
+            open(os.path.join("out.parquet", f"part-{i:05d}.parquet"), "w").close()
+        check("parts written after the checkpoint are dropped",
+              rewind_output("out.parquet", {"parts": 2}) and sorted(os.listdir("out.parquet")) == ["part-00000.parquet", "part-00001.parquet"])
+
+        # 4. A keyset cursor killed between writing a page and committing it
+        c = cursor("fills.csv")
+        consume(c, events(0, 1000))
+        consume(c, events(1000, 2000))
+        pd.DataFrame(events(2000, 2400)).to_csv("fills.csv", mode="a", header=False, index=False)
+        with open("fills.csv", "a") as f:
+            f.write("ev-2400,17675")
+
+        c = cursor("fills.csv")
+        check("resumed cursor continues after the last committed id",
+              c.last_id == "ev-1999" and c.total_count == 2000 and not c.done
+              and c.subquery()["args"]["where"]["id_gt"] == "ev-1999")
+        consume(c, events(2000, 2500))
+        consume(c, [])
+        df = pd.read_csv("fills.csv")
+        check("every event is written exactly once", list(df["id"]) == [e["id"] for e in events(0, 2500)])
+        check("finished cursor is not run again", cursor("fills.csv").done)
+    finally:
+        os.chdir(cwd)
+
+if failures:
+    print(f"\n{len(failures)} check(s) failed.")
+    sys.exit(1)
+print("\nAll checkpoint checks passed.")
@@ -0,0 +1,74 @@
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.append(os.getcwd())
+from src.extractors.extract_polymarket_activity import plan_windows
+from src.utils.coverage import (SYNC_SAFETY_LAG, coverage_path, load_coverage, mark_covered,
+                                missing_intervals, normalize, plan_sync)
+
+# Deterministic checks of --sync gap planning: interval merging, the gaps of a wider window,
+# and the high-water mark used for an extract that has no coverage index yet.
+#
+#   python tests/check_coverage.py
+
+DAY = 86400
+START = 1767571200
+failures = []
+
+def check(name, ok):
+    print(f"{'SUCCESS' if ok else 'FAIL'}: {name}")
+    if not ok:
+        failures.append(name)
+
+# 1. Interval arithmetic
+check("overlapping and touching intervals merge",
+      normalize([[30, 40], [0, 10], [10, 20], [35, 50], [60, 60]]) == [[0, 20], [30, 50]])
+covered = [[100, 200], [300, 400]]
+check("gaps of a wider window", missing_intervals(covered, 50, 450) == [(50, 100), (200, 300), (400, 450)])
+check("window inside a covered interval has no gaps", missing_intervals(covered, 120, 180) == [])
+check("window straddling an edge", missing_intervals(covered, 150, 350) == [(200, 300)])
+check("nothing covered: the whole window", missing_intervals([], 5, 9) == [(5, 9)])
+check("gaps are cut into windows, newest first",
+      plan_windows([(0, 9000), (20000, 21000)], 1) == [(20000, 21000), (7200, 9000), (3600, 7200), (0, 3600)])
+
+cwd = os.getcwd()
+with tempfile.TemporaryDirectory() as tmp:
+    os.chdir(tmp)
+    try:
+        # 2. Coverage sidecar
+        mark_covered("fills.csv", START, START + DAY)
+        mark_covered("fills.csv", START + DAY, START + 2 * DAY)
+        check("adjacent covered windows are stored as one", load_coverage("fills.csv") == [[START, START + 2 * DAY]])
+        gaps, skip_ids = plan_sync("fills.csv", START - DAY, START + 3 * DAY)
+        check("sync fetches only the uncovered days",
+              gaps == [(START - DAY, START), (START + 2 * DAY, START + 3 * DAY)] and skip_ids == set())
+
+        # 3. An extract from before coverage indexes: its time range counts as covered,
+        # except the last second, whose stored ids are skipped instead
+        pd.DataFrame({"id": ["a", "b", "c", "d"], "timestamp": [START + 10, START + 20, START + 50, START + 50]}
+                     ).to_csv("old.csv", index=False)
+        with contextlib.redirect_stdout(io.StringIO()):
+            gaps, skip_ids = plan_sync("old.csv", START, START + 100)
+        check("high-water mark of an extract without an index",
+              gaps == [(START, START + 10), (START + 50, START + 100)] and skip_ids == {"c", "d"})
+        check("the high-water mark is saved as its coverage", load_coverage("old.csv") == [[START + 10, START + 50]])
+
+        # 4. The most recent seconds are never planned as settled
+        now = int(time.time())
+        os.remove(coverage_path("fills.csv"))
+        gaps, _ = plan_sync("fills.csv", now - 1000, now + 1000)
+        check("sync stops short of now", len(gaps) == 1 and gaps[0][1] <= now - SYNC_SAFETY_LAG + 1)
+        check("window entirely in the safety lag has nothing to fetch", plan_sync("fills.csv", now - 10, now) == ([], set()))
+    finally:
+        os.chdir(cwd)
+
+if failures:
+    print(f"\n{len(failures)} check(s) failed.")
+    sys.exit(1)
+print("\nAll coverage checks passed.")
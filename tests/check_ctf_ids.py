@@ -0,0 +1,80 @@
+import hashlib
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.getcwd())
+from src.utils import ctf_ids
+from src.utils.ctf_ids import RATE_BYTES, collection_ids, keccak256, keccak256_batch, outcome_position_ids
+
+# Deterministic checks of the numpy keccak used for CTF ids: published Keccak-256 vectors,
+# the permutation against hashlib's SHA3-256 across block boundaries, batch vs single
+# hashing, and the memoized collection ids.
+#
+#   python tests/check_ctf_ids.py
+
+VECTORS = {
+    b"": "c5d2460186f7233c927e7db2dcc703c0e500b653ca82273b7bfad8045d85a470",
+    b"abc": "4e03657aea45a94fc7d47ba826c8d667c0d1e6e33a64a036ec44f58fa12d6c45",
+    b"hello": "1c8aff950685c2ed4bc3174f3472287b56d9517b9c948127319a09a7a36deac8",
+}
+CONDITION = "0x" + bytes(range(32)).hex()
+failures = []
+
+def check(name, ok):
+    print(f"{'SUCCESS' if ok else 'FAIL'}: {name}")
+    if not ok:
+        failures.append(name)
+
+def batch_digest(message):
+    return keccak256_batch(np.frombuffer(message, dtype=np.uint8).reshape(1, -1))[0].tobytes().hex()
+
+def sha3_256(message):
+    """SHA3-256 built on ctf_ids' keccak-f: the same sponge as Keccak-256 with 0x06 domain padding."""
+    padded = bytearray(message + b"\x06" + bytes(-(len(message) + 1) % RATE_BYTES))
+    padded[-1] |= 0x80
+    lanes = np.frombuffer(bytes(padded), dtype="<u8").reshape(-1, RATE_BYTES // 8)
+    state = [np.zeros(1, dtype=np.uint64) for _ in range(25)]
+    for block in lanes:
+        for i, lane in enumerate(block):
+            state[i] = state[i] ^ np.uint64(lane)
+        ctf_ids._keccak_f(state)
+    return np.array([s[0] for s in state[:4]], dtype="<u8").tobytes().hex()
+
+# 1. Keccak-256 vectors, through the numpy path even when pycryptodome is installed
+check("published Keccak-256 vectors", all(batch_digest(m) == d for m, d in VECTORS.items()))
+check("single-message keccak256 agrees", all(keccak256(m).hex() == d for m, d in VECTORS.items()))
+data = bytes(range(256)) * 2
+check("keccak-f matches hashlib SHA3-256 across block boundaries",
+      all(sha3_256(data[:n]) == hashlib.sha3_256(data[:n]).hexdigest()
+          for n in (0, 1, 95, 96, 134, 135, 136, 137, 271, 272, 273, 500)))
+
+# 2. A batch hashes every row independently
+rng = np.random.default_rng(16)
+rows = rng.integers(0, 256, size=(9, 96), dtype=np.uint8)
+check("batch rows equal one-at-a-time digests",
+      [d.tobytes() for d in keccak256_batch(rows)] == [keccak256(r.tobytes()) for r in rows])
+
+# 3. Collection ids: keccak(parent (0) ++ conditionId ++ indexSet), memoized per condition
+expected = [str(int.from_bytes(keccak256(bytes(32) + bytes.fromhex(CONDITION[2:]) + s.to_bytes(32, "big")), "big"))
+            for s in (1, 2)]
+check("collection ids follow the CTF packing", collection_ids([CONDITION, CONDITION], [1, 2]) == expected)
+
+hashed = []
+real_hash_pairs = ctf_ids._hash_pairs
+ctf_ids._hash_pairs = lambda conditions, index_sets: hashed.extend(conditions) or real_hash_pairs(conditions, index_sets)
+again = collection_ids([CONDITION.upper().replace("0X", "0x"), CONDITION[2:], CONDITION], [2, 1, 1])
+check("memoized ids are not hashed again, and an id without 0x resolves too",
+      again == [expected[1], expected[0], expected[0]] and hashed == [bytes(range(32))])
+ctf_ids._hash_pairs = real_hash_pairs
+check("malformed condition ids give None",
+      collection_ids(["0x1234", "not hex", CONDITION], [1, 1, 2]) == [None, None, expected[1]])
+rows = outcome_position_ids([("m1", CONDITION, ["Up", "Down"]), ("m2", "0xbad", ["Yes", "No"])])
+check("outcome position ids use index set 1 << outcome and skip malformed markets",
+      rows == [(expected[0], "m1", CONDITION, 0, "Up"), (expected[1], "m1", CONDITION, 1, "Down")])
+
+if failures:
+    print(f"\n{len(failures)} check(s) failed.")
+    sys.exit(1)
+print("\nAll ctf_ids checks passed.")
@@ -0,0 +1,68 @@
+import os
+import sys
+import tempfile
+
+import pandas as pd
+
+sys.path.append(os.getcwd())
+from src.processors import enrich_pnl
+from src.processors.enrich_pnl import build_outcome_table, estimate_partition, init_worker
+from src.utils.asset_index import write_asset_index
+
+# Deterministic checks of the per-trade PnL estimate: redemption indexSets decode as CTF
+# bitmasks (["1"] is outcome 0), and trades join their outcome on the integer outcome index.
+#
+#   python tests/check_enrich_pnl.py
+
+C1 = "0x" + "c1" * 32
+C2 = "0x" + "c2" * 32
+failures = []
+
+def check(name, ok):
+    print(f"{'SUCCESS' if ok else 'FAIL'}: {name}")
+    if not ok:
+        failures.append(name)
+
+redemptions = pd.DataFrame({
+    "condition": [C1, C2, C2],
+    "indexSets": ['["1"]', '["1", "2"]', '["2"]'],
+    "payout": [5_000_000, 1, 0],
+})
+table = build_outcome_table(redemptions)
+check("single-outcome redemption [\"1\"] names outcome 0",
+      table[table['condition'] == C1][['index', 'is_winner']].values.tolist() == [[0, True]])
+check("a later redemption of the same outcome wins",
+      sorted(table[table['condition'] == C2][['index', 'is_winner']].values.tolist()) == [[0, True], [1, False]])
+
+markets = pd.DataFrame({
+    "asset_id": ["101", "102", "201", "202"],
+    "market_id": ["m1", "m1", "m2", "m2"],
+    "condition_id": [C1, C1, C2, C2],
+    "outcome_index": [0, 1, 0, 1],
+    "outcome": ["Up", "Down", "Up", "Down"],
+    "title": "t", "slug": "s", "closed": 1, "resolution": "",
+})
+trades = pd.DataFrame({
+    "asset_id_raw": ["101", "102", "202", "999"],
+    "side": ["BUY", "BUY", "BUY", "BUY"],
+    "price": [0.4, 0.6, 0.5, 0.5],
+    "volume_usdc": [4.0, 6.0, 5.0, 5.0],
+    "size": [10.0, 10.0, 10.0, 10.0],
+})
+
+with tempfile.TemporaryDirectory() as tmp:
+    write_asset_index(markets, tmp)
+    init_worker(tmp, table)
+    out = estimate_partition(trades)
+    enrich_pnl._worker_index = None
+
+check("trade statuses follow the decoded outcomes",
+      list(out['status']) == ["Resolved_Winner", "Closed_NoRedemption", "Resolved_Loser", "Unmapped"])
+check("winner is valued at 1, the rest at 0",
+      list(out['final_price_est']) == [1.0, 0.0, 0.0, 0.0]
+      and list(out['estimated_pnl_micro']) == [6_000_000, -6_000_000, -5_000_000, -5_000_000])
+
+if failures:
+    print(f"\n{len(failures)} check(s) failed.")
+    sys.exit(1)
+print("\nAll enrich_pnl checks passed.")
@@ -0,0 +1,120 @@
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.getcwd())
+from src.processors.enrich_data import USER_ADDRESS_LOWER, enrich_frame
+from src.utils.asset_index import AssetIndex, write_asset_index
+
+# Benchmark: vectorized enrich_frame vs the old per-row iterrows enrichment, on synthetic fills.
+# The old loop runs on a sample (it needs minutes for a million rows) and its output must match.
+#
+#   python tests/check_enrich_speed.py [fills] [sample]
+
+N_FILLS = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+N_SAMPLE = int(sys.argv[2]) if len(sys.argv) > 2 else 50_000
+N_MARKETS = 5000
+
+rng = np.random.default_rng(7)
+tokens = np.array([str(int.from_bytes(rng.bytes(32), "big") >> 1) for _ in range(N_MARKETS * 2)], dtype=object)
+table = pd.DataFrame({
+    "asset_id": tokens,
+    "kind": "clob",
+    "condition_id": np.repeat([f"0x{i:064x}" for i in range(N_MARKETS)], 2),
+    "outcome_index": np.tile([0, 1], N_MARKETS),
+    "outcome": np.tile(["Up", "Down"], N_MARKETS),
+    "market_id": np.repeat([str(500000 + i) for i in range(N_MARKETS)], 2),
+    "title": np.repeat([f"Bitcoin Up or Down - window {i}" for i in range(N_MARKETS)], 2),
+    "slug": np.repeat([f"btc-updown-15m-{i}" for i in range(N_MARKETS)], 2),
+    "closed": 1,
+    "resolution": 0,
+})
+asset_map = {t: {"title": r.title, "outcome": r.outcome} for t, r in zip(tokens, table.itertuples())}
+
+def synthetic_fills(n):
+    other = "0x" + "ab" * 20
+    user_is_maker = rng.random(n) < 0.45
+    maker_gives_usdc = rng.random(n) < 0.5
+    token = tokens[rng.integers(0, len(tokens) - 100, n)]  # the last ids stay unmapped
+    token[rng.random(n) < 0.01] = tokens[-1]
+    size = rng.integers(1, 500, n) * 10 ** 6
+    usdc = size * rng.integers(1, 100, n) // 100
+    cross = rng.random(n) < 0.002
+    maker_asset = np.where(maker_gives_usdc, "0", token).astype(object)
+    maker_asset[cross] = token[cross]
+    return pd.DataFrame({
+        "timestamp_utc": "2026-01-05 12:00:00",
+        "maker": np.where(user_is_maker, USER_ADDRESS_LOWER, other),
+        "taker": np.where(user_is_maker, other, USER_ADDRESS_LOWER),
+        "makerAssetId": maker_asset,
+        "takerAssetId": np.where(maker_gives_usdc, token, "0"),
+        "makerAmountFilled": np.where(maker_gives_usdc, usdc, size),
+        "takerAmountFilled": np.where(maker_gives_usdc, size, usdc),
+        "transactionHash": ["0x%064x" % i for i in range(n)],
+    })
+
+def enrich_iterrows(df):
+    """The previous enrich_data loop (per-row casts, branches and dict lookups), on int micro-unit amounts."""
+    rows = []
+    for _, row in df.iterrows():
+        m_asset, t_asset = str(row['makerAssetId']), str(row['takerAssetId'])
+        m_amt, t_amt = int(row['makerAmountFilled']), int(row['takerAmountFilled'])
+        is_user_maker = str(row['maker']).lower() == USER_ADDRESS_LOWER
+        usdc_amt, outcome_amt = 0, 0
+        if m_asset == "0":
+            usdc_amt, outcome_amt, outcome_asset_id = m_amt, t_amt, t_asset
+            side = "BUY" if is_user_maker else "SELL"
+        elif t_asset == "0":
+            usdc_amt, outcome_amt, outcome_asset_id = t_amt, m_amt, m_asset
+            side = "SELL" if is_user_maker else "BUY"
+        else:
+            side, outcome_asset_id = "MERGE/SWAP", m_asset
+        size, volume = outcome_amt / 1e6, usdc_amt / 1e6
+        price = volume / size if size > 0 else 0.0
+        info = asset_map.get(outcome_asset_id, {})
+        rows.append({
+            "timestamp_utc": row['timestamp_utc'],
+            "market_title": info.get('title', 'Unknown Market'),
+            "outcome": info.get('outcome', '?'),
+            "side": side,
+            "price": round(price, 4),
+            "size": size,
+            "volume_usdc": volume,
+            "asset_id_raw": outcome_asset_id,
+            "transaction_hash": row['transactionHash'],
+            "size_micro": outcome_amt,
+            "volume_micro": usdc_amt
+        })
+    return pd.DataFrame(rows)
+
+with tempfile.TemporaryDirectory() as index_dir:
+    write_asset_index(table, index_dir)
+    index = AssetIndex(index_dir)
+
+    print(f"Generating {N_FILLS} synthetic fills...")
+    fills = synthetic_fills(N_FILLS)
+    sample = fills.head(N_SAMPLE)
+
+    start = time.time()
+    old = enrich_iterrows(sample)
+    old_rate = len(sample) / (time.time() - start)
+
+    new = enrich_frame(sample, index=index)
+    same = old.equals(new)
+
+    start = time.time()
+    enrich_frame(fills, index=index)
+    new_rate = len(fills) / (time.time() - start)
+
+print(f"iterrows:   {old_rate:>12,.0f} rows/s ({len(sample)} row sample)")
+print(f"vectorized: {new_rate:>12,.0f} rows/s ({len(fills)} rows)")
+print(f"Speedup: {new_rate / old_rate:.0f}x")
+if same:
+    print("SUCCESS: Vectorized output matches the per-row output.")
+else:
+    diff = (old != new).sum()
+    print(f"FAIL: Outputs differ in {diff[diff > 0].to_dict()}")
@@ -0,0 +1,168 @@
+import contextlib
+import io
+import os
+import sys
+import tempfile
+
+import pandas as pd
+
+sys.path.append(os.getcwd())
+from src.processors.position_ledger import Positions, PositionLedger, index_set_outcomes, parse_time
+from src.utils.market_store import MarketStore
+
+# Deterministic checks of the position ledger: index set decoding, redemption of a two-outcome
+# condition, a late event rewinding to a snapshot, point-in-time queries against rebuilds, and
+# fills mapped to their market only after they were stored.
+#
+#   python tests/check_position_ledger.py
+
+USER = "0x63ce342161250d705dc0b16df89036c8e5f9ba9a"
+OTHER = "0x" + "ab" * 20
+CONDITION = "0x" + "c1" * 32
+UP, DOWN = "111", "222"
+FILLS_FILE = "data/raw/polymarket_jan5_jan6_fills.csv"
+REDEMPTION_FILE = "data/interim/polymarket_jan5_jan6_redemptions.csv"
+START = parse_time("2026-01-05 00:00:00")
+failures = []
+
+def check(name, ok):
+    print(f"{'SUCCESS' if ok else 'FAIL'}: {name}")
+    if not ok:
+        failures.append(name)
+
+def position(df, asset):
+    return df[df['asset_id'] == asset].iloc[0]
+
+# 1. indexSets are bitmasks: ["1", "2"] names outcomes 0 and 1
+check("index sets decode as bitmasks",
+      index_set_outcomes('["1", "2"]') == {0, 1} and index_set_outcomes('["3"]') == {0, 1}
+      and index_set_outcomes('["2"]') == {1} and index_set_outcomes("[]") == set())
+
+# 2. Redeeming both outcomes of a condition closes both legs
+def two_legs():
+    book = Positions()
+    book.fill(USER, UP, CONDITION, 0, 100_000_000, 40_000_000)
+    book.fill(USER, DOWN, CONDITION, 1, 50_000_000, 30_000_000)
+    return book
+
+book = two_legs()
+book.redeem(USER, CONDITION, 50_000_000, '["1", "2"]', winner=1)
+df = book.frame()
+up, down = position(df, UP), position(df, DOWN)
+check("redemption with a known winner pays the winning leg and closes the losing one",
+      (up['size'], up['cost'], up['redeemed'], up['realized']) == (0, 0, 0, -40_000_000)
+      and (down['size'], down['cost'], down['redeemed'], down['realized']) == (0, 0, 50_000_000, 20_000_000))
+
+book = two_legs()
+book.redeem(USER, CONDITION, 60_000_000, '["1", "2"]')
+df = book.frame()
+up, down = position(df, UP), position(df, DOWN)
+check("redemption without a resolution splits the payout by size",
+      (up['size'], up['redeemed'], down['size'], down['redeemed']) == (0, 40_000_000, 0, 20_000_000))
+
+book = two_legs()
+book.redeem(USER, CONDITION, 50_000_000, '["2"]', winner=1)
+df = book.frame()
+check("redemption of one index set leaves the other outcome open",
+      position(df, UP)['size'] == 100_000_000 and position(df, DOWN)['redeemed'] == 50_000_000)
+
+# 3. Ledger over extracts: late events against snapshots, point-in-time queries
+def fills(n):
+    rows = []
+    for i in range(n):
+        asset = UP if i % 3 else DOWN
+        buy = i % 4 != 3
+        size, usdc = (10 + i) * 1_000_000, (4 + i % 5) * 1_000_000
+        rows.append({
+            "id": f"fill-{i:03d}", "timestamp": START + 600 * i, "timestamp_utc": "",
+            "transactionHash": f"0x{i:064x}", "maker": USER, "taker": OTHER,
+            "makerAssetId": "0" if buy else asset, "takerAssetId": asset if buy else "0",
+            "makerAmountFilled": usdc if buy else size, "takerAmountFilled": size if buy else usdc})
+    return pd.DataFrame(rows)
+
+def build(path, df_fills, df_red, snapshot_every=5):
+    df_fills.to_csv(FILLS_FILE, index=False)
+    df_red.to_csv(REDEMPTION_FILE, index=False)
+    ledger = PositionLedger(path, snapshot_every=snapshot_every)
+    with contextlib.redirect_stdout(io.StringIO()):
+        ledger.refresh()
+    return ledger
+
+def ordered(df):
+    return df.sort_values(['user', 'asset_id']).reset_index(drop=True)
+
+cwd = os.getcwd()
+with tempfile.TemporaryDirectory() as tmp:
+    os.chdir(tmp)
+    try:
+        os.makedirs("data/raw")
+        store = MarketStore()
+        store.upsert_markets([{"id": "1", "conditionId": CONDITION, "outcomes": '["Up", "Down"]',
+                               "clobTokenIds": f'["{UP}", "{DOWN}"]', "closed": True, "outcomePrices": '["0", "1"]'}])
+        store.close()
+
+        all_fills = fills(40)
+        redemptions = pd.DataFrame([{"id": "redeem-0", "timestamp": START + 600 * 40, "timestamp_utc": "",
+                                     "redeemer": USER, "payout": 77_000_000, "condition": CONDITION,
+                                     "indexSets": '["1", "2"]'}])
+        full = build("full.sqlite", all_fills, redemptions)
+        current = ordered(full.positions())
+        up, down = position(current, UP), position(current, DOWN)
+        check("ledger redemption closes both legs and pays the winning outcome",
+              up['size'] == 0 and down['size'] == 0 and up['redeemed'] == 0 and down['redeemed'] == 77_000_000)
+
+        # Fill 7 arrives after the ledger has applied (and snapshotted) everything after it
+        late = build("late.sqlite", all_fills.drop(index=7), redemptions)
+        all_fills.iloc[[7]].to_csv(FILLS_FILE, mode="a", header=False, index=False)
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            late.refresh()
+        check("late event rewinds to a snapshot instead of replaying everything",
+              "replaying from the snapshot at event 5." in out.getvalue())
+        check("late event gives the same positions as a full build", ordered(late.positions()).equals(current))
+
+        for hours in (1, 3.5, 5):
+            ts = START + int(3600 * hours)
+            ref = build("ref.sqlite", all_fills[all_fills['timestamp'] <= ts], redemptions.iloc[:0])
+            got = full.positions_at(ts)
+            check(f"positions {hours}h in match a ledger built from the events up to then",
+                  ordered(got).equals(ordered(ref.positions())))
+            ref.close()
+            os.remove("ref.sqlite")
+
+        # 4. A fill stored before the market store knew its asset is closed by the market's redemption
+        new_condition, new_up, new_down = "0x" + "c2" * 32, "333", "444"
+        new_fill = pd.DataFrame([{
+            "id": "fill-new", "timestamp": START + 600 * 50, "timestamp_utc": "", "transactionHash": "0x" + "ee" * 32,
+            "maker": USER, "taker": OTHER, "makerAssetId": "0", "takerAssetId": new_up,
+            "makerAmountFilled": 8_000_000, "takerAmountFilled": 20_000_000}])
+        early = build("early.sqlite", pd.concat([all_fills, new_fill], ignore_index=True), redemptions)
+        check("fill of an asset the store does not know is kept without a market",
+              pd.isna(position(early.positions(), new_up)['condition_id']))
+
+        store = MarketStore()
+        store.upsert_markets([{"id": "2", "conditionId": new_condition, "outcomes": '["Up", "Down"]',
+                               "clobTokenIds": f'["{new_up}", "{new_down}"]', "closed": True, "outcomePrices": '["1", "0"]'}])
+        store.close()
+        payout = pd.DataFrame([{"id": "redeem-1", "timestamp": START + 600 * 60, "timestamp_utc": "",
+                                "redeemer": USER, "payout": 20_000_000, "condition": new_condition, "indexSets": '["1"]'}])
+        payout.to_csv(REDEMPTION_FILE, mode="a", header=False, index=False)
+        with contextlib.redirect_stdout(io.StringIO()):
+            early.refresh()
+        p = position(early.positions(), new_up)
+        check("once the market is known, its redemption closes the earlier position",
+              p['condition_id'] == new_condition and p['size'] == 0 and p['redeemed'] == 20_000_000
+              and p['realized'] == 12_000_000)
+        rebuilt = build("rebuilt.sqlite", pd.concat([all_fills, new_fill], ignore_index=True),
+                        pd.concat([redemptions, payout], ignore_index=True))
+        check("late market mapping gives the same positions as a full build",
+              ordered(early.positions()).equals(ordered(rebuilt.positions())))
+        for ledger in (full, late, early, rebuilt):
+            ledger.close()
+    finally:
+        os.chdir(cwd)
+
+if failures:
+    print(f"\n{len(failures)} check(s) failed.")
+    sys.exit(1)
+print("\nAll position ledger checks passed.")
@@ -0,0 +1,103 @@
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+
+import pandas as pd
+
+sys.path.append(os.getcwd())
+from src.utils.raw_store import INDEX_COLUMNS, INDEX_DTYPE, RawStore, compress
+
+# Deterministic checks of the raw_json sidecar: lookups by hash and time against a naive scan,
+# a fixed-width index smaller than the payload, torn-append repair, and CSV index conversion.
+#
+#   python tests/check_raw_store.py
+
+failures = []
+
+def check(name, ok):
+    print(f"{'SUCCESS' if ok else 'FAIL'}: {name}")
+    if not ok:
+        failures.append(name)
+
+def records(n, start=0):
+    # Shaped like /activity payloads; every three records share a transaction, so one spans blocks
+    rng = random.Random(start)
+    return [{"proxyWallet": "0x63ce342161250d705dc0b16df89036c8e5f9ba9a", "timestamp": 1767571200 + 60 * (i // 2),
+             "conditionId": f"0x{rng.getrandbits(256):064x}", "type": "TRADE", "size": rng.randint(1, 10**6) / 100,
+             "usdcSize": rng.randint(1, 10**6) / 100, "transactionHash": f"0x{(i // 3) * 7919:064x}",
+             "price": rng.randint(1, 99) / 100, "asset": str(rng.getrandbits(254)), "side": "BUY" if i % 2 else "SELL",
+             "outcomeIndex": i % 2, "title": "Bitcoin Up or Down - January 5, 10:00AM-10:15AM ET",
+             "slug": f"btc-updown-15m-{1767571200 + 900 * (i // 40)}", "outcome": "Up" if i % 2 else "Down",
+             "id": f"trade-{i}"}
+            for i in range(start, start + n)]
+
+def by_id(rows):
+    return sorted(r["id"] for r in rows)
+
+cwd = os.getcwd()
+with tempfile.TemporaryDirectory() as tmp:
+    os.chdir(tmp)
+    try:
+        data = records(1000) + records(300, start=1000)
+        store = RawStore("out.csv")
+        store.append(data[:1000])
+        store.append(data[1000:])
+
+        # A fresh store loads the index once and answers both kinds of lookup from it
+        store = RawStore("out.csv")
+        tx = data[600]["transactionHash"]
+        check("get returns every record of a transaction",
+              by_id(store.get(tx)) == by_id(r for r in data if r["transactionHash"] == tx)
+              and store.get(tx.upper().replace("0X", "0x")) == store.get(tx))
+        check("get of an unknown hash is empty", store.get("0x" + "ff" * 32) == [])
+        lo, hi = data[255]["timestamp"], data[770]["timestamp"]
+        got = store.between(lo, hi)
+        check("between matches a scan, oldest first",
+              [r["id"] for r in got] == [r["id"] for r in data if lo <= r["timestamp"] < hi])
+        check("index is fixed-width and smaller than the payload",
+              os.path.getsize(store.index_path) == len(data) * INDEX_DTYPE.itemsize
+              and os.path.getsize(store.index_path) < os.path.getsize(store.data_path))
+
+        # Appends after a lookup are visible without reopening
+        store.append(records(4, start=5000))
+        check("records appended after a lookup are found", len(store.get(records(1, start=5000)[0]["transactionHash"])) >= 1)
+
+        # An append torn between the block and its index, and inside the index, is cut off on open
+        size, index_size = os.path.getsize(store.data_path), os.path.getsize(store.index_path)
+        with open(store.data_path, "ab") as f:
+            f.write(compress(b'{"id":"torn"}')[0])
+        with open(store.index_path, "ab") as f:
+            f.write(b"\x01" * 20)
+        store = RawStore("out.csv")
+        check("torn block and index entry are truncated",
+              os.path.getsize(store.data_path) == size and os.path.getsize(store.index_path) == index_size
+              and by_id(store.get(tx)) == by_id(r for r in data if r["transactionHash"] == tx))
+
+        # An index written as CSV by an earlier version is converted in place
+        legacy = RawStore("legacy.csv")
+        legacy.append(data[:300])
+        index = legacy.load_index()
+        codec = "zstd" if index["codec"][0] else "zlib"
+        rows = pd.DataFrame({"tx_hash": [r["transactionHash"] for r in data[:300]],
+                             "timestamp": index["timestamp"], "offset": index["offset"],
+                             "length": index["length"], "line": index["line"], "codec": codec},
+                            columns=INDEX_COLUMNS)
+        with open(legacy.index_path, "w", newline="") as f:
+            rows.to_csv(f, index=False)
+            f.write("0xabc,1767571200,")
+        with contextlib.redirect_stdout(io.StringIO()):
+            converted = RawStore("legacy.csv")
+        check("CSV index is converted and its torn last line dropped",
+              os.path.getsize(converted.index_path) == 300 * INDEX_DTYPE.itemsize
+              and by_id(converted.get(tx)) == by_id(r for r in data[:300] if r["transactionHash"] == tx)
+              and [r["id"] for r in converted.between(0, 2**62)] == [r["id"] for r in data[:300]])
+    finally:
+        os.chdir(cwd)
+
+if failures:
+    print(f"\n{len(failures)} check(s) failed.")
+    sys.exit(1)
+print("\nAll raw store checks passed.")
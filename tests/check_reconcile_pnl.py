@@ -0,0 +1,78 @@
+import contextlib
+import io
+import os
+import sys
+import tempfile
+
+import pandas as pd
+
+sys.path.append(os.getcwd())
+from src.processors.reconcile_pnl import FILLS_FILE, REDEMPTION_FILE, calculate_pnl
+
+# Deterministic checks of the reconcile_pnl cashflow engine on a handful of hand-computed fills:
+# per-user totals in one pass, self-matches left out, and redemption payouts split by redeemer.
+#
+#   python tests/check_reconcile_pnl.py
+
+A = "0x" + "aa" * 20
+B = "0x" + "bb" * 20
+C = "0x" + "cc" * 20
+failures = []
+
+def check(name, ok):
+    print(f"{'SUCCESS' if ok else 'FAIL'}: {name}")
+    if not ok:
+        failures.append(name)
+
+FILLS = pd.DataFrame([
+    # id, timestamp_utc, maker, taker, makerAssetId, takerAssetId, makerAmountFilled, takerAmountFilled
+    ("f1", "2026-01-05 10:00:00", A, C, "0", "111", 40_000_000, 100_000_000),        # A buys: spends 40
+    ("f2", "2026-01-05 11:00:00", C, A.upper(), "0", "111", 25_000_000, 50_000_000), # A sells as taker: receives 25
+    ("f3", "2026-01-06 09:00:00", A, B, "222", "0", 30_000_000, 12_000_000),         # A receives 12, B spends 12
+    ("f4", "2026-01-06 10:00:00", B, B, "0", "222", 5_000_000, 10_000_000),          # self-match: ignored
+], columns=["id", "timestamp_utc", "maker", "taker", "makerAssetId", "takerAssetId",
+            "makerAmountFilled", "takerAmountFilled"])
+FILLS.insert(1, "timestamp", 0)
+FILLS.insert(3, "transactionHash", "0x1")
+
+def run(users, redemptions):
+    os.makedirs("data/raw", exist_ok=True)
+    os.makedirs("data/interim", exist_ok=True)
+    FILLS.to_csv(FILLS_FILE, index=False)
+    redemptions.to_csv(REDEMPTION_FILE, index=False)
+    with contextlib.redirect_stdout(io.StringIO()):
+        return calculate_pnl(users=users)
+
+cwd = os.getcwd()
+with tempfile.TemporaryDirectory() as tmp:
+    os.chdir(tmp)
+    try:
+        by_redeemer = pd.DataFrame({"id": ["r1", "r2"], "timestamp": [1, 2], "redeemer": [A, B.upper()],
+                                    "payout": [7_000_000, 3_000_000], "condition": ["0xc", "0xc"]})
+        totals, breakdown = run([A, B], by_redeemer)
+        a, b = totals.loc[A], totals.loc[B]
+        check("per-user spent / received / counts in one pass",
+              (a['spent'], a['received'], a['count_spent'], a['count_received']) == (40_000_000, 37_000_000, 1, 2)
+              and (b['spent'], b['received'], b['count_spent'], b['count_received']) == (12_000_000, 0, 1, 0))
+        check("payouts split by redeemer", (a['payout'], b['payout']) == (7_000_000, 3_000_000))
+        check("profit = received - spent + payout", (a['profit'], b['profit']) == (4_000_000, -9_000_000))
+        check("breakdown rows by user, market, day and role",
+              len(breakdown) == 4 and set(breakdown['role']) == {"maker", "taker"}
+              and breakdown['spent'].sum() == 52_000_000)
+
+        without_redeemer = by_redeemer.drop(columns="redeemer")
+        totals, _ = run([A], without_redeemer)
+        check("a single user's extract is counted whole", totals.loc[A, 'payout'] == 10_000_000)
+        try:
+            run([A, B], without_redeemer)
+            raised = False
+        except ValueError as e:
+            raised = "redeemer" in str(e)
+        check("several users without a redeemer column is an error", raised)
+    finally:
+        os.chdir(cwd)
+
+if failures:
+    print(f"\n{len(failures)} check(s) failed.")
+    sys.exit(1)
+print("\nAll reconcile_pnl checks passed.")
@@ -0,0 +1,123 @@
+import os
+import re
+import sys
+import threading
+
+sys.path.append(os.getcwd())
+from src.utils import keyset
+from src.utils.keyset import MAX_FAILURES, run_cursors
+from src.utils.subgraph_client import SubgraphClient, SubgraphError, subquery
+
+# Deterministic checks of the subgraph retry paths, without a network:
+# a failed request is re-sent as smaller batches, and run_cursors backs off, retries a
+# failing cursor a bounded number of times and then drops it while the others finish.
+# The adaptive batch size also has to stay consistent when worker threads update it.
+#
+#   python tests/check_subgraph_retries.py
+
+failures = []
+
+def check(name, ok):
+    print(f"{'SUCCESS' if ok else 'FAIL'}: {name}")
+    if not ok:
+        failures.append(name)
+
+# 1. A batch whose request fails is re-sent at the halved batch size
+client = SubgraphClient("http://127.0.0.1:9/subgraph", batch_size=4, cache=False)
+posted = []
+
+def flaky_post(query):
+    tags = re.findall(r'q(\d+): f\(id: "(\w+)"\)', query)
+    posted.append([tag for _, tag in tags])
+    if len(posted) == 1:
+        raise SubgraphError("Request failed: 502")
+    return {"data": {f"q{i}": [tag] for i, tag in tags}}, 100
+
+client.post = flaky_post
+tags = ["a", "b", "c", "d"]
+results = client.execute([subquery("f", {"id": t}, "id") for t in tags])
+check("failed batch is re-sent split at the new batch size",
+      posted == [tags, ["a", "b"], ["c", "d"]] and results == [[t] for t in tags])
+
+# 2. run_cursors: a cursor whose sub-query keeps failing is dropped after MAX_FAILURES rounds
+class Cursor:
+    def __init__(self, label, pages):
+        self.label = label
+        self.pages = pages
+        self.last_id = ""
+        self.total_count = 0
+        self.done = False
+
+    def subquery(self):
+        return subquery("f", {"id": self.label}, "id")
+
+    def consume(self, events):
+        if not events:
+            self.done = True
+            return
+        self.total_count += len(events)
+        self.last_id = events[-1]
+        self.pages -= 1
+
+class Controller:
+    backoffs = 0
+
+    def backoff(self):
+        Controller.backoffs += 1
+
+class FailingClient:
+    """Answers every sub-query except the one of the `bad` cursor, which always has GraphQL errors."""
+
+    controller = Controller()
+
+    def __init__(self, cursors, bad):
+        self.cursors = cursors
+        self.bad = bad
+
+    def execute(self, subqueries, workers=1):
+        for sq in subqueries:
+            if sq["args"]["id"] == self.bad:
+                raise SubgraphError("Subgraph errors: [boom]", sq)
+        by_label = {c.label: c for c in self.cursors}
+        return [[f"{sq['args']['id']}-{i}" for i in range(2)] if by_label[sq["args"]["id"]].pages else []
+                for sq in subqueries]
+
+good, bad = Cursor("good", 3), Cursor("bad", 3)
+try:
+    run_cursors([good, bad], FailingClient([good, bad], "bad"))
+    raised = None
+except SubgraphError as e:
+    raised = str(e)
+check("failing cursor is dropped with an error naming it", raised is not None and "bad" in raised)
+check("failures back off through the rate controller", Controller.backoffs == MAX_FAILURES)
+check("the other cursor still runs to completion", good.done and good.total_count == 6 and not bad.done)
+
+# 3. A failure the client cannot attribute counts against every active cursor
+class DownClient(FailingClient):
+    def execute(self, subqueries, workers=1):
+        raise SubgraphError("Request failed: connection refused")
+
+Controller.backoffs = 0
+cursors = [Cursor("x", 1), Cursor("y", 1)]
+try:
+    run_cursors(cursors, DownClient(cursors, None))
+    raised = None
+except SubgraphError as e:
+    raised = str(e)
+check("an unreachable endpoint ends the run instead of looping",
+      raised is not None and Controller.backoffs == keyset.MAX_FAILURES)
+
+# 4. Batch sizing from concurrent worker threads loses no updates
+sys.setswitchinterval(1e-6)
+client = SubgraphClient("http://127.0.0.1:9/subgraph", batch_size=1, max_batch=10**9, cache=False)
+threads = [threading.Thread(target=lambda: [client.grow() for _ in range(20000)]) for _ in range(8)]
+for t in threads:
+    t.start()
+for t in threads:
+    t.join()
+check("concurrent grow() calls are all counted", client.batch_size == 1 + 8 * 20000)
+
+if failures:
+    print(f"\n{len(failures)} check(s) failed.")
+    sys.exit(1)
+print("\nAll subgraph retry checks passed.")